@@ -0,0 +1,137 @@
+# coding: utf-8
+"""Sekwencyjna ocena z wczesnym zatrzymaniem.
+
+Zamiast stalej liczby prob kolejne proby dodawane sa tak dlugo, az polowa szerokosci 95% przedzialu
+ufnosci sredniej liczby ruchow (ta sama wielkosc, ktora launcher wypisuje w podsumowaniu) spadnie ponizej
+zadanej wartosci albo wyczerpie sie limit prob lub czasu. Przy porownywaniu agentow odrzucani sa agenci
+statystycznie gorsi od innego agenta; poniewaz agenci oceniani sa na tych samych liczbach losowych,
+porownanie wykorzystuje roznice w parach prob, ktore maja mniejsza wariancje niz same wyniki.
+
+Porownania powtarzane sa po kazdej kolejnej probie i dla kazdej pary agentow, wiec pojedynczy test na
+poziomie 5% odrzucalby agentow znacznie czesciej. Dlatego laczne prawdopodobienstwo bledu ALPHA dzielone
+jest miedzy kolejne liczby prob (j-tej liczbie prob przypada ALPHA * 6 / (pi^2 * j^2), co sumuje sie do
+ALPHA dla dowolnie wielu prob) i, poprawka Bonferroniego, miedzy wszystkie uporzadkowane pary agentow;
+granica testu to kwantyl rozkladu t-Studenta, bo przy kilku probach wariancja jest niepewna."""
+
+from functools import lru_cache
+from math import atan, cos, pi, sin, sqrt
+from time import time
+
+Z_95 = 1.96
+
+ALPHA = 0.05
+"""Laczne prawdopodobienstwo odrzucenia agenta, ktory nie jest gorszy od innego, w calym turnieju."""
+
+
+def mean(values):
+    """Srednia wartosci values; dla pustej listy nan (jak np.average)."""
+
+    return sum(values) / float(len(values)) if values else float('nan')
+
+def conf_delta_95(values):
+    """Polowa szerokosci 95% przedzialu ufnosci sredniej (odchylenie standardowe populacji, jak np.std);
+    dla pustej listy nan."""
+
+    n = len(values)
+    if n == 0:
+        return float('nan')
+    mean = sum(values) / float(n)
+    variance = sum((value - mean) ** 2 for value in values) / float(n)
+    return Z_95 * sqrt(variance) / sqrt(n)
+
+
+class StoppingRule:
+    """Kryterium zatrzymania sekwencyjnej oceny: target_ci (docelowa polowa szerokosci przedzialu ufnosci),
+    min_trials, max_trials (None - bez limitu) oraz time_budget (w sekundach, None - bez limitu)."""
+
+    def __init__(self, target_ci, min_trials=5, max_trials=None, time_budget=None):
+        self.target_ci = target_ci
+        self.min_trials = max(2, min_trials)
+        self.max_trials = max_trials
+        self.time_budget = time_budget
+        self.start_time = time()
+
+    def reason(self, values):
+        """Zwraca przyczyne zatrzymania dla dotychczasowych wynikow values albo None, jesli nalezy kontynuowac."""
+
+        if self.max_trials is not None and len(values) >= self.max_trials:
+            return 'trial limit'
+        if self.time_budget is not None and time() - self.start_time >= self.time_budget:
+            return 'time budget'
+        if len(values) >= self.min_trials and conf_delta_95(values) <= self.target_ci:
+            return 'confidence interval'
+        return None
+
+
+def _t_central(t, df):
+    # P(|T| < t) dla rozkladu t-Studenta o df (calkowitych) stopniach swobody, szeregi skonczone z Abramowitz,
+    # Stegun 26.7.3 i 26.7.4
+    theta = atan(t / sqrt(df))
+    cos2 = cos(theta) ** 2
+    if df % 2 == 0:
+        term = total = 1.
+        for k in range(2, df - 1, 2):
+            term *= cos2 * (k - 1) / k
+            total += term
+        return sin(theta) * total
+    total = 0.
+    if df > 1:
+        term = total = 1.
+        for k in range(3, df - 1, 2):
+            term *= cos2 * (k - 1) / k
+            total += term
+    return 2. / pi * (theta + sin(theta) * cos(theta) * total)
+
+@lru_cache(maxsize=None)
+def t_quantile(level, df):
+    """Zwraca t takie, ze P(T > t) = level dla rozkladu t-Studenta o df stopniach swobody (bisekcja)."""
+
+    low, high = 0., 1.
+    while (1. - _t_central(high, df)) / 2. > level:
+        low, high = high, 2. * high
+    for _ in range(100):
+        middle = (low + high) / 2.
+        if (1. - _t_central(middle, df)) / 2. > level:
+            low = middle
+        else:
+            high = middle
+    return high
+
+def dominance_bound(n, min_trials=5, agents=2, alpha=ALPHA):
+    """Zwraca jednostronna granice testu dominacji po n probach (kwantyl rozkladu t-Studenta o n - 1 stopniach
+    swobody). Pierwszemu testowi (min_trials prob) odpowiada j = 1, kazdej kolejnej probie j wieksze o 1;
+    poziom testu to alpha * 6 / (pi^2 * j^2) podzielone przez liczbe uporzadkowanych par sposrod agents
+    agentow."""
+
+    look = max(1, n - max(2, min_trials) + 1)
+    level = alpha * 6. / (pi ** 2 * look ** 2) / max(1, agents * (agents - 1))
+    return t_quantile(level, n - 1)
+
+def dominated(samples, min_trials=5, agents=None, alpha=ALPHA):
+    """Zwraca zbior kluczy agentow statystycznie gorszych (wiecej ruchow) od innego agenta.
+
+    samples to slownik: klucz agenta -> lista liczb ruchow w kolejnych probach; proby o tym samym numerze
+    dotycza tych samych liczb losowych. agents to liczba agentow, miedzy ktorych pary dzielone jest alpha
+    (domyslnie len(samples); w turnieju - liczba wszystkich agentow, takze juz odrzuconych). Agent A jest
+    zdominowany przez B, jesli srednia roznica A - B w parach prob przekracza dominance_bound bledow
+    standardowych (z wariancji z proby). Wszystkie pary testowane sa na tych samych probkach, wiec wynik
+    nie zalezy od kolejnosci agentow."""
+
+    if agents is None:
+        agents = len(samples)
+    result = set()
+    keys = list(samples)
+    for a in keys:
+        for b in keys:
+            if a == b:
+                continue
+            n = min(len(samples[a]), len(samples[b]))
+            if n < max(2, min_trials):
+                continue
+            differences = [samples[a][i] - samples[b][i] for i in range(n)]
+            average = sum(differences) / float(n)
+            variance = sum((difference - average) ** 2 for difference in differences) / float(n - 1)
+            if average > dominance_bound(n, min_trials, agents, alpha) * sqrt(variance / n):
+                result.add(a)
+                break
+    return result
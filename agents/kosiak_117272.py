@@ -1,7 +1,9 @@
-import copy as cp
 import random
 
+import numpy as np
+
 from action import Action
+from histogram_filter import HistogramFilter
 
 
 def weighted_choice(choices):
@@ -18,6 +20,23 @@ def weighted_choice(choices):
         upto += choices[choice][0]
 
 
+def build_directions(model):
+    # dla kazdego pola i akcji: waga (t - odleglosc) / t ruchu w strone wyjscia wzdluz jednej osi
+    # oraz maska pol, z ktorych ta akcja prowadzi do wyjscia
+    weights = {}
+    masks = {}
+    for distance, t, (neg, pos) in [(model.exit_dy, model.height, (Action.UP, Action.DOWN)),
+                                    (model.exit_dx, model.width, (Action.LEFT, Action.RIGHT))]:
+        for move, mask in [(neg, distance < 0), (pos, distance > 0)]:
+            mask = mask & ~model.exit_mask
+            weight = np.where(mask, (t - np.abs(distance)) / float(t), 0.)
+            weight.flags.writeable = False
+            mask.flags.writeable = False
+            weights[move] = weight
+            masks[move] = mask
+    return weights, masks
+
+
 class Agent:
 
     def __init__(self, p, pj, pn, height, width, areaMap):
@@ -31,16 +50,11 @@ class Agent:
         self.pn = pn
         self.height = height
         self.width = width
-        self.map = [[str(x) for x in line] for line in areaMap]
-
-        self.indicators = []
-
-        for i in range(self.height):
-            for j in range(self.width):
-                if self.map[i][j] in ['J', 'W']:
-                    self.indicators.append([i, j])
+        self.map = areaMap
 
-        self.find_exit_coord()
+        self.filter = HistogramFilter(p, pj, pn, height, width, areaMap)
+        self.model = self.filter.model
+        self.exit_coords = self.model.exit_coords
 
         self.last_move = '.'
         self.opposite_move = {
@@ -51,36 +65,16 @@ class Agent:
             '.': '.'
         }
 
-        self.conditional_probs = {
-            (True, 'J'): self.pj,
-            (True, '.'): self.pn,
-            (False, 'J'): (1 - self.pj),
-            (False, '.'): (1 - self.pn)
-        }
-
-        self.fields_count = { ch: sum([line.count(ch) for line in self.map]) for ch in ['.', 'J']}
-        self.field_probs = { ch: (self.fields_count[ch] / float(width * height)) for ch in ['.', 'J']}
-
-        self.result_probs = {
-            True: (self.pj + self.pn) / float(2),
-            False: (1 - self.pj) + (1 - self.pn) / float(2),
-        }
-
-        self.hist = []
-        for y in range(self.height):
-            self.hist.append([])
-            for x in range(self.width):
-                self.hist[y].append(1.)
-
-        self.hist[self.exit_coords[0]][self.exit_coords[1]] = 0
+        self.fields_count = self.model.fields_count
 
         self.prepare_directions()
 
         return
 
     def sense(self, sensor):
+        # przekonanie nie jest tu normalizowane - calculate_direction porownuje wartosci z maksimum,
+        # a podnoszenie malych wartosci (normalize_hist) wykonywane jest raz na ruch
         self.apply_sense_on_histo(sensor)
-        self.normalize_hist()
 
     def move(self):
 
@@ -98,83 +92,35 @@ class Agent:
     def histogram(self):
         return self.hist
 
+    @property
+    def hist(self):
+        # przekonanie podzielone przez maksimum wyliczane jest dopiero przy odczycie
+        return self.filter.normalized()
+
     # =============================================================================================
     # =======================================IMPL==================================================
     # =============================================================================================
 
     def prepare_directions(self):
-        self.directions = [
-            [
-                [] for j in range(self.width)
-            ] for i in range(self.height)
-        ]
-
-        for i in range(self.height):
-            for j in range(self.width):
-
-                if [i, j] == self.exit_coords:
-                    self.directions[i][j] = ['W']
-                    continue
-
-                direction = []
-
-                wg = lambda decision, distance, t: [decision, (t - distance) / float(t)]
-
-                v_d_inner = self.exit_coords[1] - j
-
-                if v_d_inner < 0:
-                    outer_d = (self.width - j + self.exit_coords[1])
-                    v_d_inner = abs(v_d_inner)
-
-                    if v_d_inner < outer_d:
-                        direction.append(wg(Action.LEFT, v_d_inner, self.width))
-                    else:
-                        direction.append(wg(Action.RIGHT, outer_d, self.width))
-
-                elif v_d_inner > 0:
-                    outer_d = (j + self.width - self.exit_coords[1])
-
-                    if v_d_inner < outer_d:
-                        direction.append(wg(Action.RIGHT, v_d_inner, self.width))
-                    else:
-                        direction.append(wg(Action.LEFT, outer_d, self.width))
-
-                h_d_inner = self.exit_coords[0] - i
-
-                if h_d_inner < 0:
-                    h_d_inner = abs(h_d_inner)
-                    outer_d = (self.height - i + self.exit_coords[0])
-
-                    if h_d_inner < outer_d:
-                        direction.append(wg(Action.UP, h_d_inner, self.height))
-                    else:
-                        direction.append(wg(Action.DOWN, outer_d, self.height))
-                elif h_d_inner > 0:
-                    outer_d = (i + self.height - self.exit_coords[0])
-
-                    if h_d_inner < outer_d:
-                        direction.append(wg(Action.DOWN, h_d_inner, self.height))
-                    else:
-                        direction.append(wg(Action.UP, outer_d, self.height))
-
-                self.directions[i][j] = direction
+        self.direction_weights, self.direction_masks = self.model.memoize('kosiak_117272.directions',
+                                                                          build_directions)
 
     def calculate_direction(self):
         result = {act: [0, 0] for act in [Action.UP, Action.DOWN, Action.RIGHT, Action.LEFT]}
 
-        for i in range(self.height):
-            for j in range(self.width):
-                if [i, j] == self.exit_coords:
-                    continue
+        # wartosci przekonania porownywane sa z maksimum bez dzielenia calej tablicy
+        belief = self.filter.belief
+        scale = self.filter.peak()
+        candidates = belief > 0.9 * scale
+        candidates[self.exit_coords[0], self.exit_coords[1]] = False
 
-                if self.hist[i][j] <= 0.9:
-                    continue
-
-                for move, weight in self.directions[i][j]:
-                    if self.is_opposite_to_last(move):
-                        continue
-                    result[move][0] += self.hist[i][j] * weight
-                    result[move][1] += 1
+        for move in result:
+            if self.is_opposite_to_last(move):
+                continue
+            mask = candidates & self.direction_masks[move]
+            # sumowanie po kolei, jak w petli po polach, aby wynik nie zalezal od kolejnosci dodawania
+            result[move][0] = sum((belief[mask] / scale * self.direction_weights[move][mask]).tolist())
+            result[move][1] = int(mask.sum())
 
         for choice in result:
             if result[choice][1] > 0:
@@ -187,52 +133,13 @@ class Agent:
     def is_opposite_to_last(self, move):
         return self.opposite_move[self.last_move] == move
 
-    def get_transition_functions(self, direction):
-        v = 0 + (1 if direction == Action.DOWN else 0) - (1 if direction == Action.UP else 0)
-        h = (1 if direction == Action.RIGHT else 0) - (1 if direction == Action.LEFT else 0)
-
-        return [
-            [lambda i, j: [(i + v) % self.height, (j + h) % self.width], self.p],
-            [lambda i, j: [(i + v - 1) % self.height, (j + h) % self.width], self.p_d],
-            [lambda i, j: [(i + v + 1) % self.height, (j + h) % self.width], self.p_d],
-            [lambda i, j: [(i + v) % self.height, (j + h + 1) % self.width], self.p_d],
-            [lambda i, j: [(i + v) % self.height, (j + h - 1) % self.width], self.p_d],
-        ]
-
     def move_histo(self, direction):
-        old = cp.deepcopy(self.hist)
-
-        for y in range(self.height):
-            for x in range(self.width):
-                self.hist[y][x] = 0
-
-        transitions = self.get_transition_functions(direction)
-
-        for i in range(self.height):
-            for j in range(self.width):
-                # print '{0},{1}'.format(i,j)
-                for trans in transitions:
-                    coords = trans[0](i, j)
-                    self.hist[coords[0]][coords[1]] += old[i][j] * float(trans[1])
+        self.filter.move(direction)
 
     def apply_sense_on_histo(self, sense):
-        for i in range(self.height):
-            for j in range(self.width):
-                if self.map[i][j] == 'W':
-                    self.hist[i][j] = 0
-                else:
-                    self.hist[i][j] *= self.conditional_probs[sense, self.map[i][j]]
+        self.filter.sense(sense)
 
     def normalize_hist(self):
-        max_val = max([max(line) for line in self.hist])
-
-        for i in range(self.height):
-            for j in range(self.width):
-                self.hist[i][j] = max(self.hist[i][j] / max_val, 0.00000001)
-
-    def find_exit_coord(self):
-        for i in range(self.height):
-            for j in range(self.width):
-                if self.map[i][j] == 'W':
-                    self.exit_coords = [i, j]
-                    return
+        # zleca podniesienie wartosci mniejszych od 1e-8 razy maksimum; filtr wykonuje je dopiero przy
+        # odczycie histogramu lub przy zagrozeniu niedomiarem
+        self.filter.floor(0.00000001)
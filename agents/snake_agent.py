@@ -47,7 +47,8 @@ class Agent:
             return Action.DOWN
 
     # nie zmieniac naglowka metody, tutaj agent udostepnia swoj histogram (ten z filtru
-    # histogramowego), musi to byc tablica (lista list, krotka krotek...) o wymarach takich jak
+    # histogramowego), musi to byc tablica (lista list, krotka krotek, tablica numpy albo obiekt z buforem
+    # height * width wartosci - te dwie ostatnie czytane sa bez kopiowania) o wymarach takich jak
     # plansza, pobranie wartosci agent.histogram()[y][x] zwraca prawdopodobienstwo stania na polu
     # w wierszu y i kolumnie x
     def histogram(self):
@@ -0,0 +1,46 @@
+# Agent QMDP z rzadkim przekonaniem.
+#
+# Przekonanie utrzymywane jest filtrem sparse_belief.SparseHistogramFilter, ktory przechowuje tylko pola
+# o wadze wiekszej niz epsilon razy najwieksza waga, wiec na duzych mapach, gdy przekonanie skupi sie na
+# niewielu polach, koszt obserwacji i ruchu zalezy od liczby tych pol, a nie od rozmiaru mapy. Ruch wybierany
+# jest tak jak w qmdp_agent (wartosci QMDP z wyprzedzeniem o jeden odczyt sensora); w postaci rzadkiej sumy
+# licza sie tylko po polach o niezerowej wadze (jak w particle_agent), a w gestej - jak w qmdp_agent.
+
+import numpy as np
+
+from qmdp_agent import ACTIONS, build_motion, build_q_values, lookahead, sparse_lookahead
+from sparse_belief import SparseHistogramFilter
+
+
+class Agent:
+
+    def __init__(self, p, pj, pn, height, width, areaMap):
+        self.height = height
+        self.width = width
+        self.filter = SparseHistogramFilter(p, pj, pn, height, width, areaMap)
+        model = self.filter.model
+        self.shifts, self.motion_weights = model.memoize('qmdp_agent.motion', build_motion)
+        self.q_values = model.memoize('qmdp_agent.q_values', build_q_values)
+        self.likelihoods = np.array([model.likelihood[False].ravel(), model.likelihood[True].ravel()])
+        self.filter.normalize()
+
+    def sense(self, sensor):
+        self.filter.sense(sensor)
+        self.filter.normalize()
+
+    def move(self):
+        if self.filter.is_sparse:
+            cells, weights = self.filter.nonzero()
+            costs = sparse_lookahead(cells, weights, self.height, self.width, self.shifts, self.motion_weights,
+                    self.likelihoods, self.q_values)
+        else:
+            _, costs = lookahead(self.filter.belief, self.shifts, self.motion_weights, self.likelihoods,
+                    self.q_values)
+        # przy remisie wygrywa pierwsza z ACTIONS
+        action = ACTIONS[int(np.argmin(costs))]
+
+        self.filter.move(action)
+        return action
+
+    def histogram(self):
+        return self.filter.belief
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Wsadowe srodowisko zagubionego Wumpusa (BatchEnv) i sprawdzenie jego zgodnosci z Env.
+
+Env losuje z generatora random.Random, a BatchEnv z numpy.random.Generator, wiec przy tym samym ziarnie
+kolejne losowania nie sa takie same. Zgodnosc sprawdzana jest dlatego na dwa sposoby:
+- compare_exact - w wersji srodowiska bez losowosci (p = 1, pj = 1, pn = 0, ustalona pozycja startowa)
+  przebieg epizodu (pozycje, akcje, stany sensora i liczba ruchow) musi byc identyczny w obu srodowiskach,
+- compare_statistics - z prawdziwymi parametrami srodowiska srednie liczby ruchow w N epizodach Env
+  i w wsadzie N epizodow BatchEnv nie moga roznic sie o wiecej niz CHECK_Z bledow standardowych.
+
+Sprawdzenie agenta w srodowiskach z plikow '*.in' (kod wyjscia 1 przy niezgodnosci):
+> batch_environment.py [-n N] [--seed SEED] AGENT ENV [ENV ...]"""
+
+import argparse
+import random
+import sys
+import numpy as np
+from adaptive import Z_95, conf_delta_95, mean
+from environment import Env
+from world import World
+from action import Action
+
+CHECK_Z = 4.
+"""Dopuszczalna roznica srednich liczb ruchow w compare_statistics, w bledach standardowych roznicy."""
+
+class BatchEnv:
+    """Wsadowe srodowisko zagubionego Wumpusa: B epizodow na mapie jednego srodowiska Env prowadzonych
+    krok w krok.
+
+    Pozycje agentow, liczniki ruchow i stany sensorow wszystkich epizodow przechowywane sa w tablicach
+    NumPy, a zaburzenie ruchu, zawijanie wspolrzednych i losowanie stanu sensora wykonywane jest jedna
+    operacja wektorowa na krok. Semantyka jest taka sama jak w Env:
+    - z prawdopodobienstwem 1 - p do ruchu dodawane jest losowe przemieszczenie o jedno pole,
+    - sensor wskazuje jame z prawdopodobienstwem pj na polu z jama i pn na pozostalych polach,
+    - epizod konczy sie po dotarciu agenta do wyjscia,
+    - run() domyslnie ogranicza liczbe ruchow do 2 * width * height.
+
+    Przechowywane sa:
+    - rozmiar wsadu (batch_size),
+    - pozycje agentow (agent_y, agent_x),
+    - liczniki ruchow (agent_steps_counter),
+    - ostatnie akcje jako indeksy w ACTIONS (agent_last_action), poczatkowo -1,
+    - ostatnie przemieszczenia (agent_last_motion, tablica batch_size x 2),
+    - stany sensorow (agent_sensor, bez znaczenia dla zakonczonych epizodow),
+    - maska zakonczonych epizodow (completed),
+    - (opcjonalnie) obiekty z programami agentow (agents), po jednym na epizod."""
+
+    ACTIONS = (Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT)
+    """Akcje w kolejnosci odpowiadajacej indeksom akcji uzywanym przez step()."""
+
+    __ACTION_INDEX = {action: index for index, action in enumerate(ACTIONS)}
+
+    __MOTIONS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.int64)
+    """Przemieszczenia (dy, dx) deterministycznych akcji, w kolejnosci ACTIONS."""
+
+    __EMPTY, __CAVE, __EXIT = 0, 1, 2
+
+    def __init__(self, env, batch_size, rng=None):
+        """Tworzy wsad batch_size epizodow na mapie i z parametrami srodowiska env. Argument rng to
+        generator numpy.random.Generator (lub ziarno), domyslnie tworzony jest nowy generator."""
+
+        self.p = env.p
+        self.pj = env.pj
+        self.pn = env.pn
+        self.height = env.height
+        self.width = env.width
+        self.map = env.map
+        self.start_y = env.start_y
+        self.start_x = env.start_x
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(rng)
+
+        codes = {World.EMPTY: BatchEnv.__EMPTY, World.CAVE: BatchEnv.__CAVE, World.EXIT: BatchEnv.__EXIT}
+        self.grid = np.array([[codes[field] for field in row] for row in self.map], dtype=np.uint8)
+        self.thresholds = np.array([self.pn, self.pj, 0.], dtype=np.float64)
+        self.free_cells = np.flatnonzero(self.grid != BatchEnv.__EXIT)
+
+        self.agents = None
+        self.agent_y = None
+        self.agent_x = None
+        self.agent_steps_counter = None
+        self.agent_last_action = None
+        self.agent_last_motion = None
+        self.agent_sensor = None
+        self.completed = None
+        return
+
+    def __randomize_sensor_state(self):
+        """Losuje stany sensorow wszystkich epizodow wedlug zawartosci pol, na ktorych stoja agenci."""
+
+        fields = self.grid[self.agent_y, self.agent_x]
+        self.completed = fields == BatchEnv.__EXIT
+        self.agent_sensor = self.rng.random(self.batch_size) < self.thresholds[fields]
+
+    def reset(self, agent_factory=None):
+        """Resetuje wszystkie epizody. Jesli podano agent_factory, w kazdym epizodzie umieszczany jest
+        osobny agent."""
+
+        if agent_factory is None:
+            self.agents = None
+        else:
+            self.agents = [agent_factory(self.p, self.pj, self.pn, self.height, self.width, self.map)
+                    for _ in range(self.batch_size)]
+
+        if (self.start_y is None or self.start_x is None
+                or self.grid[self.start_y, self.start_x] == BatchEnv.__EXIT):
+            cells = self.rng.choice(self.free_cells, self.batch_size)
+            self.agent_y, self.agent_x = np.divmod(cells, self.width)
+        else:
+            self.agent_y = np.full(self.batch_size, self.start_y, dtype=np.int64)
+            self.agent_x = np.full(self.batch_size, self.start_x, dtype=np.int64)
+
+        self.agent_steps_counter = np.zeros(self.batch_size, dtype=np.int64)
+        self.agent_last_action = np.full(self.batch_size, -1, dtype=np.int8)
+        self.agent_last_motion = np.zeros((self.batch_size, 2), dtype=np.int64)
+        self.__randomize_sensor_state()
+        return
+
+    def step(self, actions):
+        """Wykonuje jeden ruch we wszystkich niezakonczonych epizodach. Argument actions to tablica
+        batch_size indeksow akcji z ACTIONS; wartosci dla zakonczonych epizodow sa ignorowane."""
+
+        active = ~self.completed
+        actions = np.asarray(actions, dtype=np.int64)
+
+        motion = BatchEnv.__MOTIONS[actions]
+        disturbed = self.rng.random(self.batch_size) >= self.p
+        modification = BatchEnv.__MOTIONS[self.rng.integers(0, 4, self.batch_size)]
+        motion = motion + modification * disturbed[:, np.newaxis]
+        motion *= active[:, np.newaxis]
+
+        self.agent_y = (self.agent_y + motion[:, 0]) % self.height
+        self.agent_x = (self.agent_x + motion[:, 1]) % self.width
+        self.agent_steps_counter += active
+        self.agent_last_action = np.where(active, actions, self.agent_last_action).astype(np.int8)
+        self.agent_last_motion = np.where(active[:, np.newaxis], motion, self.agent_last_motion)
+        self.__randomize_sensor_state()
+        return
+
+    def step_agents(self):
+        """Przekazuje stany sensorow agentom niezakonczonych epizodow, zbiera ich decyzje i wykonuje
+        ruch (odpowiednik step_sense i step_move z Env)."""
+
+        actions = np.zeros(self.batch_size, dtype=np.int64)
+        for i in np.flatnonzero(~self.completed):
+            agent = self.agents[i]
+            agent.sense(bool(self.agent_sensor[i]))
+            actions[i] = BatchEnv.__ACTION_INDEX[agent.move()]
+        self.step(actions)
+
+    def is_completed(self):
+        """Sprawdza czy we wszystkich epizodach agenci dotarli do wyjscia."""
+
+        return bool(self.completed.all())
+
+    def run(self, max_steps=None, policy=None):
+        """Prowadzi epizody do dotarcia wszystkich agentow do wyjscia lub wykonania max_steps ruchow
+        (domyslnie 2 * width * height). Decyzje podejmuja agenci z reset() albo, jesli podano,
+        wektorowa polityka policy(batch_env) zwracajaca tablice indeksow akcji. Zwraca liczniki ruchow."""
+
+        if max_steps is None:
+            max_steps = 2 * self.width * self.height
+
+        for i in range(max_steps):
+            if self.is_completed():
+                break
+            if policy is None:
+                self.step_agents()
+            else:
+                self.step(policy(self))
+        return self.agent_steps_counter
+
+
+def compare_exact(env, agent_factory, max_steps=None, seed=0):
+    """Prowadzi epizod agenta z fabryki agent_factory w Env, a nastepnie w BatchEnv (wsad 1), na mapie
+    srodowiska env bez losowosci: p = 1, pj = 1, pn = 0, start w pozycji startowej env albo, jesli jej brak
+    lub wypada na wyjsciu, w pierwszym polu innym niz wyjscie. Oba epizody zaczynaja sie od tego samego stanu
+    modulu random, wiec agenci korzystajacy z niego podejmuja te same decyzje. Zwraca None, jesli przebiegi
+    sa identyczne, albo opis pierwszej roznicy."""
+
+    if max_steps is None:
+        max_steps = 2 * env.width * env.height
+    start_y, start_x = env.start_y, env.start_x
+    if start_y is None or start_x is None or env.map[start_y][start_x] == World.EXIT:
+        start_y, start_x = next((y, x) for y in range(env.height) for x in range(env.width)
+                if env.map[y][x] != World.EXIT)
+    single = Env.from_description(1., 1., 0., env.map, start_y, start_x, env.name)
+
+    # stan po kolejnych ruchach: (y, x, czy zakonczony, liczba ruchow, ostatnia akcja, stan sensora)
+    expected = []
+    single.seed(seed)
+    random.seed(seed)
+    single.reset(agent_factory)
+    for step in range(max_steps + 1):
+        completed = single.is_completed()
+        expected.append((single.agent_y, single.agent_x, completed, single.agent_steps_counter,
+                single.agent_last_action, None if completed else single.agent_sensor))
+        if completed or step == max_steps:
+            break
+        single.step_sense()
+        single.step_move()
+
+    batch = BatchEnv(single, 1, seed)
+    random.seed(seed)
+    batch.reset(agent_factory)
+    for step, state in enumerate(expected):
+        last_action = int(batch.agent_last_action[0])
+        actual = (int(batch.agent_y[0]), int(batch.agent_x[0]), bool(batch.completed[0]),
+                int(batch.agent_steps_counter[0]), BatchEnv.ACTIONS[last_action] if last_action >= 0 else None,
+                None if batch.completed[0] else bool(batch.agent_sensor[0]))
+        if actual != state:
+            return 'step {}: Env (y, x, completed, steps, action, sensor) = {}, BatchEnv {}'.format(step, state,
+                    actual)
+        if step < len(expected) - 1:
+            batch.step_agents()
+    return None
+
+def compare_statistics(env, agent_factory, episodes=200, max_steps=None, seed=0):
+    """Prowadzi episodes epizodow agenta z fabryki agent_factory w srodowisku env i wsad episodes epizodow
+    BatchEnv (limit max_steps ruchow, domyslnie 2 * width * height). Zwraca (srednia i polowa 95% przedzialu
+    ufnosci liczby ruchow w Env, to samo dla BatchEnv, czy roznica srednich miesci sie w CHECK_Z bledach
+    standardowych)."""
+
+    if max_steps is None:
+        max_steps = 2 * env.width * env.height
+    random.seed(seed)
+    env.seed(seed)
+    single_steps = []
+    for _ in range(episodes):
+        env.reset(agent_factory)
+        env.run(max_steps)
+        single_steps.append(env.agent_steps_counter)
+
+    batch = BatchEnv(env, episodes, seed)
+    batch.reset(agent_factory)
+    batch_steps = batch.run(max_steps).tolist()
+
+    single_ci, batch_ci = conf_delta_95(single_steps), conf_delta_95(batch_steps)
+    difference = abs(mean(single_steps) - mean(batch_steps))
+    agrees = difference <= CHECK_Z / Z_95 * (single_ci ** 2 + batch_ci ** 2) ** 0.5
+    return mean(single_steps), single_ci, mean(batch_steps), batch_ci, agrees
+
+def main():
+    from evaluation import load_agent_factory
+    from launcher import env_file_or_dir
+
+    parser = argparse.ArgumentParser(description='Checks that the batched simulator (BatchEnv) plays the same\
+            episodes as Env: exactly with the randomness removed, and in mean steps with the real parameters.')
+    parser.add_argument('-n', dest='episodes', metavar='N', type=int, default=200,
+            help='number of episodes per environment in the comparison of mean steps (default: 200)')
+    parser.add_argument('--seed', metavar='SEED', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('agent', metavar='AGENT', help='file containing Agent class')
+    parser.add_argument('environments', metavar='ENV', nargs='+', type=env_file_or_dir,
+            help='file \'*.in\' containing environment description or directory of such files')
+    args = parser.parse_args()
+
+    agent_factory = load_agent_factory(args.agent)
+    failed = 0
+    for path in [path for paths in args.environments for path in paths]:
+        env = Env(path)
+        difference = compare_exact(env, agent_factory, seed=args.seed)
+        single_mean, single_ci, batch_mean, batch_ci, agrees = compare_statistics(env, agent_factory,
+                args.episodes, seed=args.seed)
+        print('{}: exact {}, steps Env {:.1f} +- {:.1f}, BatchEnv {:.1f} +- {:.1f}{}'.format(path,
+                'ok' if difference is None else 'MISMATCH', single_mean, single_ci, batch_mean, batch_ci,
+                '' if agrees else ' MISMATCH'), flush=True)
+        if difference is not None:
+            print('  ' + difference)
+        failed += difference is not None or not agrees
+    if failed:
+        sys.exit('{} environments differ'.format(failed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# coding: utf-8
+"""Histogram agenta jako tablica i jakosc przekonania agenta.
+
+Metoda histogram() agenta moze zwracac liste list (lub krotke krotek) albo, bez kopiowania, tablice numpy
+height x width lub dowolny obiekt udostepniajacy bufor (protokol buforow, np. memoryview lub array.array
+z height * width wartosciami wiersz po wierszu). histogram_array() zamienia kazda z tych postaci na
+tablice numpy; tablica numpy i bufor sa tylko opakowywane, kopiowane sa jedynie listy.
+
+BeliefQuality mierzy w kazdym kroku, na ile przekonanie agenta (po obserwacji sensora) wskazuje
+rzeczywiste pole agenta: mase prawdopodobienstwa tego pola (po normalizacji histogramu) i jego range
+(1 - pole o najwiekszej wartosci). Range liczona jest pesymistycznie: pole rowne innym polom dostaje range
+najgorszego z nich, wiec plaski histogram (np. jednostajny) ma range height * width, a nie 1."""
+
+import numpy as np
+
+
+def histogram_array(histogram, height, width):
+    """Zwraca histogram jako tablice numpy height x width (bez kopiowania, jesli to mozliwe)."""
+
+    array = np.asarray(histogram)
+    if array.dtype.kind not in 'fiub':
+        array = np.asarray(array, dtype=np.float64)
+    if array.shape != (height, width):
+        if array.size != height * width:
+            raise ValueError('histogram of shape {} does not match the {}x{} map'.format(array.shape, height,
+                    width))
+        array = array.reshape(height, width)
+    return array
+
+def true_cell_mass(histogram, y, x):
+    """Zwraca mase prawdopodobienstwa pola (y, x) w histogramie po normalizacji (0, gdy suma jest zerowa)."""
+
+    total = histogram.sum()
+    return float(histogram[y, x] / total) if total > 0 else 0.
+
+def true_cell_rank(histogram, y, x):
+    """Zwraca pesymistyczna range pola (y, x): liczbe pol histogramu o wartosci nie mniejszej (z nim samym)."""
+
+    return int(np.count_nonzero(histogram >= histogram[y, x]))
+
+
+class BeliefQuality:
+    """Sumy masy i rangi rzeczywistego pola agenta w kolejnych krokach epizodu. Srodowisko (Env)
+    z ustawionym atrybutem belief_quality wywoluje record() po kazdej obserwacji agenta."""
+
+    def __init__(self):
+        self.steps = 0
+        self.mass = 0.
+        self.rank = 0
+
+    def record(self, env):
+        histogram = histogram_array(env.agent.histogram(), env.height, env.width)
+        self.steps += 1
+        self.mass += true_cell_mass(histogram, env.agent_y, env.agent_x)
+        self.rank += true_cell_rank(histogram, env.agent_y, env.agent_x)
+
+    def mean_mass(self):
+        return self.mass / self.steps if self.steps else None
+
+    def mean_rank(self):
+        return self.rank / float(self.steps) if self.steps else None
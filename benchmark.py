@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Pomiar skalowania srodowiska i agentow wraz z rozmiarem mapy.
+
+Dla kazdego rozmiaru mapy (domyslnie od 10x10 do 1000x1000) losowana jest jedna mapa (worlds_generator,
+stale ziarno), a dla kazdego agenta mierzone sa:
+- env_init_s - wczytanie srodowiska z pliku '*.in' (Env),
+- reset_cold_s - pierwszy reset z pusta pamiecia podreczna modeli map (konstruktor agenta i dane pochodne
+  mapy), reset_s - sredni czas kolejnych resetow,
+- sense_us, move_us, env_step_us - mediana czasu wywolania sense i move agenta oraz pracy samego
+  srodowiska na jeden ruch (step_sense + step_move); mediana, w odroznieniu od sredniej, nie zalezy od
+  pojedynczych wywolan przerwanych przez system,
+- steps, run_s, steps_per_s - liczba ruchow, laczny czas ruchow i przepustowosc dla --max-steps ruchow
+  (mniej, jesli uplynie --time-limit sekund); po dotarciu do wyjscia epizod zaczynany jest od nowa,
+- peak_memory_bytes - szczytowe zuzycie pamieci (tracemalloc, w osobnym przebiegu, bo tracemalloc
+  spowalnia wykonanie) podczas resetu i --memory-steps ruchow.
+Pomiar czasow powtarzany jest --repeats razy i dla kazdej wielkosci wypisywany jest najlepszy wynik
+(najkrotszy czas, najwieksza przepustowosc), co ogranicza wplyw chwilowego obciazenia maszyny. Powtorzenia
+wykonywane sa w kolejnych rundach obejmujacych wszystkie pary (agent, rozmiar), a nie jedno po drugim, wiec
+rozrzut wynikow powtorzen (spread: najwiekszy minus najmniejszy) obejmuje takze wolne zmiany szybkosci
+maszyny w czasie calego pomiaru.
+
+Z opcja --startup mierzony jest zamiast tego czas uruchamiania w nowych interpreterach (najkrotszy
+z --repeats pomiarow, rowniez wykonywanych w rundach):
+- import_ms - laczny czas importu modulow launchera (python -X importtime) i to, czy zaimportowaly numpy,
+- wall_ms - czas pustego interpretera, jednego krotkiego uruchomienia launchera (jeden agent, jedno
+  srodowisko) i, w przeliczeniu na zadanie, --batch-jobs takich uruchomien w trybie wsadowym.
+
+Wyniki wypisywane sa w tabeli; --save zapisuje je w pliku JSON (punkt odniesienia), a --compare porownuje
+z wczesniej zapisanym plikiem i zglasza regresje wieksze niz --tolerance (kod wyjscia 1). Za regresje
+uznawany jest tylko wzrost wiekszy takze od bezwzglednego progu NOISE_FLOOR danej wielkosci i od SPREAD_FACTOR
+razy wiekszego z rozrzutow powtorzen w obu pomiarach (rozrzut zapisywany jest w punkcie odniesienia), wiec
+szum pomiaru - bardzo krotkich czasow na malych mapach czy ciezszych agentow na obciazonej maszynie - nie
+jest zglaszany.
+
+> benchmark.py [--sizes N ...] [--agents AGENT ...] [--save PLIK] [--compare PLIK]
+> benchmark.py --startup [--save PLIK] [--compare PLIK]"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import map_cache
+from environment import Env
+from evaluation import load_agent_factory
+from profiling import LatencyProfile
+from worlds_generator import format_world, sample_world
+
+SIZES = (10, 20, 50, 100, 200, 500, 1000)
+
+WORLD = {'pit_prob': 0.2, 'p': 0.9, 'pj': 0.7, 'pn': 0.1}
+"""Parametry losowanych map."""
+
+STARTUP_MODULES = ('launcher', 'evaluation', 'environment_set', 'environment', 'map_cache', 'world_pack', 'numpy')
+"""Moduly, ktorych czas importu mierzy --startup."""
+
+STARTUP_JOB = ['-n', '1', '--seed', '0', os.path.join('agents', 'snake_agent.py'),
+        os.path.join('worlds', 'localization1.in')]
+"""Argumenty krotkiego uruchomienia launchera mierzonego przez --startup."""
+
+TIMED = ('env_init_s', 'reset_cold_s', 'reset_s', 'sense_us', 'move_us', 'env_step_us')
+"""Wielkosci porownywane z punktem odniesienia (wieksza wartosc oznacza regresje); dochodzi do nich
+odwrotnosc steps_per_s i peak_memory_bytes."""
+
+NOISE_FLOOR = {
+    'env_init_s': 1e-3, 'reset_cold_s': 5e-3, 'reset_s': 1e-3, 'sense_us': 25., 'move_us': 25., 'env_step_us': 25.,
+    '1/steps_per_s': 5e-5, 'peak_memory_bytes': 2 ** 16, 'import_ms': 2., 'wall_ms': 10.
+}
+"""Najmniejszy bezwzgledny wzrost wielkosci (w jej jednostkach) uznawany za regresje."""
+
+SPREAD_FACTOR = 2.
+"""Wzrost wielkosci musi przekraczac SPREAD_FACTOR razy wiekszy z rozrzutow powtorzen jej pomiaru w punkcie
+odniesienia i w biezacym pomiarze."""
+
+REPEATS = 5
+"""Domyslna liczba powtorzen pomiaru czasow (z --startup: STARTUP_REPEATS)."""
+
+STARTUP_REPEATS = 5
+
+
+def write_world(directory, size, seed=0):
+    """Losuje mape size x size i zapisuje ja w katalogu directory. Zwraca sciezke pliku."""
+
+    area_map, start_y, start_x = sample_world(np.random.default_rng([seed, size]), size, size, WORLD['pit_prob'])
+    path = os.path.join(directory, 'map{0}x{0}.in'.format(size))
+    with open(path, 'w') as f:
+        f.write(format_world(WORLD['p'], WORLD['pj'], WORLD['pn'], area_map, start_y, start_x))
+    return path
+
+def run_steps(env, agent_factory, max_steps, time_limit):
+    """Wykonuje max_steps ruchow agenta (lub mniej, jesli uplynie time_limit sekund); po dotarciu do wyjscia
+    srodowisko jest resetowane, a czas resetu nie jest wliczany. Zwraca (liczba ruchow, czas ruchow)."""
+
+    steps = 0
+    elapsed = 0.
+    while steps < max_steps and elapsed < time_limit:
+        if env.is_completed():
+            env.reset(agent_factory)
+        start_time = time.perf_counter()
+        env.step_sense()
+        env.step_move()
+        elapsed += time.perf_counter() - start_time
+        steps += 1
+    return steps, elapsed
+
+def measure(agent_factory, path, resets=3, max_steps=1000, time_limit=10., memory_steps=10, seed=0):
+    """Mierzy agenta z fabryki agent_factory w srodowisku z pliku path. Zwraca slownik wielkosci; pamiec
+    mierzona jest tylko dla dodatniego memory_steps."""
+
+    start_time = time.perf_counter()
+    env = Env(path)
+    result = {'env_init_s': time.perf_counter() - start_time}
+    # ziarna srodowiska i agenta sa stale, wiec powtorzenia pomiaru wykonuja te same ruchy
+    env.seed(seed)
+    random.seed(seed)
+
+    map_cache.clear_cache()
+    start_time = time.perf_counter()
+    env.reset(agent_factory)
+    result['reset_cold_s'] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(resets):
+        env.reset(agent_factory)
+    result['reset_s'] = (time.perf_counter() - start_time) / resets
+
+    env.profile = LatencyProfile()
+    steps, seconds = run_steps(env, agent_factory, max_steps, time_limit)
+    histograms = env.profile.histograms
+    env.profile = None
+    result['steps'] = steps
+    result['run_s'] = seconds
+    result['steps_per_s'] = steps / seconds if seconds > 0 else None
+    if steps > 0:
+        result['sense_us'] = histograms['agent.sense'].percentile(50) * 1e6
+        result['move_us'] = histograms['agent.move'].percentile(50) * 1e6
+        result['env_step_us'] = (histograms['env.step_sense'].percentile(50) +
+                histograms['env.step_move'].percentile(50)) * 1e6
+
+    if memory_steps <= 0:
+        return result
+    map_cache.clear_cache()
+    env = None
+    tracemalloc.start()
+    try:
+        env = Env(path)
+        env.seed(seed)
+        env.reset(agent_factory)
+        run_steps(env, agent_factory, memory_steps, time_limit)
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+def best_of(runs):
+    """Laczy powtorzenia pomiaru runs (wyniki measure, pamiec w pierwszym z nich) i zwraca najlepsze wyniki:
+    najkrotsze czasy z TIMED i najwieksza przepustowosc (z liczba ruchow i czasem tego przebiegu). Pod kluczem
+    'spread' zapisywany jest rozrzut powtorzen (najwiekszy minus najmniejszy wynik) czasow z TIMED
+    i odwrotnosci przepustowosci."""
+
+    result = dict(runs[0])
+    spread = {}
+    for key in TIMED:
+        values = [run[key] for run in runs if run.get(key) is not None]
+        if values:
+            result[key] = min(values)
+            spread[key] = max(values) - min(values)
+    fastest = max(runs, key=lambda run: run.get('steps_per_s') or 0.)
+    for key in ('steps', 'run_s', 'steps_per_s'):
+        result[key] = fastest.get(key)
+    periods = [1. / run['steps_per_s'] for run in runs if run.get('steps_per_s')]
+    if periods:
+        spread['1/steps_per_s'] = max(periods) - min(periods)
+    result['spread'] = spread
+    return result
+
+def is_regression(key, old_value, new_value, tolerance, spread=0.):
+    """Czy wzrost wielkosci key z old_value do new_value przekracza tolerance (wzglednie), NOISE_FLOOR
+    i SPREAD_FACTOR razy rozrzut powtorzen spread."""
+
+    return (bool(old_value) and new_value is not None and new_value > old_value * (1 + tolerance) and
+            new_value - old_value > max(NOISE_FLOOR.get(key, 0.), SPREAD_FACTOR * spread))
+
+def spread_of(key, old, new):
+    """Wiekszy z rozrzutow powtorzen wielkosci key w wierszach wynikow old i new (0, jesli ich brak)."""
+
+    return max(old.get('spread', {}).get(key, 0.), new.get('spread', {}).get(key, 0.))
+
+def metadata():
+    """Opis srodowiska pomiaru: wersje interpretera i numpy, platforma, czas i (jesli dostepny) commit git."""
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def compare(results, baseline, tolerance):
+    """Zwraca liste opisow regresji: wielkosci gorszych od punktu odniesienia o wiecej niz tolerance
+    (wzglednie), NOISE_FLOOR i SPREAD_FACTOR razy rozrzut powtorzen, dla par (agent, rozmiar) obecnych w obu
+    zbiorach wynikow."""
+
+    previous = {(row['agent'], row['size']): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        old = previous.get((row['agent'], row['size']))
+        if old is None:
+            continue
+        pairs = [(key, old.get(key), row.get(key)) for key in TIMED + ('peak_memory_bytes',)]
+        if old.get('steps_per_s') and row.get('steps_per_s'):
+            pairs.append(('1/steps_per_s', 1. / old['steps_per_s'], 1. / row['steps_per_s']))
+        for key, old_value, new_value in pairs:
+            if is_regression(key, old_value, new_value, tolerance, spread_of(key, old, row)):
+                regressions.append('{} {}x{} {}: {:.4g} -> {:.4g} ({:+.0%})'.format(row['agent'], row['size'],
+                        row['size'], key, old_value, new_value, new_value / old_value - 1))
+    return regressions
+
+def import_time(module, directory):
+    """Importuje modul w nowym interpreterze (python -X importtime). Zwraca (laczny czas importu
+    w milisekundach, czy zaimportowano numpy)."""
+
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+            'import sys, {}; print("numpy" in sys.modules)'.format(module)], cwd=directory, capture_output=True,
+            text=True, check=True)
+    for line in process.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2] == ' ' + module:
+            return int(parts[1]) / 1000., process.stdout.strip() == 'True'
+    return None, process.stdout.strip() == 'True'
+
+def wall_time(command, directory, stdin=None):
+    """Zwraca czas wykonania polecenia command (w milisekundach)."""
+
+    start_time = time.perf_counter()
+    subprocess.run(command, cwd=directory, input=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            text=True, check=True)
+    return (time.perf_counter() - start_time) * 1000.
+
+def measure_startup(directory, repeats=STARTUP_REPEATS, batch_jobs=20):
+    """Mierzy czas uruchamiania (patrz opis modulu) w repeats rundach obejmujacych wszystkie pomiary. Zwraca
+    liste wierszy z kluczem 'name'; pod kluczem 'spread' zapisywany jest rozrzut wynikow rund."""
+
+    launcher = os.path.join(directory, 'launcher.py')
+    jobs = ' '.join(STARTUP_JOB[4:]) + '\n'
+    # (nazwa, polecenie, standardowe wejscie, liczba zadan)
+    commands = [('python -c pass', [sys.executable, '-c', 'pass'], None, 1),
+            ('launcher.py ' + ' '.join(STARTUP_JOB), [sys.executable, launcher] + STARTUP_JOB, None, 1),
+            ('launcher.py --batch, per job', [sys.executable, launcher, '--batch', '-'] + STARTUP_JOB[:4],
+                    jobs * batch_jobs, batch_jobs)]
+    imports = {module: [] for module in STARTUP_MODULES}
+    walls = {name: [] for name, _, _, _ in commands}
+    for _ in range(max(1, repeats)):
+        for module in STARTUP_MODULES:
+            imports[module].append(import_time(module, directory))
+        for name, command, stdin, count in commands:
+            walls[name].append(wall_time(command, directory, stdin) / count)
+
+    def wall_row(name):
+        times = walls[name]
+        return {'name': name, 'wall_ms': min(times), 'spread': {'wall_ms': max(times) - min(times)}}
+
+    rows = [wall_row(commands[0][0])]
+    for module in STARTUP_MODULES:
+        import_ms, numpy = min(imports[module])
+        row = {'name': 'import ' + module, 'import_ms': import_ms, 'numpy': numpy}
+        if import_ms is not None:
+            row['spread'] = {'import_ms': max(imports[module])[0] - import_ms}
+        rows.append(row)
+    rows.extend(wall_row(name) for name, _, _, _ in commands[1:])
+    return rows
+
+def compare_startup(rows, baseline, tolerance):
+    """Zwraca liste opisow regresji czasu uruchamiania wzgledem punktu odniesienia."""
+
+    previous = {row['name']: row for row in baseline.get('startup', [])}
+    regressions = []
+    for row in rows:
+        old = previous.get(row['name'], {})
+        for key in ('import_ms', 'wall_ms'):
+            old_value = old.get(key)
+            new_value = row.get(key)
+            if is_regression(key, old_value, new_value, tolerance, spread_of(key, old, row)):
+                regressions.append('{} {}: {:.4g} -> {:.4g} ({:+.0%})'.format(row['name'], key, old_value,
+                        new_value, new_value / old_value - 1))
+        if row.get('numpy') and old.get('numpy') is False:
+            regressions.append('{}: now imports numpy'.format(row['name']))
+    return regressions
+
+def format_table(results, columns=('agent', 'size', 'env_init_s', 'reset_cold_s', 'reset_s', 'sense_us', 'move_us',
+        'env_step_us', 'steps', 'steps_per_s', 'peak_memory_bytes')):
+    columns = list(columns)
+    rows = [columns]
+    for row in results:
+        cells = []
+        for column in columns:
+            value = row.get(column)
+            cells.append('-' if value is None else '{:.4g}'.format(value) if isinstance(value, float) else str(value))
+        rows.append(cells)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return '\n'.join(' '.join(cell.rjust(width) if i else cell.ljust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))) for row in rows)
+
+def main():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Measures how the Lost Wumpus environment and agents scale\
+            with the map size.', fromfile_prefix_chars='@')
+    parser.add_argument('--sizes', metavar='N', type=int, nargs='+', default=list(SIZES),
+            help='side lengths of the square maps (default: {})'.format(' '.join(map(str, SIZES))))
+    parser.add_argument('--agents', metavar='AGENT', nargs='+',
+            default=sorted(glob.glob(os.path.join(directory, 'agents', '*.py'))),
+            help='files with agent implementations (default: all bundled agents)')
+    parser.add_argument('--resets', metavar='N', type=int, default=3, help='number of timed resets (default: 3)')
+    parser.add_argument('--max-steps', dest='max_steps', metavar='N', type=int, default=1000,
+            help='maximal number of timed steps (default: 1000)')
+    parser.add_argument('--time-limit', dest='time_limit', metavar='SEC', type=float, default=10.,
+            help='maximal time of the timed steps of one agent and map (default: 10)')
+    parser.add_argument('--memory-steps', dest='memory_steps', metavar='N', type=int, default=10,
+            help='number of steps traced for the peak memory (default: 10)')
+    parser.add_argument('--save', metavar='FILE', default=None, help='save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', default=None,
+            help='compare the results with a JSON baseline and exit with status 1 on regressions')
+    parser.add_argument('--tolerance', metavar='T', type=float, default=0.3,
+            help='relative slowdown reported as a regression, if it also exceeds the absolute noise floor of the\
+            measured quantity and {:g} times the spread of its repeated measurements (default: 0.3)'.format(
+            SPREAD_FACTOR))
+    parser.add_argument('--startup', action='store_true', default=False,
+            help='measure import and startup times of the launcher instead of the map size scaling')
+    parser.add_argument('--repeats', metavar='N', type=int, default=None,
+            help='number of measurements of which the best is reported (default: {}, with --startup: {})'.format(
+            REPEATS, STARTUP_REPEATS))
+    parser.add_argument('--batch-jobs', dest='batch_jobs', metavar='N', type=int, default=20,
+            help='with --startup, number of jobs of the measured launcher batch (default: 20)')
+    args = parser.parse_args()
+    if min(args.sizes) < 2:
+        parser.error('--sizes must be at least 2, a world needs a field other than the exit')
+
+    if args.startup:
+        rows = measure_startup(directory, args.repeats or STARTUP_REPEATS, args.batch_jobs)
+        print(format_table(rows, ['name', 'import_ms', 'numpy', 'wall_ms']))
+        report(args, {'meta': metadata(), 'startup': rows},
+                lambda baseline: compare_startup(rows, baseline, args.tolerance))
+        return
+
+    repeats = max(1, args.repeats or REPEATS)
+    agent_factories = [load_agent_factory(agent_path) for agent_path in args.agents]
+    runs = {}
+    with tempfile.TemporaryDirectory() as worlds:
+        paths = [write_world(worlds, size) for size in args.sizes]
+        # kazda runda mierzy wszystkie pary (agent, rozmiar); pamiec mierzona jest tylko w pierwszej
+        for repeat in range(repeats):
+            for size, path in zip(args.sizes, paths):
+                for agent_path, agent_factory in zip(args.agents, agent_factories):
+                    run = measure(agent_factory, path, args.resets, args.max_steps, args.time_limit,
+                            args.memory_steps if repeat == 0 else 0)
+                    runs.setdefault((agent_path, size), []).append(run)
+                    print('{} {}x{} ({}/{}): {} steps in {:.3f} s'.format(os.path.basename(agent_path), size, size,
+                            repeat + 1, repeats, run['steps'], run['run_s']), file=sys.stderr, flush=True)
+
+    results = []
+    for size in args.sizes:
+        for agent_path in args.agents:
+            row = {'agent': os.path.basename(agent_path), 'size': size}
+            row.update(best_of(runs[agent_path, size]))
+            results.append(row)
+
+    print(format_table(results))
+    report(args, {'meta': metadata(), 'results': results},
+            lambda baseline: compare(results, baseline, args.tolerance))
+
+def report(args, document, find_regressions):
+    """Zapisuje wyniki (--save) i porownuje je z punktem odniesienia (--compare), konczac program z kodem 1,
+    jesli find_regressions(punkt odniesienia) zwroci regresje."""
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = find_regressions(json.load(f))
+        for line in regressions:
+            print('Regression: ' + line)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
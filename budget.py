@@ -0,0 +1,67 @@
+# coding: utf-8
+"""Limity czasu wywolan agenta.
+
+TimeBudget okresla dopuszczalny czas pojedynczego wywolania konstruktora agenta oraz metod sense i move.
+Srodowisko (Env) z ustawionym atrybutem budget mierzy kazde wywolanie i:
+- liczy przekroczenia limitu (Env.agent_overruns),
+- przerywa epizod, gdy liczba przekroczen przekroczy max_overruns,
+- jesli podano kill_after, przerywa wywolanie trwajace dluzej niz kill_after sekund (sygnalem SIGALRM,
+  tylko w glownym watku procesu na systemach, ktore go udostepniaja), wiec zawieszony agent nie blokuje
+  oceny.
+Przerwany epizod traktowany jest jak epizod, w ktorym agent wyczerpal limit ruchow."""
+
+from contextlib import contextmanager
+import signal
+import threading
+
+
+class AgentFailure(Exception):
+    """Blad agenta, po ktorym epizod zostaje przerwany."""
+
+
+class AgentTimeout(AgentFailure):
+    """Agent przekroczyl limit czasu."""
+
+
+def _interrupt(signum, frame):
+    raise AgentTimeout('call interrupted after exceeding the kill_after limit')
+
+def _can_interrupt():
+    return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+
+class TimeBudget:
+    """Limity czasu (w sekundach, None oznacza brak limitu) wywolan konstruktora (init), sense i move."""
+
+    def __init__(self, init=None, sense=None, move=None, max_overruns=0, kill_after=None):
+        self.limits = {'__init__': init, 'sense': sense, 'move': move}
+        self.max_overruns = max_overruns
+        self.kill_after = kill_after
+
+    def is_overrun(self, call, seconds):
+        """Sprawdza czy wywolanie call ('__init__', 'sense' lub 'move') trwajace seconds przekroczylo limit."""
+
+        limit = self.limits[call]
+        return limit is not None and seconds > limit
+
+    def check(self, overruns):
+        """Zglasza AgentTimeout, jesli liczba przekroczen overruns jest wieksza od dopuszczalnej."""
+
+        if overruns > self.max_overruns:
+            raise AgentTimeout('time budget exceeded {} times'.format(overruns))
+
+    @contextmanager
+    def guard(self):
+        """Przerywa wykonanie bloku wyjatkiem AgentTimeout po kill_after sekundach (o ile to mozliwe)."""
+
+        if self.kill_after is None or not _can_interrupt():
+            yield
+            return
+
+        previous = signal.signal(signal.SIGALRM, _interrupt)
+        signal.setitimer(signal.ITIMER_REAL, self.kill_after)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
@@ -1,7 +1,9 @@
 # coding: utf-8
 import random
+from time import perf_counter
 from world import World
 from action import Action
+from budget import AgentFailure
 
 class Env:
     """Srodowisko zagubionego Wumpusa.
@@ -12,7 +14,10 @@ class Env:
     - prawdopodobienstwa wyczucia jamy gdy stoi sie poza nia (pn),
     - (opcjonalnie) pozycji poczatkowej agentow umieszczanych w srodowisku (start_y, start_x: 0 <= start_y < height, 0 <= start_x < width),
     - wysokosci (height) i szerokosci (width) mapy,
-    - mapy swiata (map).
+    - mapy swiata (map),
+    - nazwy srodowiska (name), na przyklad sciezki pliku z opisem,
+    - generatora liczb losowych (rng) uzywanego przy losowaniu pozycji startowej, zaburzen ruchu i stanu
+      sensora; jest on niezalezny od modulu random, z ktorego korzystaja agenci.
 
     Mapa to krotka zawierajaca height lancuchow o dlugosci width znakow kazdy. Podczas odczytywania mapy najpierw podaje sie numer wiersza (wspolrzedna y) a potem numer kolumny (wspolrzedna x). W przypadku pominięcia współrzędnych startowych, początkowa pozycja agenta jest losowana.
 
@@ -22,7 +27,21 @@ class Env:
     - liczba ruchow wykonanych przez agenta (agent_steps_counter),
     - ostatnia akcja wykonana przez agenta (agent_last_action), poczatkowo None,
     - ostatnie przemieszczenie wykonane przez agenta (agent_last_motion), poczatkowo None,
-    - aktualny stan sensora agenta (agent_sensor), po osiagnieciu wyjscia None."""
+    - aktualny stan sensora agenta (agent_sensor), po osiagnieciu wyjscia None,
+    - laczny czas (w sekundach) spedzony w metodach agenta: konstruktorze, sense i move (agent_seconds).
+
+    Jesli atrybut profile wskazuje obiekt profiling.LatencyProfile, zapisywane sa w nim czasy kazdego
+    wywolania metod agenta oraz czas pracy samego srodowiska w reset, step_sense i step_move.
+
+    Jesli atrybut budget wskazuje obiekt budget.TimeBudget, kazde wywolanie metod agenta sprawdzane jest
+    z limitami czasu; liczba przekroczen zapisywana jest w agent_overruns, a przyczyna przerwania
+    epizodu w agent_failure (None, jesli epizod nie zostal przerwany).
+
+    Jesli atrybut recorder wskazuje obiekt trajectory.TrajectoryRecorder, zapisywany jest w nim przebieg
+    kazdego epizodu (ruchy, przemieszczenia, stany sensora i opcjonalnie histogramy agenta).
+
+    Jesli atrybut belief_quality wskazuje obiekt belief_quality.BeliefQuality, po kazdej obserwacji
+    agenta mierzona jest jakosc jego przekonania (histogramu) wzgledem rzeczywistej pozycji."""
 
     __MOTIONS = {
         Action.UP : (-1, 0),
@@ -43,37 +62,75 @@ class Env:
 
         Argument path to sciezka do pliku zawierajacego opis srodowiska."""
 
+        p, pj, pn, area_map, start_y, start_x = Env.read_description(path)
+        self.__setup(p, pj, pn, len(area_map), len(area_map[0]), area_map, start_y, start_x, path)
+        return
+
+    @staticmethod
+    def read_description(path):
+        """Czyta opis srodowiska z pliku (format jak w konstruktorze) i zwraca krotke
+        (p, pj, pn, area_map, start_y, start_x); wspolrzedne startowe numerowane sa od 0 lub sa None."""
+
         file = open(path, 'r')
 
-        self.p = float(file.readline().strip())
+        p = float(file.readline().strip())
 
         tokens = file.readline().strip().split()
-        self.pj = float(tokens[0])
-        self.pn = float(tokens[1])
+        pj = float(tokens[0])
+        pn = float(tokens[1])
 
         tokens = file.readline().strip().split()
-        self.height = int(tokens[0])
-        self.width = int(tokens[1])
+        height = int(tokens[0])
+        width = int(tokens[1])
 
-        self.map = []
-        for i in range(self.height):
-            self.map.append(file.readline().strip()[:self.width])
-        self.map = tuple(self.map)
+        area_map = []
+        for i in range(height):
+            area_map.append(file.readline().strip()[:width])
 
         tokens = file.readline().strip().split()
         if tokens:
-            self.start_y = int(tokens[0]) - 1
-            self.start_x = int(tokens[1]) - 1
+            start_y = int(tokens[0]) - 1
+            start_x = int(tokens[1]) - 1
         else:
-            self.start_y = self.start_x = None
+            start_y = start_x = None
 
         file.close()
 
+        return p, pj, pn, tuple(area_map), start_y, start_x
+
+    @classmethod
+    def from_description(cls, p, pj, pn, area_map, start_y=None, start_x=None, name=None):
+        """Tworzy srodowisko bezposrednio z parametrow i mapy (sekwencji height lancuchow o dlugosci width),
+        bez czytania pliku. Wspolrzedne startowe numerowane sa od 0."""
+
+        env = cls.__new__(cls)
+        env.__setup(p, pj, pn, len(area_map), len(area_map[0]), area_map, start_y, start_x, name)
+        return env
+
+    def __setup(self, p, pj, pn, height, width, area_map, start_y, start_x, name):
+        """Inicjalizuje srodowisko o podanych parametrach."""
+
+        self.name = name
+        self.p = p
+        self.pj = pj
+        self.pn = pn
+        self.height = height
+        self.width = width
+        self.map = tuple(area_map)
+        self.start_y = start_y
+        self.start_x = start_x
+
         self.thresholds = {
             World.CAVE : self.pj,
             World.EMPTY : self.pn
         }
 
+        self.rng = random.Random()
+        self.profile = None
+        self.budget = None
+        self.recorder = None
+        self.belief_quality = None
+
         self.agent = None
         self.agent_y = None
         self.agent_x = None
@@ -81,8 +138,16 @@ class Env:
         self.agent_last_motion = None
         self.agent_last_action = None
         self.agent_sensor = None
+        self.agent_seconds = None
+        self.agent_overruns = None
+        self.agent_failure = None
         return
 
+    def seed(self, seed=None):
+        """Ustawia nowy generator liczb losowych srodowiska zainicjalizowany ziarnem seed."""
+
+        self.rng = random.Random(seed)
+
     def __str__(self):
         """Zwraca biezacy opis agenta w srodowisku."""
 
@@ -101,15 +166,15 @@ class Env:
         if self.is_completed():
             self.agent_sensor = None
         else:
-            self.agent_sensor = random.uniform(0, 1) < self.thresholds[self.__agent_field()]
+            self.agent_sensor = self.rng.random() < self.thresholds[self.__agent_field()]
 
     def __randomize_agent_motion(self):
         """Realizuje ruch agenta na podstawie ostanio wybranej przez niego akcji. Ruch jest zaburzany lub nie na postawie odpowiedniego rozkladu prawdopodobienstwa."""
 
         motion = list(Env.__MOTIONS[self.agent_last_action])
 
-        if random.uniform(0, 1) >= self.p:
-            motion_modification = random.choice(list(Env.__MOTIONS.values()))
+        if self.rng.random() >= self.p:
+            motion_modification = self.rng.choice(list(Env.__MOTIONS.values()))
             motion[0] += motion_modification[0]
             motion[1] += motion_modification[1]
 
@@ -122,35 +187,90 @@ class Env:
         self.agent_last_motion = tuple(motion)
         return
 
+    def __call_agent(self, call, function, *args):
+        """Wywoluje metode agenta, doliczajac czas wywolania do agent_seconds i sprawdzajac limit czasu.
+        Zwraca wynik metody oraz czas wywolania."""
+
+        start_time = perf_counter()
+        try:
+            if self.budget is None:
+                result = function(*args)
+            else:
+                with self.budget.guard():
+                    result = function(*args)
+        finally:
+            agent_time = perf_counter() - start_time
+            self.agent_seconds += agent_time
+            if self.profile is not None:
+                self.profile.record('agent.' + call, agent_time)
+            overrun = self.budget is not None and self.budget.is_overrun(call, agent_time)
+            if overrun:
+                self.agent_overruns += 1
+
+        if overrun:
+            self.budget.check(self.agent_overruns)
+        return result, agent_time
+
     def reset(self, agent_factory):
-        """Resetuje srodowisko i umieszcza w nim podanego w argumencie agenta."""
+        """Resetuje srodowisko i umieszcza w nim podanego w argumencie agenta. Jesli konstruktor agenta
+        przekroczy limit czasu, agent_failure opisuje przyczyne, a run() nie wykona zadnego ruchu."""
+
+        start_time = perf_counter()
+        self.agent = None
+        self.agent_seconds = 0.
+        self.agent_overruns = 0
+        self.agent_failure = None
+        try:
+            self.agent, agent_time = self.__call_agent('__init__', agent_factory, self.p, self.pj, self.pn,
+                    self.height, self.width, self.map)
+        except AgentFailure as e:
+            self.agent_failure = e
+            agent_time = self.agent_seconds
 
-        self.agent = agent_factory(self.p, self.pj, self.pn, self.height, self.width, self.map)
         self.agent_x = self.start_x
         self.agent_y = self.start_y
         # Jeśli nie podano pozycji startowej lub wypada ona na wyjściu, wylosuj inną.
         while self.agent_x is None or self.agent_y is None or self.map[self.agent_y][self.agent_x] == World.EXIT:
-            self.agent_x = random.randint(0, self.width - 1)
-            self.agent_y = random.randint(0, self.height - 1)
+            self.agent_x = self.rng.randint(0, self.width - 1)
+            self.agent_y = self.rng.randint(0, self.height - 1)
 
         self.agent_steps_counter = 0
         self.agent_last_motion = None
         self.agent_last_action = None
         self.__randomize_sensor_state()
+        if self.recorder is not None:
+            self.recorder.start(self)
+
+        if self.profile is not None:
+            self.profile.record('env.reset', perf_counter() - start_time - agent_time)
         return
 
     def step_sense(self):
         """Zmusza agenta znajdujacego sie w srodowisku do dokonania obserwacji."""
 
-        self.agent.sense(self.agent_sensor)
+        start_time = perf_counter()
+        _, agent_time = self.__call_agent('sense', self.agent.sense, self.agent_sensor)
+        if self.recorder is not None:
+            self.recorder.sensed(self)
+        if self.belief_quality is not None:
+            self.belief_quality.record(self)
+
+        if self.profile is not None:
+            self.profile.record('env.step_sense', perf_counter() - start_time - agent_time)
 
     def step_move(self):
         """Zmusza agenta znajdujacego sie w srodowisku do wykonania nastepnego ruchu."""
 
         self.agent_steps_counter += 1
-        self.agent_last_action = self.agent.move()
+        start_time = perf_counter()
+        self.agent_last_action, agent_time = self.__call_agent('move', self.agent.move)
         self.__randomize_agent_motion()
         self.__randomize_sensor_state()
+        if self.recorder is not None:
+            self.recorder.moved(self)
+
+        if self.profile is not None:
+            self.profile.record('env.step_move', perf_counter() - start_time - agent_time)
         return
 
     def is_completed(self):
@@ -159,15 +279,26 @@ class Env:
         return self.__agent_field() == World.EXIT
 
     def run(self, max_steps = None):
-        """Zmusza agenta znajdujacego sie w srodowisku do wykonania kolejnych ruchow tak dlugo az znajdzie wyjscie lub wykona max_steps ruchuow (o ile zostanie okreslone)."""
-
-        if max_steps is None:
-            while not self.is_completed():
-                self.step_sense()
-                self.step_move()
-        else:
-            for i in range(max_steps):
-                if self.is_completed():
-                    break
-                self.step_sense()
-                self.step_move()
+        """Zmusza agenta znajdujacego sie w srodowisku do wykonania kolejnych ruchow tak dlugo az znajdzie wyjscie lub wykona max_steps ruchuow (o ile zostanie okreslone).
+
+        Jesli agent przekroczy limit czasu (patrz budget), epizod jest przerywany, przyczyna zapisywana w agent_failure, a licznik ruchow ustawiany na max_steps (kara jak za wyczerpanie limitu ruchow)."""
+
+        try:
+            if self.agent_failure is not None:
+                raise self.agent_failure
+            if max_steps is None:
+                while not self.is_completed():
+                    self.step_sense()
+                    self.step_move()
+            else:
+                for i in range(max_steps):
+                    if self.is_completed():
+                        break
+                    self.step_sense()
+                    self.step_move()
+        except AgentFailure as e:
+            self.agent_failure = e
+            if max_steps is not None:
+                self.agent_steps_counter = max_steps
+        if self.recorder is not None:
+            self.recorder.finish(self)
@@ -0,0 +1,120 @@
+# coding: utf-8
+"""Zbior srodowisk z plikow '*.in' i zbiorow swiatow '*.wpk'.
+
+Modul nie importuje numpy - modul world_pack (i numpy) importowany jest dopiero przy pierwszym odwolaniu
+do zbioru swiatow '*.wpk', wiec ocena agentow w srodowiskach z plikow '*.in' uruchamia sie szybko."""
+
+import bisect
+import collections
+import glob
+import os.path
+from environment import Env
+
+# liczba ostatnio uzytych opisow plikow '*.in' pamietanych przez zbior srodowisk
+DESCRIPTION_CACHE = 16
+
+
+class EnvironmentLoadError(Exception):
+    """Blad wczytywania srodowiska; komunikat zawiera nazwe srodowiska i pierwotna przyczyne."""
+
+
+class EnvironmentSet:
+    """Sekwencja srodowisk z plikow '*.in' i zbiorow swiatow '*.wpk' wczytywanych leniwie.
+
+    Plik '*.in' czytany jest dopiero przy odwolaniu do srodowiska; opisy (parametry i mapa) DESCRIPTION_CACHE
+    ostatnio uzytych plikow pamietane sa w zbiorze (bez przesylania do innych procesow), wiec zuzycie pamieci
+    nie zalezy od liczby plikow. Kazde odwolanie tworzy z opisu nowy obiekt Env, wiec kolejne proby nie dziela
+    stanu srodowiska. Swiaty ze zbiorow '*.wpk' odczytywane sa z pliku odwzorowanego w pamieci. Bledy
+    wczytywania zglaszane sa jako EnvironmentLoadError z rzeczywista przyczyna przy odwolaniu do srodowiska;
+    validate() pozwala wykryc je przed rozpoczeciem oceny."""
+
+    def __init__(self, paths):
+        """Tworzy zbior z listy sciezek. Pliki '*.wpk' sa otwierane od razu, aby poznac liczbe swiatow
+        i sprawdzic ich poprawnosc; pliki '*.in' czytane sa dopiero przy odwolaniu."""
+
+        self.paths = list(paths)
+        self.ends = []
+        self.__packs = {}
+        self.__descriptions = collections.OrderedDict()
+        total = 0
+        for path in self.paths:
+            if path.endswith('.wpk'):
+                try:
+                    total += len(self.__pack(path))
+                except Exception as e:
+                    raise EnvironmentLoadError("can't load world pack from '{}': {}".format(path, e)) from e
+            else:
+                total += 1
+            self.ends.append(total)
+
+    def __pack(self, path):
+        if path not in self.__packs:
+            from world_pack import WorldPack
+            self.__packs[path] = WorldPack(path)
+        return self.__packs[path]
+
+    def __description(self, path):
+        if path in self.__descriptions:
+            self.__descriptions.move_to_end(path)
+            return self.__descriptions[path]
+        try:
+            description = Env.read_description(path)
+        except Exception as e:
+            raise EnvironmentLoadError("can't load environment from '{}': {}: {}".format(path,
+                    type(e).__name__, e)) from e
+        self.__descriptions[path] = description
+        if len(self.__descriptions) > DESCRIPTION_CACHE:
+            self.__descriptions.popitem(last=False)
+        return description
+
+    def validate(self):
+        """Wczytuje opisy wszystkich plikow '*.in' (pamietajac tylko ostatnie); pierwszy bledny plik
+        zglaszany jest jako EnvironmentLoadError."""
+
+        for path in self.paths:
+            if not path.endswith('.wpk'):
+                self.__description(path)
+
+    def __getstate__(self):
+        # odwzorowane w pamieci pliki i zapamietane opisy nie sa przesylane do innych procesow, zostana
+        # wczytane ponownie
+        state = self.__dict__.copy()
+        state['_EnvironmentSet__packs'] = {}
+        state['_EnvironmentSet__descriptions'] = collections.OrderedDict()
+        return state
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('environment index out of range')
+
+        segment = bisect.bisect_right(self.ends, index)
+        path = self.paths[segment]
+        if not path.endswith('.wpk'):
+            return Env.from_description(*self.__description(path), name=path)
+        try:
+            first = self.ends[segment - 1] if segment > 0 else 0
+            return self.__pack(path)[index - first]
+        except Exception as e:
+            raise EnvironmentLoadError("can't load environment from '{}': {}: {}".format(path,
+                    type(e).__name__, e)) from e
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def environment_files(paths):
+    """Zwraca posortowane sciezki plikow '*.in' z podanych plikow i katalogow."""
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.in'))))
+        else:
+            files.append(path)
+    return files
@@ -0,0 +1,311 @@
+# coding: utf-8
+"""Ocena agenta w srodowiskach zagubionego Wumpusa.
+
+Praca dzielona jest na jednostki (proba, srodowisko). Kazda jednostka ma dwa niezalezne strumienie liczb
+losowych wyznaczone przez ziarno, numer proby i numer srodowiska: jeden dla srodowiska (Env.rng) i drugi
+dla agenta (modul random). Dzieki temu wynik nie zalezy od tego czy jednostki wykonywane sa szeregowo,
+czy w puli procesow, ani od liczby procesow w puli, a zmiany w agencie nie zmieniaja przebiegu losowan
+srodowiska."""
+
+from collections import namedtuple
+import csv
+import importlib
+import importlib.util
+import itertools
+import json
+import os.path
+import random
+import sys
+import threading
+from time import perf_counter
+import map_cache
+from profiling import LatencyProfile
+
+UnitResult = namedtuple('UnitResult', ['trial', 'env_index', 'env', 'steps', 'max_steps', 'capped', 'seconds',
+        'agent_seconds', 'env_seconds', 'overruns', 'aborted', 'p', 'pj', 'pn', 'height', 'width', 'belief_mass',
+        'belief_rank'])
+"""Wynik jednostki pracy: liczba ruchow, czy agent wyczerpal limit max_steps nie znajdujac wyjscia, czas
+calkowity, czas spedzony w metodach agenta i w srodowisku, liczba przekroczen limitu czasu i czy epizod
+zostal z tego powodu przerwany, parametry mapy oraz, jesli byla mierzona, srednia masa i ranga rzeczywistego
+pola agenta w jego histogramie (patrz belief_quality; w przeciwnym razie None)."""
+
+
+class AgentLoadError(Exception):
+    """Nie udalo sie zaimportowac modulu agenta (w biezacym lub w osobnym procesie)."""
+
+
+def load_agent_factory(path):
+    """Importuje modul agenta z pliku path i zwraca zdefiniowana w nim klase Agent. Jesli zaimportowano juz
+    inny modul o tej samej nazwie (np. agenci z roznych katalogow), modul rejestrowany jest pod nazwa
+    uzupelniona o numer."""
+
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.append(directory)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    module = sys.modules.get(name)
+    if module is None:
+        module = importlib.import_module(name)
+    if os.path.abspath(getattr(module, '__file__', None) or '') != path:
+        unique_name = name
+        suffix = 1
+        while unique_name in sys.modules and sys.modules[unique_name].__file__ != path:
+            unique_name = '{}_{}'.format(name, suffix)
+            suffix += 1
+        module = sys.modules.get(unique_name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(unique_name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[unique_name] = module
+            spec.loader.exec_module(module)
+    return module.Agent
+
+_isolated_modules = itertools.count(1)
+
+def load_isolated_agent_factory(path):
+    """Importuje modul agenta z pliku path pod unikalna nazwa i zwraca klase Agent, nie zmieniajac sys.path
+    i nie zostawiajac modulu w sys.modules - modul zwalniany jest razem z klasa. Przeznaczone dla dlugo
+    dzialajacych procesow importujacych wiele zgloszen (server.py); modul agenta moze importowac tylko
+    moduly dostepne w sys.path (np. histogram_filter), a nie pliki obok siebie."""
+
+    name = '_wumpus_agent_{}'.format(next(_isolated_modules))
+    spec = importlib.util.spec_from_file_location(name, os.path.abspath(path))
+    if spec is None:
+        raise ImportError("'{}' is not a Python module".format(path))
+    module = importlib.util.module_from_spec(spec)
+    # modul musi byc w sys.modules w trakcie wykonywania (np. dla dataclasses i pickle)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        del sys.modules[name]
+    return module.Agent
+
+def unit_seed(seed, trial, env_index, stream):
+    """Zwraca ziarno strumienia liczb losowych stream ('env' lub 'agent') jednostki pracy (trial, env_index)."""
+
+    return '{}:{}:{}:{}'.format(seed, trial, env_index, stream)
+
+def run_unit(agent_factory, env, seed, trial, env_index, profile=None, budget=None, trajectories=None,
+        belief_quality=False):
+    """Umieszcza agenta w srodowisku i uruchamia go do znalezienia wyjscia lub wyczerpania limitu
+    ruchow. Zwraca UnitResult. Jesli podano profile (LatencyProfile), zapisywane sa w nim czasy wywolan,
+    jesli podano budget (TimeBudget), wywolania agenta sa sprawdzane z limitami czasu, jesli podano
+    trajectories (trajectory.TrajectoryWriter), przebieg epizodu jest zapisywany, a jesli belief_quality
+    jest prawdziwe, w kazdym kroku mierzona jest jakosc przekonania agenta."""
+
+    env.profile = profile
+    env.budget = budget
+    env.recorder = trajectories.recorder() if trajectories is not None else None
+    quality = None
+    if belief_quality:
+        from belief_quality import BeliefQuality
+        quality = BeliefQuality()
+    env.belief_quality = quality
+    env.seed(unit_seed(seed, trial, env_index, 'env'))
+    random.seed(unit_seed(seed, trial, env_index, 'agent'))
+    max_steps = env.width * env.height * 2
+    start_time = perf_counter()
+    env.reset(agent_factory)
+    env.run(max_steps)
+    seconds = perf_counter() - start_time
+    if env.recorder is not None:
+        trajectories.write(env.recorder.trajectory, trial, env_index)
+        env.recorder = None
+    env.belief_quality = None
+    return UnitResult(trial, env_index, env.name, env.agent_steps_counter, max_steps, not env.is_completed(),
+            seconds, env.agent_seconds, seconds - env.agent_seconds, env.agent_overruns,
+            env.agent_failure is not None, env.p, env.pj, env.pn, env.height, env.width,
+            None if quality is None else quality.mean_mass(), None if quality is None else quality.mean_rank())
+
+def evaluate_agent(agent_factory, environments, seed=None, trial=0, on_unit=None, profile=None, budget=None,
+        trajectories=None, belief_quality=False):
+    """Wykonuje jedna probe: uruchamia agenta kolejno w kazdym srodowisku. Zwraca sume ruchow i czasu.
+    Jesli podano on_unit, jest on wywolywany z wynikiem (UnitResult) kazdego srodowiska."""
+
+    total_steps = 0
+    seconds_used = 0
+    for env_index, env in enumerate(environments):
+        result = run_unit(agent_factory, env, seed, trial, env_index, profile, budget, trajectories,
+                belief_quality)
+        if on_unit is not None:
+            on_unit(result)
+        total_steps += result.steps
+        seconds_used += result.seconds
+    return total_steps, seconds_used
+
+
+_worker_agent_factory = None
+_worker_environments = None
+_worker_profile = False
+_worker_budget = None
+_worker_trajectories = None
+_worker_belief_quality = False
+
+def agent_factory_for(agent_path, sandbox=None, isolated=False):
+    """Zwraca fabryke agentow z pliku agent_path: klase Agent zaimportowana w biezacym procesie (z isolated
+    - przez load_isolated_agent_factory) albo, jesli podano sandbox (sandbox.Sandbox), fabryke agentow
+    dzialajacych w osobnym procesie roboczym."""
+
+    if sandbox is not None:
+        return sandbox.factory(agent_path)
+    if isolated:
+        return load_isolated_agent_factory(agent_path)
+    return load_agent_factory(agent_path)
+
+def _init_worker(agent_path, environments, profile, budget, trajectories, belief_quality, sandbox):
+    """Inicjalizuje proces puli: modul agenta importowany jest tylko raz na proces (albo, z sandbox, proces
+    puli uruchamia jeden wlasny proces roboczy agenta)."""
+
+    global _worker_agent_factory, _worker_environments, _worker_profile, _worker_budget, _worker_trajectories
+    global _worker_belief_quality
+    _worker_agent_factory = agent_factory_for(agent_path, sandbox)
+    _worker_environments = environments
+    _worker_profile = profile
+    _worker_budget = budget
+    _worker_trajectories = trajectories
+    _worker_belief_quality = belief_quality
+
+def _run_worker_unit(unit):
+    trial, env_index, seed = unit
+    profile = LatencyProfile() if _worker_profile else None
+    result = run_unit(_worker_agent_factory, _worker_environments[env_index], seed, trial, env_index, profile,
+            _worker_budget, _worker_trajectories, _worker_belief_quality)
+    return result, os.getpid(), map_cache.cache_info(), profile
+
+def imap_throttled(pool, function, units, chunksize=1, window=None):
+    """Odpowiednik pool.imap_unordered, ktory pobiera z generatora units co najwyzej window jednostek wiecej,
+    niz zostalo juz odebranych wynikow. Pozwala to uzywac nieskonczonych generatorow jednostek i przerwac
+    iteracje w dowolnym momencie bez kolejkowania calej pracy."""
+
+    if window is None:
+        window = 4 * chunksize * pool._processes
+    window = max(window, 2 * chunksize)
+    permits = threading.Semaphore(window)
+    stop = threading.Event()
+
+    def throttled():
+        for unit in units:
+            while not permits.acquire(timeout=0.1):
+                if stop.is_set():
+                    return
+            if stop.is_set():
+                return
+            yield unit
+
+    try:
+        for result in pool.imap_unordered(function, throttled(), chunksize):
+            permits.release()
+            yield result
+    finally:
+        stop.set()
+
+def evaluate_trials(agent_path, environments, trials, seed, jobs=1, cache_info=None, on_unit=None,
+        profile=None, budget=None, trajectories=None, belief_quality=False, sandbox=None):
+    """Generator zwracajacy kolejno, w porzadku numerow prob, krotki (trial, steps, seconds). Jesli trials
+    jest None, proby wykonywane sa az do przerwania iteracji przez wywolujacego.
+
+    Dla jobs > 1 jednostki (proba, srodowisko) rozsylane sa do puli jobs procesow, a ich wyniki
+    scalane w sumy dla poszczegolnych prob. Proba zwracana jest zaraz po tym, jak ona i wszystkie
+    wczesniejsze proby zostana zakonczone.
+
+    Jesli podano slownik cache_info, pod identyfikatorem kazdego procesu wykonujacego jednostki
+    zapisywane sa statystyki jego pamieci podrecznej map (map_cache.cache_info()). Jesli podano on_unit,
+    jest on wywolywany z wynikiem (UnitResult) kazdej jednostki zaraz po jej zakonczeniu. Jesli podano
+    profile (LatencyProfile), zbierane sa w nim czasy wywolan ze wszystkich procesow, jesli podano budget
+    (TimeBudget), wywolania agenta sa sprawdzane z limitami czasu, a jesli podano trajectories
+    (trajectory.TrajectoryWriter), przebieg kazdego epizodu jest zapisywany. Jesli belief_quality jest
+    prawdziwe, wyniki jednostek zawieraja jakosc przekonania agenta (patrz UnitResult). Jesli podano sandbox
+    (sandbox.Sandbox), agent dziala w osobnym procesie roboczym, a jego bledy przerywaja tylko biezacy
+    epizod."""
+
+    if cache_info is None:
+        cache_info = {}
+    trial_numbers = itertools.count() if trials is None else range(trials)
+
+    if jobs <= 1:
+        agent_factory = agent_factory_for(agent_path, sandbox)
+        try:
+            for trial in trial_numbers:
+                steps, seconds = evaluate_agent(agent_factory, environments, seed, trial, on_unit, profile,
+                        budget, trajectories, belief_quality)
+                cache_info[os.getpid()] = map_cache.cache_info()
+                yield trial, steps, seconds
+        finally:
+            if sandbox is not None:
+                agent_factory.close()
+        return
+
+    import multiprocessing
+
+    units = ((trial, env_index, seed) for trial in trial_numbers for env_index in range(len(environments)))
+    chunksize = max(1, len(environments) // (jobs * 4))
+
+    steps = {}
+    seconds_used = {}
+    remaining = {}
+    next_trial = 0
+
+    with multiprocessing.Pool(jobs, _init_worker, (agent_path, environments, profile is not None,
+            budget, trajectories, belief_quality, sandbox)) as pool:
+        for result, pid, info, unit_profile in imap_throttled(pool, _run_worker_unit, units, chunksize):
+            cache_info[pid] = info
+            if profile is not None:
+                profile.merge(unit_profile)
+            if on_unit is not None:
+                on_unit(result)
+            trial = result.trial
+            steps[trial] = steps.get(trial, 0) + result.steps
+            seconds_used[trial] = seconds_used.get(trial, 0) + result.seconds
+            remaining[trial] = remaining.get(trial, len(environments)) - 1
+            while remaining.get(next_trial) == 0:
+                yield next_trial, steps.pop(next_trial), seconds_used.pop(next_trial)
+                del remaining[next_trial]
+                next_trial += 1
+
+
+class ResultsWriter:
+    """Zapisuje strumieniowo wyniki jednostek (UnitResult) do pliku, po jednym rekordzie na pare
+    (proba, srodowisko), w formacie 'jsonl' (obiekt JSON w kazdej linii) lub 'csv' (z naglowkiem).
+    Rekordy moga byc poprzedzone dodatkowymi polami extra_fields (np. nazwa agenta w turnieju)."""
+
+    FORMATS = ('jsonl', 'csv')
+
+    def __init__(self, path, fmt=None, extra_fields=()):
+        """Otwiera plik path do zapisu. Jesli nie podano formatu, wybierany jest na podstawie rozszerzenia
+        pliku ('.csv' oznacza csv, kazde inne jsonl)."""
+
+        if fmt is None:
+            fmt = 'csv' if path.endswith('.csv') else 'jsonl'
+        if fmt not in ResultsWriter.FORMATS:
+            raise ValueError("unknown results format '{}'".format(fmt))
+
+        self.format = fmt
+        self.extra_fields = tuple(extra_fields)
+        self.file = open(path, 'w', newline='')
+        if fmt == 'csv':
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(self.extra_fields + UnitResult._fields)
+
+    def write(self, result, *extra):
+        """Zapisuje wynik result poprzedzony wartosciami extra dodatkowych pol."""
+
+        if self.format == 'csv':
+            self.csv.writerow(extra + tuple(result))
+        else:
+            record = dict(zip(self.extra_fields, extra))
+            record.update(result._asdict())
+            self.file.write(json.dumps(record) + '\n')
+
+    __call__ = write
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Dokladna wartosc oczekiwana liczby ruchow agenta deterministycznego.
+
+Jesli agent nie korzysta z liczb losowych, a jego decyzje zaleza tylko od stanu wewnetrznego i otrzymanych
+odczytow sensora, epizod w srodowisku Env jest lancuchem Markowa nad parami (pozycja, stan agenta):
+- odczyt sensora losowany jest z rozkladu zaleznego od pola, na ktorym stoi agent (pj, pn),
+- agent po sense() i move() przechodzi do nastepnego stanu i wybiera akcje,
+- ruch zaburzany jest tak jak w Env (p, przesuniecia z MapModel.motion_kernels, mapa zawinieta na torusie),
+- pole wyjscia jest stanem pochlaniajacym.
+Stany agenta wyznaczane sa przez przeszukanie grafu stanow: atrybuty agenta serializowane sa modulem pickle,
+stany o identycznej serializacji sa utozsamiane, a dla kazdego odczytu sensora agent odtwarzany jest
+z zapisanego stanu.
+Wymaga to skonczonej i niewielkiej liczby stanow - tak jest np. dla agenta poruszajacego sie wezykiem,
+ale nie dla agentow z filtrem histogramowym.
+
+expected_steps() zwraca E[min(T, max_steps)] - dokladnie te wielkosc, ktora launcher szacuje symulacja
+(domyslny limit 2 * height * width ruchow), a expected_steps_unbounded() rozwiazuje uklad rownan lancucha
+pochlaniajacego dla E[T] (scipy.sparse, jesli jest dostepne; w przeciwnym razie sumuje szereg iteracyjnie).
+
+> exact_solver.py [-n N] [--seed SEED] AGENT SWIATY"""
+
+import argparse
+import pickle
+import random
+import numpy as np
+from world import World
+from map_cache import get_map_model
+
+try:
+    import scipy.sparse
+    import scipy.sparse.linalg
+except ImportError:
+    scipy = None
+
+_SENSORS = (False, True)
+
+
+class NonDeterministicAgentError(ValueError):
+    """Agenta nie mozna opisac skonczonym lancuchem Markowa (korzysta z liczb losowych lub ma zbyt wiele stanow)."""
+
+
+def _state_key(agent):
+    return pickle.dumps(vars(agent), pickle.HIGHEST_PROTOCOL)
+
+def _restore(agent_class, key):
+    """Tworzy niezalezna kopie agenta w stanie zapisanym w key (szybciej niz copy.deepcopy)."""
+
+    agent = agent_class.__new__(agent_class)
+    agent.__dict__.update(pickle.loads(key))
+    return agent
+
+def _reaching(sources, targets, initial):
+    """Zwraca maske stanow osiagalnych (po krawedziach sources -> targets) ze stanow z maski initial."""
+
+    reached = initial.copy()
+    while True:
+        extended = reached | (np.bincount(targets, weights=reached[sources], minlength=len(reached)) > 0)
+        if (extended == reached).all():
+            return reached
+        reached = extended
+
+
+class PolicyChain:
+    """Lancuch Markowa epizodu agenta z fabryki agent_factory w srodowisku env.
+
+    Stany przejsciowe numerowane sa agent_state * height * width + y * width + x; stan agenta 0 to stan
+    zaraz po konstruktorze. Przejscia przechowywane sa jako tablice (sources, targets, probabilities)
+    w formacie COO; prawdopodobienstwo dotarcia do wyjscia z danego stanu zawiera exit_probabilities.
+    Liczba stanow agenta ograniczona jest przez max_agent_states."""
+
+    def __init__(self, agent_factory, env, max_agent_states=10000):
+        self.env = env
+        self.model = get_map_model(env.p, env.pj, env.pn, env.map)
+        self.height = env.height
+        self.width = env.width
+        self.fields = env.height * env.width
+
+        self.actions, self.successors = self.__explore(agent_factory, max_agent_states)
+        self.agent_states = len(self.actions)
+        self.__build_transitions()
+
+    def __call(self, agent, method, *args):
+        state = random.getstate()
+        result = getattr(agent, method)(*args)
+        if random.getstate() != state:
+            raise NonDeterministicAgentError('agent uses module random in {}(); exact evaluation needs a '
+                    'deterministic agent'.format(method))
+        return result
+
+    def __explore(self, agent_factory, max_agent_states):
+        """Przeszukuje graf stanow agenta. Zwraca tablice akcji i nastepnych stanow indeksowane
+        [stan agenta, odczyt sensora]; -1 oznacza odczyt niemozliwy w tym srodowisku."""
+
+        env = self.env
+        state = random.getstate()
+        agent = agent_factory(env.p, env.pj, env.pn, env.height, env.width, env.map)
+        if random.getstate() != state:
+            raise NonDeterministicAgentError('agent uses module random in __init__(); exact evaluation needs '
+                    'a deterministic agent')
+        agent_class = type(agent)
+        states = [_state_key(agent)]
+        keys = {states[0]: 0}
+        actions = []
+        successors = []
+
+        possible = [self.model.likelihood[sensor].any() for sensor in _SENSORS]
+        index = 0
+        while index < len(states):
+            actions.append([-1] * len(_SENSORS))
+            successors.append([-1] * len(_SENSORS))
+            for s, sensor in enumerate(_SENSORS):
+                if not possible[s]:
+                    continue
+                agent = _restore(agent_class, states[index])
+                self.__call(agent, 'sense', sensor)
+                action = self.__call(agent, 'move')
+                if action not in self.model.motion_kernels:
+                    raise ValueError('agent returned invalid action {!r}'.format(action))
+
+                key = _state_key(agent)
+                if key not in keys:
+                    if len(states) >= max_agent_states:
+                        raise NonDeterministicAgentError('agent has more than {} states'.format(
+                                max_agent_states))
+                    keys[key] = len(states)
+                    states.append(key)
+                actions[index][s] = action
+                successors[index][s] = keys[key]
+            index += 1
+
+        return actions, np.array(successors, dtype=np.int64)
+
+    def __build_transitions(self):
+        height, width, fields = self.height, self.width, self.fields
+        ys, xs = np.divmod(np.arange(fields), width)
+        exit_mask = self.model.exit_mask.ravel()
+
+        sources = []
+        targets = []
+        probabilities = []
+        exit_probabilities = np.zeros(self.agent_states * fields)
+        for k in range(self.agent_states):
+            branches = {}
+            for s, sensor in enumerate(_SENSORS):
+                successor = self.successors[k, s]
+                if successor < 0:
+                    continue
+                # odczyty prowadzace do tej samej akcji i tego samego stanu agenta sa laczone
+                key = (self.actions[k][s], successor)
+                likelihood = self.model.likelihood[sensor].ravel()
+                branches[key] = branches[key] + likelihood if key in branches else likelihood
+
+            for (action, successor), likelihood in branches.items():
+                for (dy, dx), p in self.model.motion_kernels[action]:
+                    destinations = ((ys + dy) % height) * width + (xs + dx) % width
+                    weights = likelihood * p
+                    into_exit = exit_mask[destinations]
+                    np.add.at(exit_probabilities, k * fields + np.flatnonzero(into_exit), weights[into_exit])
+
+                    kept = (weights > 0) & ~into_exit
+                    sources.append(k * fields + np.flatnonzero(kept))
+                    targets.append(successor * fields + destinations[kept])
+                    probabilities.append(weights[kept])
+
+        self.sources = np.concatenate(sources)
+        self.targets = np.concatenate(targets)
+        self.probabilities = np.concatenate(probabilities)
+        self.exit_probabilities = exit_probabilities
+
+    def start_distribution(self):
+        """Rozklad stanu poczatkowego: stan agenta 0 i pozycja startowa srodowiska albo, tak jak w Env.reset,
+        pozycja losowana jednostajnie sposrod pol innych niz wyjscie."""
+
+        env = self.env
+        distribution = np.zeros(self.agent_states * self.fields)
+        if env.start_y is not None and env.start_x is not None and env.map[env.start_y][env.start_x] != World.EXIT:
+            distribution[env.start_y * self.width + env.start_x] = 1.
+        else:
+            free = ~self.model.exit_mask.ravel()
+            distribution[:self.fields][free] = 1. / free.sum()
+        return distribution
+
+    def step(self, distribution):
+        """Zwraca rozklad stanow przejsciowych po jednym ruchu (masa, ktora dotarla do wyjscia, jest pomijana)."""
+
+        return np.bincount(self.targets, weights=distribution[self.sources] * self.probabilities,
+                minlength=len(distribution))
+
+    def expected_steps(self, max_steps=None, tolerance=1e-9):
+        """Zwraca E[min(T, max_steps)], gdzie T to liczba ruchow do wyjscia (domyslnie max_steps = 2 * height
+        * width, jak w launcherze). Obliczenia koncza sie wczesniej, gdy pozostala masa prawdopodobienstwa
+        pomnozona przez liczbe pozostalych ruchow (gorne ograniczenie bledu) spadnie ponizej tolerance."""
+
+        if max_steps is None:
+            max_steps = 2 * self.fields
+        distribution = self.start_distribution()
+        total = 0.
+        for t in range(max_steps):
+            remaining = distribution.sum()
+            if remaining * (max_steps - t) < tolerance:
+                break
+            total += remaining
+            distribution = self.step(distribution)
+        return total
+
+    def __unbounded_by_iteration(self, distribution, tolerance):
+        """Sumuje P(T > t) do chwili, gdy oszacowanie reszty szeregu (przy geometrycznym zaniku pozostalej
+        masy) spadnie ponizej tolerance."""
+
+        total = 0.
+        previous = None
+        while True:
+            remaining = distribution.sum()
+            total += remaining
+            if previous is not None and remaining < previous:
+                rate = remaining / previous
+                if remaining * rate / (1 - rate) < tolerance:
+                    return total
+            previous = remaining
+            distribution = self.step(distribution)
+
+    def expected_steps_unbounded(self, tolerance=1e-9):
+        """Zwraca E[T] rozwiazujac uklad (I - Q) t = 1 dla stanow osiagalnych ze stanu poczatkowego
+        albo inf, jesli z ktoregos z nich nie mozna dotrzec do wyjscia. Bez scipy szereg P(T > t) sumowany
+        jest iteracyjnie z dokladnoscia tolerance."""
+
+        start = self.start_distribution()
+        reachable = _reaching(self.sources, self.targets, start > 0)
+        leaving = _reaching(self.targets, self.sources, self.exit_probabilities > 0)
+        if (reachable & ~leaving).any():
+            return float('inf')
+        if scipy is None:
+            return self.__unbounded_by_iteration(start, tolerance)
+
+        states = np.flatnonzero(reachable)
+        index = np.full(len(start), -1)
+        index[states] = np.arange(len(states))
+        kept = reachable[self.sources]
+        rows = index[self.sources[kept]]
+        columns = index[self.targets[kept]]
+        values = self.probabilities[kept]
+        n = len(states)
+
+        q = scipy.sparse.csr_matrix((values, (rows, columns)), shape=(n, n))
+        times = scipy.sparse.linalg.spsolve((scipy.sparse.identity(n, format='csr') - q).tocsc(), np.ones(n))
+        return float(start[states].dot(np.atleast_1d(times)))
+
+
+def main():
+    from evaluation import load_agent_factory, run_unit
+    from launcher import conf_delta_95, env_file_or_dir
+    from environment_set import EnvironmentSet
+
+    parser = argparse.ArgumentParser(description='Computes exact expected number of steps of a deterministic\
+            Lost Wumpus agent in each environment and optionally compares it with a simulation.')
+    parser.add_argument('-n', metavar='N', type=int, dest='trials', default=0,
+            help='also simulate N episodes per environment and print their mean and 95%% confidence interval')
+    parser.add_argument('--seed', metavar='SEED', type=int, default=0, help='seed of the simulation')
+    parser.add_argument('--unbounded', action='store_true',
+            help='also print expected number of steps without the 2 * height * width limit')
+    parser.add_argument('agent', metavar='AGENT', help='file with the agent implementation')
+    parser.add_argument('worlds', metavar='ENV', nargs='+', type=env_file_or_dir,
+            help='file \'*.in\' or \'*.wpk\' or directory of such files')
+    args = parser.parse_args()
+
+    agent_factory = load_agent_factory(args.agent)
+    environments = EnvironmentSet(path for paths in args.worlds for path in paths)
+    total = 0.
+    for env_index, env in enumerate(environments):
+        try:
+            chain = PolicyChain(agent_factory, env)
+        except NonDeterministicAgentError as e:
+            parser.exit(1, '{}: error: {}\n'.format(parser.prog, e))
+        expected = chain.expected_steps()
+        total += expected
+        line = '{} {:.4f}'.format(env.name, expected)
+        if args.unbounded:
+            line += ' {:.4f}'.format(chain.expected_steps_unbounded())
+        if args.trials > 0:
+            steps = [run_unit(agent_factory, env, args.seed, trial, env_index).steps
+                    for trial in range(args.trials)]
+            line += ' {:.4f} {:.4f}'.format(np.mean(steps), conf_delta_95(steps))
+        print(line)
+    print('Total: {:.4f}'.format(total))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# coding: utf-8
+import numpy as np
+from map_cache import get_map_model
+
+class HistogramFilter:
+    """Filtr histogramowy dla srodowiska zagubionego Wumpusa.
+
+    Przekonanie agenta przechowywane jest w tablicy float64 o wymiarach height x width (belief), z dokladnoscia
+    do stalego czynnika. Aktualizacja ruchu to suma przesuniec tablicy (np.roll) z wagami p dla
+    przemieszczenia zamierzonego i (1 - p) / 4 dla kazdego z czterech zaburzen. Aktualizacja obserwacji
+    to mnozenie przez maske wiarygodnosci dla danego stanu sensora; pole wyjscia ma wiarygodnosc 0, bo
+    agent stojacy na wyjsciu nie dokonuje juz obserwacji. Jadra ruchu i maski wiarygodnosci pochodza
+    ze wspoldzielonego modelu mapy (model, patrz map_cache).
+
+    Normalizacja jest leniwa: filtr sledzi gorne ograniczenie maksimum przekonania (bound) bez
+    przegladania tablicy - obserwacja mnozy je przez najwieksza wiarygodnosc danego stanu sensora, a ruch
+    go nie zmienia (wagi jadra sumuja sie do 1). Dokladne maksimum (peak) liczone jest tylko na zadanie,
+    przekonanie podzielone przez maksimum - przy odczycie (normalized), a podniesienie malych wartosci
+    zlecone przez floor() wykonywane jest dopiero przy odczycie albo gdy ograniczenie spadnie ponizej
+    UNDERFLOW (wtedy przekonanie jest tez dzielone przez maksimum). Po zmianie tablicy belief w miejscu
+    nalezy przypisac ja ponownie (filter.belief = ...), aby zapamietane maksimum zostalo uniewaznione."""
+
+    UNDERFLOW = 1e-150
+    """Gorne ograniczenie maksimum przekonania, ponizej ktorego przekonanie dzielone jest przez maksimum
+    (zapobiega wyjsciu wartosci poza zakres float64)."""
+
+    def __init__(self, p, pj, pn, height, width, area_map, belief=None):
+        """Tworzy filtr dla srodowiska o podanych parametrach i mapie. Domyslnie poczatkowe przekonanie
+        ma wartosc 1 na wszystkich polach poza wyjsciem."""
+
+        self.model = get_map_model(p, pj, pn, area_map)
+        self.height = height
+        self.width = width
+        self.likelihood = self.model.likelihood
+        # najwieksza wiarygodnosc kazdego stanu sensora - o tyle co najwyzej rosnie maksimum przy obserwacji
+        self.gain = {True: max(pj, pn), False: max(1 - pj, 1 - pn)}
+        self.__floor = 0.
+
+        if belief is None:
+            belief = np.ones((height, width), dtype=np.float64)
+            belief[self.model.exit_mask] = 0.
+        self.belief = np.array(belief, dtype=np.float64)
+
+    @property
+    def belief(self):
+        return self.__belief
+
+    @belief.setter
+    def belief(self, belief):
+        self.__belief = belief
+        self.bound = None
+        self.__peak = None
+        self.__normalized = None
+
+    def sense(self, sensor):
+        """Uwzglednia w przekonaniu obserwacje sensora (True gdy agent ma uczucie stania w jamie)."""
+
+        self.__belief *= self.likelihood[sensor]
+        if self.bound is None:
+            self.bound = self.__peak
+        if self.bound is not None:
+            self.bound *= self.gain[sensor]
+            if self.bound < HistogramFilter.UNDERFLOW:
+                self.__renormalize()
+        self.__peak = None
+        self.__normalized = None
+
+    def move(self, action):
+        """Uwzglednia w przekonaniu wykonanie akcji action wraz z modelem zaburzen ruchu."""
+
+        kernel = self.model.motion_kernels[action]
+        old = self.__belief
+        shift, weight = kernel[0]
+        belief = weight * np.roll(old, shift, axis=(0, 1))
+        for shift, weight in kernel[1:]:
+            belief += weight * np.roll(old, shift, axis=(0, 1))
+        # ruch jest srednia wazona przesuniec, wiec maksimum nie rosnie
+        bound = self.bound if self.bound is not None else self.__peak
+        self.belief = belief
+        self.bound = bound
+
+    def normalize(self):
+        """Normalizuje przekonanie tak, aby sumowalo sie do 1."""
+
+        self.__apply_floor()
+        self.__belief /= self.__belief.sum()
+        self.belief = self.__belief
+
+    def rescale(self, floor=0.):
+        """Dzieli przekonanie przez jego maksimum, a nastepnie podnosi wartosci mniejsze od floor do floor."""
+
+        self.__floor = max(self.__floor, floor)
+        self.__renormalize()
+        self.__normalized = self.__belief
+
+    def peak(self):
+        """Zwraca dokladne maksimum przekonania (liczone przy pierwszym wywolaniu po aktualizacji)."""
+
+        if self.__peak is None:
+            self.__peak = float(self.__belief.max())
+            self.bound = self.__peak
+        return self.__peak
+
+    def floor(self, floor):
+        """Zleca podniesienie wartosci mniejszych od floor razy maksimum przekonania do tej wartosci -
+        odpowiednik rescale(floor) bez dzielenia przez maksimum. Tablica nie jest przegladana od razu:
+        podniesienie wykonywane jest przy odczycie (normalized) albo przy zagrozeniu niedomiarem."""
+
+        self.__floor = max(self.__floor, floor)
+        self.__normalized = None
+
+    def normalized(self):
+        """Zwraca przekonanie podzielone przez maksimum (jak po rescale z ostatnio zleconym floor),
+        wyliczane dopiero przy odczycie i zapamietywane do nastepnej aktualizacji."""
+
+        if self.__normalized is None:
+            self.__apply_floor()
+            scale = self.peak()
+            self.__normalized = self.__belief / scale if scale > 0 else self.__belief.copy()
+        return self.__normalized
+
+    def __apply_floor(self):
+        """Wykonuje zlecone przez floor() podniesienie malych wartosci przekonania."""
+
+        if self.__floor > 0.:
+            np.maximum(self.__belief, self.__floor * self.peak(), out=self.__belief)
+            self.__floor = 0.
+            self.__normalized = None
+
+    def __renormalize(self):
+        """Dzieli przekonanie przez maksimum (o ile jest dodatnie) i wykonuje zlecone podniesienie."""
+
+        scale = float(self.__belief.max())
+        if scale > 0.:
+            self.__belief /= scale
+        self.__peak = self.bound = 1. if scale > 0. else 0.
+        self.__apply_floor()
+        self.__normalized = None
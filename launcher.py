@@ -1,29 +1,27 @@
 #!/usr/bin/env python3
 
-from environment import Env
+# numpy, modul agenta i moduly uzywane tylko przez wybrane opcje importowane sa dopiero, gdy sa potrzebne,
+# aby krotkie uruchomienia (jeden agent, jedno srodowisko) nie placily za ich import
+from evaluation import AgentLoadError, ResultsWriter, evaluate_trials, load_agent_factory
+from profiling import LatencyProfile
+from budget import TimeBudget
+from adaptive import StoppingRule, conf_delta_95, mean
+from environment_set import EnvironmentLoadError, EnvironmentSet
 import argparse
 import os.path
+import shlex
 import sys
 import glob
-from time import time
-import numpy as np
-from math import sqrt
+import random
 
 
-class ImportAgent(argparse.Action):
-    def __call__(self, parser, namespace, values, option_string=None):
-        try:
-            sys.path.append(os.path.dirname(values))
-            import_str = 'from ' + os.path.splitext(os.path.basename(values))[0] + ' import Agent'
-            exec(import_str, globals())
-            agent_factory = Agent
+def load_agent(path):
+    """Importuje modul agenta; bledy importu zglaszane sa jako AgentLoadError."""
 
-        except Exception as e:
-            msg = "can't load Agent class from '{}':\n".format(values)
-            raise argparse.ArgumentTypeError(msg + str(e))
-
-        else:
-            namespace.agent_factory = agent_factory
+    try:
+        return load_agent_factory(path)
+    except Exception as e:
+        raise AgentLoadError("can't load Agent class from '{}':\n{}".format(path, e)) from e
 
 def agent_module(string):
     if not os.path.isfile(string):
@@ -32,29 +30,18 @@ def agent_module(string):
     return string
 
 class LoadAndAppendEnvs(argparse.Action):
-    def __call__(self, parser, namespace, values, option_string=None):
-        environments = []
+    """Zapisuje liste sciezek srodowisk; zbior srodowisk (EnvironmentSet) tworzony jest dopiero w run(),
+    a pliki opisu czytane sa w miare, jak ocena do nich dociera (z --validate: przed rozpoczeciem oceny)."""
 
-        for env_name_list in values:
-            for env_name in env_name_list:
-                try:
-                    env = Env(env_name)
-
-                except:
-                    msg = "can't load environment from '{}'".format(env_name)
-                    raise argparse.ArgumentTypeError(msg)
-
-                else:
-                    environments.append(env)
-
-        namespace.environments = environments
+    def __call__(self, parser, namespace, values, option_string=None):
+        namespace.environments = [env_name for env_name_list in values for env_name in env_name_list]
 
 def env_file_or_dir(string):
     if os.path.isfile(string):
         return [string]
 
     elif os.path.isdir(string):
-        env_list = glob.glob(os.path.join(string, '*.in'))
+        env_list = sorted(glob.glob(os.path.join(string, '*.in')))
 
         if len(env_list) == 0:
             msg = "directory '{}' contains no environment files".format(string)
@@ -66,19 +53,6 @@ def env_file_or_dir(string):
         msg = "can't open '{}': no such file or directory".format(string)
         raise argparse.ArgumentTypeError(msg)
 
-def evaluate_agent(agent_factory, environments):
-    total_steps = 0
-    start_time = time()
-    for env in environments:
-        env.reset(agent_factory)
-        env.run(env.width * env.height * 2)
-        total_steps += env.agent_steps_counter
-    seconds_used = time() - start_time
-    return total_steps, seconds_used
-
-def conf_delta_95(arr):
-    return 1.96 * np.std(arr) / sqrt(len(arr))
-
 def main():
     """zinterpretuj i sprawdz argumenty"""
     parser = argparse.ArgumentParser(description='The Lost Wumpus framework launcher.',
@@ -93,28 +67,238 @@ def main():
             absent)')
     parser.add_argument('-n', dest='trials', metavar='N', type=int, default=1,
             help='number of times an agent will be placed in each environment (default: 1)')
-    parser.add_argument('agent_factory', metavar='AGENT', action=ImportAgent, type=agent_module,
+    parser.add_argument('-j', dest='jobs', metavar='J', type=int, default=1,
+            help='number of worker processes evaluating (trial, environment) pairs in parallel\
+            (default: 1)')
+    parser.add_argument('--seed', dest='seed', metavar='SEED', type=int, default=None,
+            help='seed from which independent environment and agent random streams of every (trial,\
+            environment) pair are derived; results for a given seed do not depend on J (default: random,\
+            printed to stderr)')
+    parser.add_argument('--results', dest='results', metavar='FILE', default=None,
+            help='stream one record per (trial, environment) pair to FILE: steps, whether the step cap was\
+            hit, agent and environment time and map parameters')
+    parser.add_argument('--results-format', dest='results_format', choices=ResultsWriter.FORMATS,
+            default=None, help='format of the --results file (default: csv for \'*.csv\', jsonl otherwise)')
+    parser.add_argument('--profile', dest='profile', action='store_true', default=False,
+            help='print per-call latency percentiles of agent __init__, sense and move and of the\
+            environment\'s own work in reset, step_sense and step_move to stderr')
+    parser.add_argument('--profile-dump', dest='profile_dump', metavar='FILE', default=None,
+            help='run the evaluation under cProfile, save the statistics to FILE (readable with pstats)\
+            and print the hottest functions of the agent module to stderr (requires -j 1)')
+    parser.add_argument('--budget-init', dest='budget_init', metavar='SEC', type=float, default=None,
+            help='time limit of a single call of the agent constructor')
+    parser.add_argument('--budget-sense', dest='budget_sense', metavar='SEC', type=float, default=None,
+            help='time limit of a single call of agent sense')
+    parser.add_argument('--budget-move', dest='budget_move', metavar='SEC', type=float, default=None,
+            help='time limit of a single call of agent move')
+    parser.add_argument('--max-overruns', dest='max_overruns', metavar='K', type=int, default=0,
+            help='number of time limit overruns tolerated in an episode; the next one aborts the episode,\
+            which is then counted as if the agent used up all its moves (default: 0)')
+    parser.add_argument('--kill-after', dest='kill_after', metavar='SEC', type=float, default=None,
+            help='interrupt any single agent call running longer than SEC and abort the episode, so a stuck\
+            agent does not block the evaluation')
+    parser.add_argument('--sandbox', action='store_true', default=False,
+            help='run the agent in a separate long-lived worker process (one per job); an exception or crash\
+            of the agent aborts only the current episode and the worker is restarted')
+    parser.add_argument('--sandbox-memory', dest='sandbox_memory', metavar='MB', type=float, default=None,
+            help='with --sandbox, limit the address space of each worker process to MB megabytes')
+    parser.add_argument('--target-ci', dest='target_ci', metavar='W', type=float, default=None,
+            help='adaptive mode: instead of N trials, keep adding trials until the 95%% confidence interval\
+            of mean steps (second Summary value) is at most W or a limit below is reached')
+    parser.add_argument('--min-trials', dest='min_trials', metavar='N', type=int, default=5,
+            help='minimal number of trials in adaptive mode (default: 5)')
+    parser.add_argument('--max-trials', dest='max_trials', metavar='N', type=int, default=None,
+            help='maximal number of trials in adaptive mode (default: no limit)')
+    parser.add_argument('--time-budget', dest='time_budget', metavar='SEC', type=float, default=None,
+            help='stop adding trials in adaptive mode after SEC seconds (default: no limit)')
+    parser.add_argument('--record', dest='record', metavar='DIR', default=None,
+            help='record every episode into DIR (one trial<T>_env<E>.npz file per episode, see trajectory.py)')
+    parser.add_argument('--snapshot-every', dest='snapshot_every', metavar='K', type=int, default=0,
+            help='with --record, also record the agent histogram every K steps (default: 0, never)')
+    parser.add_argument('--belief-quality', dest='belief_quality', action='store_true', default=False,
+            help='measure how well the agent histogram tracks its true position (mean probability mass and\
+            rank of the true field after each sensor reading) and print it to stderr')
+    parser.add_argument('--validate', dest='validate', action='store_true', default=False,
+            help='read every environment file before the first trial and stop on the first broken one\
+            (default: files are read when the evaluation reaches them)')
+    parser.add_argument('--batch', metavar='FILE', default=None,
+            help='run many jobs in this process: every line of FILE (- for stdin) holds the arguments of one\
+            launcher run (AGENT, ENV and options; options given next to --batch apply to every job); the\
+            output of each job is preceded by a line with \'#\' and the job arguments')
+    parser.add_argument('agent_path', metavar='AGENT', type=agent_module,
             help='file containing Agent class')
     parser.add_argument('environments', metavar='ENV', action=LoadAndAppendEnvs, type=env_file_or_dir,
-            nargs='+', help='file \'*.in\' containing environment description or directory containing\
-            at least one \'*.in\' file')
+            nargs='+', help='file \'*.in\' containing environment description, world pack file \'*.wpk\'\
+            (see world_pack.py) or directory containing at least one \'*.in\' file')
+
+    # w trybie wsadowym argumenty AGENT i ENV podawane sa w kolejnych liniach pliku zadan
+    batch_parser = argparse.ArgumentParser(add_help=False)
+    batch_parser.add_argument('--batch', default=None)
+    batch, options = batch_parser.parse_known_args()
+    if batch.batch is not None:
+        sys.exit(1 if run_batch(parser, batch.batch, options) else 0)
+
+    launch(parser)
+
+def launch(parser, argv=None):
+    """Wykonuje jedno uruchomienie launchera z argumentami argv (domyslnie z wiersza polecen)."""
+
+    args = parser.parse_args(argv)
+
+    if args.batch is not None:
+        parser.error('--batch cannot be used inside a batch job')
+    if args.profile_dump is not None and args.jobs > 1:
+        parser.error('--profile-dump requires -j 1')
+    if args.sandbox_memory is not None and not args.sandbox:
+        parser.error('--sandbox-memory requires --sandbox')
+
+    try:
+        run(args)
+    except (EnvironmentLoadError, AgentLoadError) as e:
+        parser.exit(2, '{}: error: {}\n'.format(parser.prog, e))
+
+def run_batch(parser, path, options):
+    """Wykonuje w tym procesie zadania z pliku path ('-' oznacza stdin), po jednym w linii (puste linie
+    i linie zaczynajace sie od '#' sa pomijane), dodajac do kazdego argumenty options. Moduly agentow,
+    numpy i modele map importowane sa lub wyliczane tylko raz. Zwraca liczbe nieudanych zadan."""
 
-    args = parser.parse_args()
+    failed = 0
+    jobs = sys.stdin if path == '-' else open(path)
+    try:
+        for line in jobs:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            print('# ' + line, flush=True)
+            try:
+                launch(parser, options + shlex.split(line))
+            except SystemExit as e:
+                if e.code:
+                    failed += 1
+            sys.stdout.flush()
+    finally:
+        if jobs is not sys.stdin:
+            jobs.close()
+    return failed
 
+def run(args):
+    environments = EnvironmentSet(args.environments)
+    if args.validate:
+        environments.validate()
     if args.visualise:
         # w trybie wizualizacji wyswietl okno podgladu
         from visualiser import visualise
-        visualise(args.agent_factory, args.environments[0], args.size)
+        visualise(load_agent(args.agent_path), environments[0], args.size)
     else:
         # w zwyklym trybie uruchom agenta w kazdym srodowisku zadana liczbe razy i zlicz jego ruchy
-        steps = [0] * args.trials
-        seconds_used = [0] * args.trials
-        for i in range(args.trials):
-            steps[i], seconds_used[i] = evaluate_agent(args.agent_factory, args.environments)
-            print('{} {}'.format(steps[i], seconds_used[i]))
-        print("Summary: {:.1f} {:.1f} {:.1f} {:.1f}".format(np.average(steps), conf_delta_95(steps), 
-            np.average(seconds_used), conf_delta_95(seconds_used)))
-        #TODO: timeit
+        if args.seed is None:
+            args.seed = random.SystemRandom().randrange(2 ** 32)
+            print('Seed: {}'.format(args.seed), file=sys.stderr)
+
+        results = None
+        if args.results is not None:
+            results = ResultsWriter(args.results, args.results_format)
+
+        profile = LatencyProfile() if args.profile else None
+
+        budget = None
+        if any(limit is not None for limit in [args.budget_init, args.budget_sense, args.budget_move,
+                args.kill_after]):
+            budget = TimeBudget(args.budget_init, args.budget_sense, args.budget_move, args.max_overruns,
+                    args.kill_after)
+
+        sandbox = None
+        if args.sandbox:
+            from sandbox import Sandbox
+            memory_limit = None if args.sandbox_memory is None else int(args.sandbox_memory * 2 ** 20)
+            sandbox = Sandbox(memory_limit)
+        else:
+            # bledny modul agenta zglaszany jest przed rozpoczeciem oceny; z --sandbox agent nie jest
+            # importowany w tym procesie
+            load_agent(args.agent_path)
+
+        failures = {'overruns': 0, 'aborted': 0}
+        quality = {'units': 0, 'mass': 0., 'rank': 0.}
+
+        def on_unit(result):
+            failures['overruns'] += result.overruns
+            failures['aborted'] += result.aborted
+            if result.belief_mass is not None:
+                quality['units'] += 1
+                quality['mass'] += result.belief_mass
+                quality['rank'] += result.belief_rank
+            if results is not None:
+                results.write(result)
+
+        profiler = None
+        if args.profile_dump is not None:
+            import cProfile
+            profiler = cProfile.Profile()
+
+        trajectories = None
+        if args.record is not None:
+            from trajectory import TrajectoryWriter
+            trajectories = TrajectoryWriter(args.record, args.snapshot_every)
+
+        # w trybie adaptacyjnym proby dodawane sa az do spelnienia kryterium zatrzymania
+        stopping_rule = None
+        trials = args.trials
+        if args.target_ci is not None:
+            stopping_rule = StoppingRule(args.target_ci, args.min_trials, args.max_trials, args.time_budget)
+            trials = args.max_trials
+
+        steps = []
+        seconds_used = []
+        cache_info = {}
+        trial_results = evaluate_trials(args.agent_path, environments, trials, args.seed, args.jobs,
+                cache_info, on_unit, profile, budget, trajectories, args.belief_quality, sandbox)
+        try:
+            if profiler is not None:
+                profiler.enable()
+            for i, trial_steps, trial_seconds in trial_results:
+                steps.append(trial_steps)
+                seconds_used.append(trial_seconds)
+                print('{} {}'.format(steps[i], seconds_used[i]), flush=True)
+                if stopping_rule is not None:
+                    reason = stopping_rule.reason(steps)
+                    if reason is not None:
+                        print('Stopped after {} trials: {}'.format(len(steps), reason), file=sys.stderr)
+                        break
+        finally:
+            trial_results.close()
+            if profiler is not None:
+                profiler.disable()
+            if results is not None:
+                results.close()
+        # bez zakonczonych prob (np. -n 0) podsumowanie zawiera nan, jak w pierwotnym launcherze
+        print("Summary: {:.1f} {:.1f} {:.1f} {:.1f}".format(mean(steps), conf_delta_95(steps),
+            mean(seconds_used), conf_delta_95(seconds_used)))
+
+        # statystyki pamieci podrecznej map wypisywane sa na stderr, aby nie zmieniac formatu wyniku
+        hits = sum(info.hits for info in cache_info.values())
+        misses = sum(info.misses for info in cache_info.values())
+        if hits + misses > 0:
+            print('Map cache: {} hits, {} misses ({:.1f}% hit rate)'.format(hits, misses,
+                100. * hits / (hits + misses)), file=sys.stderr)
+
+        if budget is not None:
+            print('Time budget: {} overruns, {} aborted episodes'.format(failures['overruns'],
+                failures['aborted']), file=sys.stderr)
+        elif sandbox is not None:
+            print('Sandbox: {} aborted episodes'.format(failures['aborted']), file=sys.stderr)
+
+        if quality['units'] > 0:
+            print('Belief quality: mean true field mass {:.4f}, mean true field rank {:.1f}'.format(
+                quality['mass'] / quality['units'], quality['rank'] / quality['units']), file=sys.stderr)
+
+        if profile is not None:
+            print(profile.report(), file=sys.stderr)
+
+        if profiler is not None:
+            import pstats
+            profiler.dump_stats(args.profile_dump)
+            stats = pstats.Stats(profiler, stream=sys.stderr)
+            stats.sort_stats('cumulative').print_stats(os.path.basename(args.agent_path), 20)
 
 if __name__ == '__main__':
     main()
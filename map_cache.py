@@ -0,0 +1,136 @@
+# coding: utf-8
+"""Pamiec podreczna danych pochodnych map.
+
+Dane wyliczane z mapy i parametrow p, pj, pn (maski wiarygodnosci obserwacji, jadra ruchu, pola
+odleglosci i kierunkow do wyjscia) sa takie same dla kazdego agenta umieszczanego w danym srodowisku.
+get_map_model() wylicza je raz dla kazdej mapy i zwraca ten sam obiekt MapModel wszystkim agentom
+i wszystkim probom w procesie. Tablice modelu sa tylko do odczytu. Modul numpy importowany jest dopiero
+przy wyliczaniu pierwszego modelu, wiec sam import modulu (np. przez evaluation) jest tani."""
+
+from collections import OrderedDict, namedtuple
+from world import World
+from action import Action
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'size'])
+
+_MAX_SIZE = 1024
+"""Maksymalna liczba map przechowywanych w pamieci podrecznej (usuwane sa najdawniej uzyte)."""
+
+_cache = OrderedDict()
+_hits = 0
+_misses = 0
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+class MapModel:
+    """Dane pochodne mapy srodowiska o parametrach p, pj, pn:
+    - wymiary mapy (height, width), maski pol z wyjsciem i z jamami (exit_mask, cave_mask),
+    - wspolrzedne wyjscia (exit_coords), o ile mapa je zawiera, oraz liczby pol kazdego rodzaju (fields_count),
+    - maski wiarygodnosci obserwacji dla obu stanow sensora (likelihood[True], likelihood[False]),
+      z zerem na polu wyjscia,
+    - jadra ruchu (motion_kernels): dla kazdej akcji lista par (przesuniecie (dy, dx), prawdopodobienstwo),
+    - pola przesuniec do wyjscia najkrotsza droga na torusie (exit_dy, exit_dx) i odleglosci (exit_distance);
+      przy remisie wybierana jest droga przez krawedz mapy,
+    - slownik derived na dalsze dane wyliczane przez agentow (patrz memoize)."""
+
+    MOTIONS = {
+        Action.UP : (-1, 0),
+        Action.DOWN : (1, 0),
+        Action.LEFT : (0, -1),
+        Action.RIGHT : (0, 1)
+    }
+    """Wartosci o jakie zmieniaja sie wspolrzedne agenta po wykonaniu deterministycznych akcji."""
+
+    def __init__(self, p, pj, pn, area_map):
+        import numpy as np
+
+        self.p = p
+        self.pj = pj
+        self.pn = pn
+        self.map = area_map
+        self.height = len(area_map)
+        self.width = len(area_map[0])
+
+        fields = np.array([list(row) for row in area_map])
+        self.exit_mask = _read_only(fields == World.EXIT)
+        self.cave_mask = _read_only(fields == World.CAVE)
+        self.fields_count = {ch: int((fields == ch).sum()) for ch in [World.EMPTY, World.CAVE, World.EXIT]}
+
+        self.likelihood = {
+            True: np.where(self.cave_mask, pj, pn),
+            False: np.where(self.cave_mask, 1 - pj, 1 - pn)
+        }
+        for mask in self.likelihood.values():
+            mask[self.exit_mask] = 0.
+            _read_only(mask)
+
+        p_d = (1 - p) / float(4)
+        self.motion_kernels = {}
+        for action, (dy, dx) in MapModel.MOTIONS.items():
+            self.motion_kernels[action] = [((dy, dx), p)] + [((dy + ey, dx + ex), p_d)
+                    for ey, ex in [(-1, 0), (1, 0), (0, 1), (0, -1)]]
+
+        exits = np.argwhere(self.exit_mask)
+        if len(exits) > 0:
+            self.exit_coords = [int(exits[0][0]), int(exits[0][1])]
+            ys, xs = np.indices((self.height, self.width))
+            self.exit_dy = _read_only(MapModel.__shortest_offset(self.exit_coords[0] - ys, self.height))
+            self.exit_dx = _read_only(MapModel.__shortest_offset(self.exit_coords[1] - xs, self.width))
+            self.exit_distance = _read_only(np.abs(self.exit_dy) + np.abs(self.exit_dx))
+        else:
+            self.exit_coords = None
+            self.exit_dy = self.exit_dx = self.exit_distance = None
+
+        self.derived = {}
+
+    @staticmethod
+    def __shortest_offset(offset, size):
+        """Zamienia przesuniecia w obrebie mapy na najkrotsze przesuniecia na torusie o obwodzie size."""
+
+        import numpy as np
+
+        wrapped = size - np.abs(offset)
+        return np.where(np.abs(offset) < wrapped, offset, -np.sign(offset) * wrapped)
+
+    def memoize(self, name, builder):
+        """Zwraca dane zapamietane pod nazwa name, wyliczajac je przy pierwszym uzyciu jako builder(self).
+        Zwracane dane powinny byc traktowane jako tylko do odczytu."""
+
+        if name not in self.derived:
+            self.derived[name] = builder(self)
+        return self.derived[name]
+
+
+def get_map_model(p, pj, pn, area_map):
+    """Zwraca wspoldzielony obiekt MapModel dla podanych parametrow i mapy."""
+
+    global _hits, _misses
+
+    key = (tuple(area_map), p, pj, pn)
+    model = _cache.get(key)
+    if model is not None:
+        _hits += 1
+        _cache.move_to_end(key)
+        return model
+
+    _misses += 1
+    model = MapModel(p, pj, pn, key[0])
+    _cache[key] = model
+    if len(_cache) > _MAX_SIZE:
+        _cache.popitem(last=False)
+    return model
+
+def cache_info():
+    """Zwraca statystyki pamieci podrecznej w tym procesie: trafienia, chybienia i liczbe map."""
+
+    return CacheInfo(_hits, _misses, len(_cache))
+
+def clear_cache():
+    """Oproznia pamiec podreczna i zeruje jej statystyki."""
+
+    global _hits, _misses
+    _cache.clear()
+    _hits = _misses = 0
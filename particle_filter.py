@@ -0,0 +1,92 @@
+# coding: utf-8
+import random
+import numpy as np
+from map_cache import get_map_model
+
+class ParticleFilter:
+    """Filtr czasteczkowy dla srodowiska zagubionego Wumpusa.
+
+    Przekonanie reprezentowane jest przez count czasteczek: tablice wspolrzednych (ys, xs) i wag (weights).
+    Aktualizacja ruchu losuje przemieszczenie kazdej czasteczki z modelu Env: z prawdopodobienstwem p
+    przemieszczenie zamierzone, w przeciwnym razie zamierzone powiekszone o jedno z czterech zaburzen
+    wybrane jednostajnie; mapa zawinieta jest na torusie. Aktualizacja obserwacji mnozy wagi przez maske
+    wiarygodnosci (z zerem na polu wyjscia) w polach czasteczek. Gdy efektywna liczba czasteczek spadnie
+    ponizej resample_threshold * count, czasteczki sa losowane ponownie metoda o niskiej wariancji
+    (losowanie systematyczne). Jesli wszystkie wagi sa zerowe, czasteczki rozmieszczane sa od nowa, a jesli
+    obserwacja jest niemozliwa takze wtedy (wiarygodnosc 0 na wszystkich polach czasteczek, np. pj lub pn
+    rowne 0 lub 1), wagi pozostaja rowne.
+
+    Generator liczb losowych (rng, numpy.random.Generator) domyslnie inicjalizowany jest z modulu random,
+    wiec ziarno agenta ustawione przez launcher czyni wyniki powtarzalnymi."""
+
+    OFFSETS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)])
+    """Mozliwe zaburzenia ruchu, wybierane z jednakowym prawdopodobienstwem."""
+
+    def __init__(self, p, pj, pn, height, width, area_map, count=2000, resample_threshold=0.5, rng=None):
+        """Tworzy filtr dla srodowiska o podanych parametrach i mapie; czasteczki rozmieszczane sa
+        jednostajnie na polach innych niz wyjscie."""
+
+        self.model = get_map_model(p, pj, pn, area_map)
+        self.p = p
+        self.height = height
+        self.width = width
+        self.count = count
+        self.resample_threshold = resample_threshold
+        self.likelihood = self.model.likelihood
+        self.rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+        self.free_cells = np.flatnonzero(~self.model.exit_mask.ravel())
+        self.scatter()
+
+    def scatter(self):
+        """Rozmieszcza czasteczki jednostajnie na polach innych niz wyjscie, z rownymi wagami."""
+
+        cells = self.rng.choice(self.free_cells, size=self.count)
+        self.ys, self.xs = np.divmod(cells, self.width)
+        self.weights = np.full(self.count, 1. / self.count)
+
+    def sense(self, sensor):
+        """Uwzglednia w przekonaniu obserwacje sensora (True gdy agent ma uczucie stania w jamie)."""
+
+        self.weights = self.weights * self.likelihood[sensor][self.ys, self.xs]
+        total = self.weights.sum()
+        if total <= 0.:
+            self.scatter()
+            self.weights = self.weights * self.likelihood[sensor][self.ys, self.xs]
+            total = self.weights.sum()
+            if total <= 0.:
+                self.weights = np.full(self.count, 1. / self.count)
+                return
+        self.weights /= total
+        if 1. / np.dot(self.weights, self.weights) < self.resample_threshold * self.count:
+            self.resample()
+
+    def move(self, action):
+        """Losuje przemieszczenie kazdej czasteczki po wykonaniu akcji action."""
+
+        dy, dx = self.model.MOTIONS[action]
+        disturbed = self.rng.random(self.count) >= self.p
+        offsets = self.OFFSETS[self.rng.integers(len(self.OFFSETS), size=self.count)]
+        self.ys = (self.ys + dy + disturbed * offsets[:, 0]) % self.height
+        self.xs = (self.xs + dx + disturbed * offsets[:, 1]) % self.width
+
+    def resample(self):
+        """Losowanie systematyczne: count punktow co 1 / count z jednym losowym przesunieciem."""
+
+        positions = (self.rng.random() + np.arange(self.count)) / self.count
+        cumulative = np.cumsum(self.weights)
+        indices = np.minimum(np.searchsorted(cumulative, positions * cumulative[-1]), self.count - 1)
+        self.ys = self.ys[indices]
+        self.xs = self.xs[indices]
+        self.weights = np.full(self.count, 1. / self.count)
+
+    def cells(self):
+        """Zwraca rozne pola zajmowane przez czasteczki (indeksy y * width + x) i sumy ich wag."""
+
+        cells, inverse = np.unique(self.ys * self.width + self.xs, return_inverse=True)
+        return cells, np.bincount(inverse, weights=self.weights)
+
+    def histogram(self):
+        """Zwraca przekonanie jako tablice height x width: sumy wag czasteczek w kazdym polu."""
+
+        return np.bincount(self.ys * self.width + self.xs, weights=self.weights,
+                minlength=self.height * self.width).reshape(self.height, self.width)
@@ -0,0 +1,98 @@
+# coding: utf-8
+"""Pomiar opoznien wywolan agenta i srodowiska.
+
+LatencyProfile zbiera czasy pojedynczych wywolan w histogramach o logarytmicznych przedzialach
+(wzgledna szerokosc przedzialu okolo 2%), wiec zuzycie pamieci nie zalezy od liczby wywolan, a profile
+z wielu procesow mozna laczyc (merge). Srodowisko (Env) z ustawionym atrybutem profile zapisuje:
+- 'agent.__init__', 'agent.sense', 'agent.move' - czasy wywolan metod agenta,
+- 'env.reset', 'env.step_sense', 'env.step_move' - czas pracy samego srodowiska w tych metodach,
+  bez czasu spedzonego w agencie."""
+
+from math import ceil, log
+
+_MIN_SECONDS = 1e-7
+"""Dolna granica pierwszego przedzialu; krotsze wywolania trafiaja do przedzialu 0."""
+
+_GROWTH = 1.02
+"""Stosunek granic kolejnych przedzialow."""
+
+_LOG_GROWTH = log(_GROWTH)
+
+
+class LatencyHistogram:
+    """Histogram czasow wywolan jednej operacji."""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def record(self, seconds):
+        bucket = 0 if seconds <= _MIN_SECONDS else int(ceil(log(seconds / _MIN_SECONDS) / _LOG_GROWTH))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Zwraca gorna granice przedzialu zawierajacego q-ty percentyl (0 < q <= 100)."""
+
+        if self.count == 0:
+            return 0.
+        rank = q / 100. * self.count
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(_MIN_SECONDS * _GROWTH ** bucket, self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.
+
+
+class LatencyProfile:
+    """Zbior histogramow opoznien indeksowany nazwa operacji."""
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def merge(self, other):
+        for name, histogram in other.histograms.items():
+            if name not in self.histograms:
+                self.histograms[name] = LatencyHistogram()
+            self.histograms[name].merge(histogram)
+
+    def report(self):
+        """Zwraca tabele z liczba wywolan, sredniym czasem, percentylami i maksimum (w mikrosekundach)."""
+
+        header = ['operation', 'calls', 'total_s', 'mean_us'] + ['p{}_us'.format(q) for q in
+                LatencyProfile.PERCENTILES] + ['max_us']
+        rows = [header]
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            rows.append([name, str(histogram.count), '{:.3f}'.format(histogram.total),
+                    '{:.1f}'.format(histogram.mean() * 1e6)] +
+                    ['{:.1f}'.format(histogram.percentile(q) * 1e6) for q in LatencyProfile.PERCENTILES] +
+                    ['{:.1f}'.format(histogram.max * 1e6)])
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        return '\n'.join(' '.join(cell.rjust(width) if i else cell.ljust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))) for row in rows)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Renderowanie klatek wizualizacji bez okna (bez GTK).
+
+FrameRenderer rysuje to samo co visualiser.GUI - histogram agenta w kolorach od czerwonego (0) przez zolty
+do zielonego (1), jamy (kwadrat), wyjscie (krzyzyk) i agenta (kolo) - bezposrednio w tablicy numpy
+z pikselami RGB. Wyglad pola zalezy tylko od jego koloru, zawartosci mapy i obecnosci agenta, wiec kolejne
+klatki przerysowuja tylko pola, ktore sie zmienily, na raz dla wszystkich zmienionych pol.
+
+Klatki zapisywane sa jako pliki PNG (kodowanie wlasne, zlib), jako pas klatek w jednym pliku PNG lub, jesli
+dostepny jest modul Pillow, jako animowany GIF. Renderowanie zapisanych epizodow (trajectory.py):
+> renderer.py [--format png|strip|gif] [--box-size S] [--every K] [-j J] KATALOG_WYJSCIOWY EPIZOD [EPIZOD ...]"""
+
+import argparse
+import multiprocessing
+import os.path
+import struct
+import zlib
+import numpy as np
+from world import World
+
+BACKGROUND = (96, 96, 96)
+"""Kolor odstepow miedzy polami."""
+
+INK = (0, 0, 0)
+"""Kolor jam, wyjscia i agenta."""
+
+
+def gradient(values):
+    """Zamienia wartosci histogramu (tablica height x width) na kolory RGB (uint8) jak w visualiser.GUI."""
+
+    values = np.asarray(values, dtype=np.float64)
+    red = np.where(values > 0.5, 2 * (1 - values), 1.)
+    green = np.where(values < 0.5, 2 * values, 1.)
+    colours = np.stack([red, green, np.zeros_like(values)], axis=-1)
+    return (np.clip(colours, 0., 1.) * 255 + 0.5).astype(np.uint8)
+
+def denormalize(values):
+    """Dzieli histogram przez jego maksimum (o ile jest niezerowe)."""
+
+    values = np.asarray(values, dtype=np.float64)
+    denominator = values.max()
+    return values / denominator if denominator != 0 else values
+
+
+class FrameRenderer:
+    """Rysuje klatki dla mapy area_map; kazde pole ma box_size x box_size pikseli."""
+
+    def __init__(self, area_map, box_size=20, denormalize=False):
+        self.height = len(area_map)
+        self.width = len(area_map[0])
+        self.box_size = box_size
+        self.denormalize = denormalize
+
+        fields = np.array([list(row) for row in area_map])
+        self.cave = fields == World.CAVE
+        self.exit = fields == World.EXIT
+        self.__build_masks()
+
+        self.frame = np.empty((self.height * box_size, self.width * box_size, 3), dtype=np.uint8)
+        self.frame[...] = BACKGROUND
+        # widok klatki indeksowany [y, wiersz piksela, x, kolumna piksela, kanal]
+        self.blocks = self.frame.reshape(self.height, box_size, self.width, box_size, 3)
+        self.colours = None
+        self.agent = None
+
+    def __build_masks(self):
+        """Maski pikseli pola: wypelnienie, obrys jamy, krzyzyk wyjscia i kolo agenta."""
+
+        size = self.box_size
+        rows, columns = np.indices((size, size))
+        self.fill_mask = (rows < size - 1) & (columns < size - 1)
+
+        inner = (rows >= 1) & (rows <= size - 2) & (columns >= 1) & (columns <= size - 2)
+        self.cave_mask = inner & ((rows <= 2) | (rows >= size - 3) | (columns <= 2) | (columns >= size - 3))
+
+        diagonal = (rows >= 2) & (rows <= size - 2) & (columns >= 2) & (columns <= size - 2)
+        self.exit_mask = diagonal & ((np.abs(rows - columns) <= 1) | (np.abs(rows + columns - size) <= 1))
+
+        centre = (size - 1) / 2.
+        self.agent_mask = (rows - centre) ** 2 + (columns - centre) ** 2 <= (0.4 * size) ** 2
+
+    def __draw(self, ys, xs, colours, agent):
+        """Rysuje pola (ys, xs) w kolorach colours (n x 3); agent to para wspolrzednych agenta."""
+
+        if len(ys) == 0:
+            return
+        fill = self.fill_mask[np.newaxis, :, :, np.newaxis]
+        blocks = np.where(fill, colours[:, np.newaxis, np.newaxis, :], np.array(BACKGROUND, dtype=np.uint8))
+        ink = (self.cave[ys, xs][:, np.newaxis, np.newaxis] & self.cave_mask |
+               self.exit[ys, xs][:, np.newaxis, np.newaxis] & self.exit_mask |
+               ((ys == agent[0]) & (xs == agent[1]))[:, np.newaxis, np.newaxis] & self.agent_mask)
+        blocks[ink] = INK
+        self.blocks[ys, :, xs, :, :] = blocks
+
+    def render(self, histogram, agent_y, agent_x):
+        """Rysuje klatke dla histogramu (sekwencja height x width lub None - pusty histogram) i pozycji
+        agenta. Zwraca tablice pikseli (wspoldzielona miedzy klatkami; nalezy ja skopiowac, aby zachowac)."""
+
+        if histogram is None:
+            histogram = np.zeros((self.height, self.width))
+        elif self.denormalize:
+            histogram = denormalize(histogram)
+        colours = gradient(histogram)
+
+        if self.colours is None:
+            changed = np.ones((self.height, self.width), dtype=bool)
+        else:
+            changed = (colours != self.colours).any(axis=-1)
+            changed[self.agent] = True
+        changed[agent_y, agent_x] = True
+
+        ys, xs = np.nonzero(changed)
+        self.__draw(ys, xs, colours[ys, xs], (agent_y, agent_x))
+        self.colours = colours
+        self.agent = (agent_y, agent_x)
+        return self.frame
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+def encode_png(image, level=1):
+    """Koduje obraz RGB (tablica uint8 wysokosc x szerokosc x 3) w formacie PNG. Domyslny poziom kompresji
+    zlib (level) jest najszybszy - klatki skladaja sie z jednolitych pol, wiec kompresuja sie dobrze i tak."""
+
+    height, width = image.shape[:2]
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = image.reshape(height, width * 3)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header) +
+            _png_chunk(b'IDAT', zlib.compress(rows.tobytes(), level)) + _png_chunk(b'IEND', b''))
+
+def write_png(path, image, level=1):
+    with open(path, 'wb') as f:
+        f.write(encode_png(image, level))
+
+def strip(frames, columns=10, spacing=2):
+    """Sklada klatki (jednakowych rozmiarow) w jeden obraz, po columns klatek w wierszu."""
+
+    frames = list(frames)
+    height, width = frames[0].shape[:2]
+    columns = min(columns, len(frames))
+    rows = (len(frames) + columns - 1) // columns
+    image = np.full((rows * (height + spacing) - spacing, columns * (width + spacing) - spacing, 3), 255,
+            dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        y, x = divmod(i, columns)
+        image[y * (height + spacing):y * (height + spacing) + height,
+              x * (width + spacing):x * (width + spacing) + width] = frame
+    return image
+
+def write_gif(path, frames, duration=100):
+    """Zapisuje klatki jako animowany GIF (wymaga modulu Pillow); duration to czas klatki w milisekundach."""
+
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError('writing GIF files requires Pillow (pip install Pillow)')
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(path, save_all=True, append_images=images[1:], duration=duration, loop=0)
+
+
+def trajectory_frames(trajectory, box_size=20, denormalize=False, every=1):
+    """Generator klatek zapisanego epizodu (trajectory.Trajectory) co every ruchow, lacznie z ostatnim.
+    Uzywany jest ostatni histogram zapisany nie pozniej niz w danym kroku."""
+
+    renderer = FrameRenderer(trajectory.map, box_size, denormalize)
+    steps = list(range(0, len(trajectory) + 1, every))
+    if steps[-1] != len(trajectory):
+        steps.append(len(trajectory))
+    for step in steps:
+        state = trajectory.state(step)
+        snapshot = trajectory.last_snapshot(step)
+        yield renderer.render(None if snapshot is None else snapshot[1], state.y, state.x).copy()
+
+def render_trajectory(path, output, fmt='png', box_size=20, denormalize=False, every=1, columns=10):
+    """Renderuje epizod z pliku path do katalogu output: pliki PNG klatek w podkatalogu (fmt 'png'), pas
+    klatek w jednym pliku PNG ('strip') albo animowany GIF ('gif'). Zwraca liczbe klatek."""
+
+    from trajectory import Trajectory
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    frames = trajectory_frames(Trajectory.load(path), box_size, denormalize, every)
+    if fmt == 'png':
+        directory = os.path.join(output, name)
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for count, frame in enumerate(frames, 1):
+            write_png(os.path.join(directory, 'frame{:05d}.png'.format(count - 1)), frame)
+        return count
+
+    frames = list(frames)
+    if fmt == 'strip':
+        write_png(os.path.join(output, name + '.png'), strip(frames, columns))
+    else:
+        write_gif(os.path.join(output, name + '.gif'), frames)
+    return len(frames)
+
+def _render_job(job):
+    return render_trajectory(*job)
+
+def main():
+    parser = argparse.ArgumentParser(description='Renders recorded Lost Wumpus episodes (see trajectory.py)\
+            into PNG frames, PNG frame strips or animated GIFs without a display.')
+    parser.add_argument('--format', dest='fmt', choices=['png', 'strip', 'gif'], default='png',
+            help='png: a directory of frames per episode, strip: one PNG with all frames per episode,\
+            gif: animated GIF per episode (requires Pillow) (default: png)')
+    parser.add_argument('--box-size', dest='box_size', metavar='S', type=int, default=20,
+            help='size of a field in pixels (default: 20)')
+    parser.add_argument('--denormalize', action='store_true', default=False,
+            help='divide the histogram by its maximum before drawing')
+    parser.add_argument('--every', metavar='K', type=int, default=1,
+            help='render every K-th step (default: 1)')
+    parser.add_argument('--columns', metavar='N', type=int, default=10,
+            help='frames in a row of a strip (default: 10)')
+    parser.add_argument('-j', dest='jobs', metavar='J', type=int, default=1,
+            help='number of worker processes (default: 1)')
+    parser.add_argument('output', metavar='OUTPUT', help='output directory')
+    parser.add_argument('episodes', metavar='EPISODE', nargs='+', help='recorded episode (*.npz)')
+    args = parser.parse_args()
+
+    if args.fmt == 'gif':
+        try:
+            import PIL
+        except ImportError:
+            parser.error('--format gif requires Pillow (pip install Pillow)')
+
+    os.makedirs(args.output, exist_ok=True)
+    jobs = [(path, args.output, args.fmt, args.box_size, args.denormalize, args.every, args.columns)
+            for path in args.episodes]
+    if args.jobs <= 1:
+        counts = [_render_job(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(args.jobs) as pool:
+            counts = pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (args.jobs * 4)))
+    print('{} frames of {} episodes written to {}'.format(sum(counts), len(jobs), args.output))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Uruchamianie agenta w osobnym procesie roboczym.
+
+SandboxedAgentFactory zachowuje sie jak klasa Agent (srodowisko wywoluje ja z parametrami mapy), ale modul
+agenta importowany jest tylko w dlugo dzialajacym procesie roboczym, a srodowisko (Env) dostaje posrednika
+(SandboxedAgent), ktory przekazuje wywolania sense i move przez potoki. Blad, wyciek pamieci lub
+zakonczenie procesu agenta przerywa wiec tylko biezacy epizod (AgentCrashed, patrz budget.AgentFailure),
+a nie cala ocene; proces roboczy uruchamiany jest ponownie przy nastepnym epizodzie.
+
+Protokol jest binarny i synchroniczny - kazde zadanie to jeden bajt kodu operacji (po INIT parametry
+mapy, jej pola i stan modulu random procesu nadrzednego, wiec agent losuje to samo co w biezacym procesie),
+a odpowiedz zaczyna sie od bajtu statusu:
+- OK, po nim wynik: kod akcji (move) albo height * width liczb float64 (histogram),
+- ERROR, po nim dlugosc (uint32) i tresc komunikatu bledu w UTF-8; proces roboczy konczy wtedy prace.
+Histogram przesylany jest tylko na zadanie (np. na koniec epizodu lub gdy jest zapisywany), w calosci,
+a nie po kazdym ruchu.
+
+Limit pamieci (memory_limit, w bajtach) ustawiany jest w procesie roboczym jako RLIMIT_AS (tylko na
+systemach udostepniajacych modul resource) i obejmuje przestrzen adresowa calego interpretera, lacznie
+z zaimportowanymi bibliotekami.
+
+Proces roboczy uruchamiany jest poleceniem:
+> sandbox.py [--memory-limit BAJTY] AGENT"""
+
+import argparse
+import atexit
+import os
+import pickle
+import random
+import struct
+import subprocess
+import sys
+import traceback
+from action import Action
+from budget import AgentFailure
+from evaluation import AgentLoadError, load_agent_factory
+
+ACTIONS = (Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT)
+
+_INIT = b'I'
+_SENSE_FALSE = b'F'
+_SENSE_TRUE = b'T'
+_MOVE = b'M'
+_HISTOGRAM = b'H'
+_QUIT = b'Q'
+
+_OK = b'K'
+_ERROR = b'E'
+
+_INIT_HEADER = struct.Struct('<dddII')
+_LENGTH = struct.Struct('<I')
+_ACTION_CODES = {action: bytes([code]) for code, action in enumerate(ACTIONS)}
+
+
+class AgentCrashed(AgentFailure):
+    """Agent zglosil wyjatek lub jego proces roboczy zakonczyl sie w trakcie epizodu."""
+
+
+def _read_exact(fd, size):
+    """Czyta dokladnie size bajtow z deskryptora fd; zglasza EOFError, jesli potok zostal zamkniety."""
+
+    data = os.read(fd, size)
+    if len(data) == size:
+        return data
+    chunks = [data]
+    remaining = size - len(data)
+    while remaining > 0:
+        if not chunks[-1]:
+            raise EOFError('pipe closed')
+        chunk = os.read(fd, remaining)
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class _Worker:
+    """Proces roboczy z zaimportowanym modulem agenta i jego potoki."""
+
+    def __init__(self, agent_path, memory_limit=None):
+        command = [sys.executable, os.path.abspath(__file__)]
+        if memory_limit is not None:
+            command += ['--memory-limit', str(int(memory_limit))]
+        command.append(os.path.abspath(agent_path))
+        # biblioteki numeryczne nie powinny rezerwowac pamieci na watki w kazdym procesie roboczym
+        env = dict(os.environ, OMP_NUM_THREADS='1', OPENBLAS_NUM_THREADS='1', MKL_NUM_THREADS='1')
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0,
+                env=env)
+        self.input = self.process.stdin.fileno()
+        self.output = self.process.stdout.fileno()
+        self.episode = 0
+        self.height = None
+        self.width = None
+        try:
+            self.request(b'', 0)
+        except AgentCrashed as e:
+            raise AgentLoadError("can't load Agent class from '{}' in a worker process: {}".format(agent_path, e))
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def request(self, message, size):
+        """Wysyla zadanie message i zwraca size bajtow wyniku z odpowiedzi. Blad agenta lub zakonczenie
+        procesu zglaszane jest jako AgentCrashed; po kazdym bledzie (takze przerwaniu oczekiwania, np. przez
+        budget.TimeBudget) proces roboczy jest zamykany, bo potoki moga nie byc juz zsynchronizowane."""
+
+        try:
+            _write_all(self.input, message)
+            status = _read_exact(self.output, 1)
+            if status == _OK:
+                return _read_exact(self.output, size)
+            if status != _ERROR:
+                raise AgentCrashed('malformed reply from the agent worker')
+            length, = _LENGTH.unpack(_read_exact(self.output, _LENGTH.size))
+            text = _read_exact(self.output, length).decode('utf-8', 'replace')
+        except (OSError, EOFError):
+            self.kill()
+            raise AgentCrashed('agent worker exited with code {}'.format(self.process.returncode))
+        except BaseException:
+            self.kill()
+            raise
+        # po zgloszeniu bledu proces roboczy konczy prace
+        self.kill()
+        raise AgentCrashed(text)
+
+    def close(self):
+        """Konczy proces roboczy (prosba o zakonczenie, a po sekundzie zabicie)."""
+
+        if self.is_alive():
+            try:
+                os.write(self.input, _QUIT)
+                self.process.wait(1)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class SandboxedAgent:
+    """Posrednik agenta dzialajacego w procesie roboczym, o interfejsie agenta (sense, move, histogram)."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.episode = worker.episode
+        self.__histogram = None
+
+    def __request(self, message, size):
+        if self.worker.episode != self.episode:
+            raise AgentCrashed('agent instance is no longer active in its worker process')
+        self.__histogram = None
+        return self.worker.request(message, size)
+
+    def sense(self, sensor):
+        self.__request(_SENSE_TRUE if sensor else _SENSE_FALSE, 0)
+
+    def move(self):
+        return ACTIONS[self.__request(_MOVE, 1)[0]]
+
+    def histogram(self):
+        """Pobiera histogram z procesu roboczego (jeden transfer height * width liczb float64; wynik
+        zapamietywany jest do nastepnego wywolania sense lub move)."""
+
+        if self.__histogram is None:
+            import numpy as np
+
+            data = self.__request(_HISTOGRAM, 8 * self.worker.height * self.worker.width)
+            self.__histogram = np.frombuffer(data, dtype=np.float64).reshape(self.worker.height,
+                    self.worker.width)
+        return self.__histogram
+
+
+class Sandbox:
+    """Ustawienia procesow roboczych agentow; przekazywane do evaluation.evaluate_trials (takze do
+    procesow puli), ktore tworzy z nich fabryki agentow metoda factory."""
+
+    def __init__(self, memory_limit=None):
+        self.memory_limit = memory_limit
+
+    def factory(self, agent_path):
+        return SandboxedAgentFactory(agent_path, self.memory_limit)
+
+
+class SandboxedAgentFactory:
+    """Fabryka agentow z pliku agent_path dzialajacych w procesie roboczym. Proces uruchamiany jest przy
+    pierwszym epizodzie i uzywany w kolejnych; jesli zakonczy sie bledem, przy nastepnym epizodzie
+    uruchamiany jest nowy (liczba ponownych uruchomien w atrybucie restarts)."""
+
+    def __init__(self, agent_path, memory_limit=None):
+        self.agent_path = agent_path
+        self.memory_limit = memory_limit
+        self.worker = None
+        self.restarts = 0
+        atexit.register(self.close)
+
+    def __call__(self, p, pj, pn, height, width, area_map):
+        if self.worker is not None and not self.worker.is_alive():
+            self.worker.kill()
+            self.worker = None
+            self.restarts += 1
+        if self.worker is None:
+            self.worker = _Worker(self.agent_path, self.memory_limit)
+
+        worker = self.worker
+        worker.episode += 1
+        worker.height = height
+        worker.width = width
+        fields = ''.join(area_map).encode('ascii')
+        state = pickle.dumps(random.getstate(), pickle.HIGHEST_PROTOCOL)
+        worker.request(_INIT + _INIT_HEADER.pack(p, pj, pn, height, width) + fields + _LENGTH.pack(len(state)) +
+                state, 0)
+        return SandboxedAgent(worker)
+
+    def close(self):
+        """Konczy proces roboczy (o ile dziala)."""
+
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+
+
+def serve(agent_path, input_fd, output_fd):
+    """Petla procesu roboczego: importuje modul agenta i obsluguje zadania do zamkniecia potoku lub QUIT."""
+
+    def fail(error):
+        traceback.print_exception(type(error), error, error.__traceback__)
+        message = '{}: {}'.format(type(error).__name__, error).encode('utf-8')
+        _write_all(output_fd, _ERROR + _LENGTH.pack(len(message)) + message)
+
+    try:
+        agent_factory = load_agent_factory(agent_path)
+    except Exception as e:
+        fail(e)
+        return
+    _write_all(output_fd, _OK)
+
+    agent = None
+    height = width = None
+    while True:
+        try:
+            operation = _read_exact(input_fd, 1)
+        except EOFError:
+            return
+        try:
+            if operation == _SENSE_FALSE or operation == _SENSE_TRUE:
+                agent.sense(operation == _SENSE_TRUE)
+                os.write(output_fd, _OK)
+            elif operation == _MOVE:
+                action = agent.move()
+                if action not in _ACTION_CODES:
+                    raise ValueError('invalid action {!r}'.format(action))
+                os.write(output_fd, _OK + _ACTION_CODES[action])
+            elif operation == _INIT:
+                p, pj, pn, height, width = _INIT_HEADER.unpack(_read_exact(input_fd, _INIT_HEADER.size))
+                fields = _read_exact(input_fd, height * width).decode('ascii')
+                area_map = tuple(fields[y * width:(y + 1) * width] for y in range(height))
+                length, = _LENGTH.unpack(_read_exact(input_fd, _LENGTH.size))
+                random.setstate(pickle.loads(_read_exact(input_fd, length)))
+                agent = None
+                agent = agent_factory(p, pj, pn, height, width, area_map)
+                os.write(output_fd, _OK)
+            elif operation == _HISTOGRAM:
+                import numpy as np
+                from belief_quality import histogram_array
+
+                histogram = np.ascontiguousarray(histogram_array(agent.histogram(), height, width),
+                        dtype=np.float64)
+                os.write(output_fd, _OK)
+                _write_all(output_fd, histogram)
+            elif operation == _QUIT:
+                return
+            else:
+                raise ValueError('unknown operation {!r}'.format(operation))
+        except Exception as e:
+            fail(e)
+            return
+
+def main():
+    parser = argparse.ArgumentParser(description='Lost Wumpus agent worker process. Reads requests from stdin\
+            and writes replies to stdout (see sandbox.py); the agent output is redirected to stderr.')
+    parser.add_argument('--memory-limit', dest='memory_limit', metavar='BYTES', type=int, default=None,
+            help='address space limit of the worker process')
+    parser.add_argument('agent', metavar='AGENT', help='file containing Agent class')
+    args = parser.parse_args()
+
+    if args.memory_limit is not None:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (args.memory_limit, args.memory_limit))
+
+    # protokol uzywa oryginalnego stdout, a wszystko, co wypisze agent, trafia na stderr
+    output_fd = os.dup(sys.stdout.fileno())
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    serve(args.agent, sys.stdin.fileno(), output_fd)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Serwer oceny agentow (asyncio) dla ciaglego naplywu zgloszen.
+
+Serwer dziala dlugo i trzyma w pamieci wczytane zbiory swiatow: kazdy proces puli (-j) przy starcie
+wczytuje wszystkie zbiory podane opcjami --worlds NAZWA SCIEZKA [SCIEZKA ...] jako gotowe obiekty Env,
+wiec kolejne zgloszenia nie placa ani za uruchomienie interpretera i import numpy, ani za parsowanie map.
+
+Serwer wykonuje przeslany kod agentow, wiec nie nasluchuje w sieci: klienci lacza sie przez gniazdo
+uniksowe (--socket) dostepne tylko dla uzytkownika, ktory uruchomil serwer (uprawnienia 0600), i wysylaja
+zadania jako obiekty JSON, po jednym w linii:
+- {"type": "submit", "worlds": NAZWA, "source": KOD, "name": "agent.py", "trials": N, "seed": S} - ocena
+  agenta przeslanego jako kod zrodlowy modulu; trials i seed sa opcjonalne,
+- {"type": "status"} - stan serwera: zbiory swiatow, zgloszenia w kolejce i w trakcie oceny.
+Odpowiedzi to rowniez linie JSON: 'queued' (numer zgloszenia i pozycja w kolejce), 'started', 'unit'
+(wynik pary (proba, srodowisko) - pola evaluation.UnitResult) zaraz po jej zakonczeniu, 'trial' (suma
+ruchow i czasu proby, w kolejnosci prob), 'done' (podsumowanie jak w launcherze) albo 'error'.
+
+Zgloszenia czekaja w kolejce FIFO; jednoczesnie oceniane jest co najwyzej --concurrent-jobs zgloszen,
+a kazde z nich ma w puli ograniczona liczbe oczekujacych jednostek, wiec dzieli pule z pozostalymi.
+Ziarna jednostek wyznaczane sa jak w evaluation, wiec wynik jest taki sam jak z launchera.
+
+Uruchomienie serwera i zgloszenie agenta:
+> server.py serve [--socket GNIAZDO] [-j J] [--sandbox] --worlds NAZWA SCIEZKA [SCIEZKA ...] [--worlds ...]
+> server.py submit [--socket GNIAZDO] --worlds NAZWA [-n N] [--seed SEED] AGENT
+> server.py status [--socket GNIAZDO]"""
+
+from collections import OrderedDict
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+from adaptive import conf_delta_95, mean
+from budget import TimeBudget
+from evaluation import ResultsWriter, UnitResult, agent_factory_for, run_unit
+from environment_set import EnvironmentLoadError, EnvironmentSet, environment_files
+
+SOCKET = os.path.join(tempfile.gettempdir(), 'wumpus-server-{}.sock'.format(os.getuid()))
+"""Domyslna sciezka gniazda serwera (osobna dla kazdego uzytkownika)."""
+
+REQUEST_LIMIT = 2 ** 24
+"""Najwieksza dlugosc linii zadania (w bajtach), ktora musi pomiescic kod zrodlowy agenta."""
+
+FACTORY_CACHE = 16
+"""Liczba fabryk agentow przechowywanych w kazdym procesie puli."""
+
+MAX_TASKS_PER_CHILD = 10000
+"""Domyslna liczba jednostek, po ktorej proces puli jest zastepowany nowym (zwalniajac pamiec zgloszen)."""
+
+
+_server_worlds = None
+_server_sandbox = None
+_server_budget = None
+_server_factories = OrderedDict()
+
+def _init_server_worker(world_sets, sandbox, budget):
+    """Inicjalizuje proces puli: wczytuje wszystkie zbiory swiatow jako obiekty Env."""
+
+    global _server_worlds, _server_sandbox, _server_budget
+    _server_worlds = {name: list(EnvironmentSet(paths)) for name, paths in world_sets.items()}
+    _server_sandbox = sandbox
+    _server_budget = budget
+
+def _agent_factory(agent_path):
+    """Zwraca fabryke agenta z pliku agent_path, importujac modul tylko przy pierwszym uzyciu."""
+
+    factory = _server_factories.pop(agent_path, None)
+    if factory is None:
+        factory = agent_factory_for(agent_path, _server_sandbox, isolated=True)
+    _server_factories[agent_path] = factory
+    while len(_server_factories) > FACTORY_CACHE:
+        _, old = _server_factories.popitem(last=False)
+        if _server_sandbox is not None:
+            old.close()
+    return factory
+
+def _worker_ready():
+    return os.getpid()
+
+def _check_agent(agent_path):
+    _agent_factory(agent_path)
+
+def _run_unit_task(agent_path, worlds, seed, trial, env_index):
+    return run_unit(_agent_factory(agent_path), _server_worlds[worlds][env_index], seed, trial, env_index,
+            budget=_server_budget)
+
+
+class _Job:
+    """Zgloszenie: agent z pliku agent_path oceniany trials razy w zbiorze swiatow worlds."""
+
+    def __init__(self, number, agent_path, worlds, trials, seed):
+        self.number = number
+        self.agent_path = agent_path
+        self.worlds = worlds
+        self.trials = trials
+        self.seed = seed
+        self.messages = asyncio.Queue()
+        self.cancelled = False
+
+    def send(self, kind, **fields):
+        message = {'type': kind, 'job': self.number}
+        message.update(fields)
+        self.messages.put_nowait(message)
+
+
+class EvaluationServer:
+    """Serwer oceny agentow w zbiorach swiatow world_sets (slownik nazwa -> lista sciezek '*.in', '*.wpk'
+    lub katalogow) z pula jobs procesow. Opcjonalny sandbox (sandbox.Sandbox) uruchamia agentow w osobnych
+    procesach roboczych, a budget (budget.TimeBudget) ogranicza czas ich wywolan."""
+
+    def __init__(self, world_sets, jobs=1, concurrent_jobs=2, sandbox=None, budget=None,
+            max_tasks_per_child=MAX_TASKS_PER_CHILD):
+        self.world_sets = {name: environment_files(paths) for name, paths in world_sets.items()}
+        # zbiory sa sprawdzane od razu, aby blad w pliku swiata nie ujawnil sie dopiero przy zgloszeniu
+        self.sizes = {name: len(list(EnvironmentSet(paths))) for name, paths in self.world_sets.items()}
+        for name, size in self.sizes.items():
+            if size == 0:
+                raise EnvironmentLoadError("world set '{}' contains no environments".format(name))
+        self.jobs = jobs
+        self.concurrent_jobs = concurrent_jobs
+        self.sandbox = sandbox
+        self.budget = budget
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self.executor = None
+        # numer kolejnej puli; pule tworzy od nowa tylko planista, ktory zauwazyl awarie biezacej
+        self.generation = 0
+        self.restart = asyncio.Lock()
+        self.path = None
+        self.schedulers = []
+        self.queue = None
+        self.running = {}
+        self.numbers = itertools.count(1)
+        self.submissions = tempfile.TemporaryDirectory(prefix='wumpus-submissions-')
+
+    async def __start_executor(self):
+        """Tworzy nowa pule i czeka, az jej procesy wczytaja zbiory swiatow."""
+
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.jobs, initializer=_init_server_worker,
+                initargs=(self.world_sets, self.sandbox, self.budget),
+                max_tasks_per_child=self.max_tasks_per_child)
+        self.generation += 1
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _worker_ready) for _ in range(self.jobs)))
+
+    async def __restart_executor(self, generation):
+        """Zastepuje pule numer generation nowa; jesli inny planista juz ja zastapil, nic nie robi."""
+
+        async with self.restart:
+            if generation != self.generation:
+                return
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            await self.__start_executor()
+
+    async def start(self, path=SOCKET):
+        """Uruchamia pule, planiste zgloszen i nasluchiwanie na gniezdzie uniksowym path (z uprawnieniami
+        tylko dla wlasciciela). Zwraca obiekt asyncio.Server."""
+
+        # procesy puli wczytuja zbiory swiatow przed przyjeciem pierwszego zgloszenia
+        await self.__start_executor()
+        self.queue = asyncio.Queue()
+        self.schedulers = [asyncio.ensure_future(self.__schedule()) for _ in range(self.concurrent_jobs)]
+        # gniazdo tworzone jest od razu bez praw dla grupy i innych, aby nikt nie polaczyl sie przed chmod
+        umask = os.umask(0o177)
+        try:
+            listener = await asyncio.start_unix_server(self.__handle, path, limit=REQUEST_LIMIT)
+        finally:
+            os.umask(umask)
+        os.chmod(path, 0o600)
+        self.path = path
+        return listener
+
+    def close(self):
+        for scheduler in self.schedulers:
+            scheduler.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+        self.submissions.cleanup()
+
+    def status(self):
+        return {'type': 'status', 'worlds': self.sizes, 'queued': self.queue.qsize(),
+                'running': sorted(self.running), 'jobs': self.jobs}
+
+    def submit(self, request):
+        """Tworzy zgloszenie z zadania request i umieszcza je w kolejce. Zglasza ValueError, jesli zadanie
+        jest niepoprawne."""
+
+        worlds = request.get('worlds')
+        if worlds not in self.world_sets:
+            raise ValueError("unknown world set '{}' (available: {})".format(worlds,
+                    ', '.join(sorted(self.world_sets))))
+        trials = int(request.get('trials', 1))
+        if trials < 1:
+            raise ValueError('number of trials must be positive')
+        seed = request.get('seed')
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+
+        source = request.get('source')
+        if not isinstance(source, str):
+            raise ValueError("submission needs 'source' of the agent module")
+
+        number = next(self.numbers)
+        name = os.path.basename(request.get('name') or 'agent.py')
+        if not name.endswith('.py'):
+            name += '.py'
+        directory = os.path.join(self.submissions.name, str(number))
+        os.makedirs(directory)
+        agent_path = os.path.join(directory, name)
+        with open(agent_path, 'w') as f:
+            f.write(source)
+
+        job = _Job(number, agent_path, worlds, trials, seed)
+        job.send('queued', position=self.queue.qsize())
+        self.queue.put_nowait(job)
+        return job
+
+    async def __schedule(self):
+        while True:
+            job = await self.queue.get()
+            if job.cancelled:
+                continue
+            self.running[job.number] = job
+            try:
+                # w trakcie zastepowania puli zgloszenie czeka na gotowosc nowej
+                async with self.restart:
+                    executor, generation = self.executor, self.generation
+                await self.__run(job, executor)
+            except concurrent.futures.process.BrokenProcessPool:
+                # proces puli zakonczyl sie (np. agent zakonczyl proces) - pula tworzona jest od nowa, ale
+                # tylko raz, nawet gdy awarie zauwazy kilka ocenianych w niej zgloszen
+                job.send('error', message='worker process died while evaluating the agent (use --sandbox)')
+                await self.__restart_executor(generation)
+            except Exception as e:
+                job.send('error', message='{}: {}'.format(type(e).__name__, e))
+            finally:
+                del self.running[job.number]
+
+    async def __run(self, job, executor):
+        """Ocenia zgloszenie job w puli executor, wysylajac wyniki jednostek zaraz po ich zakonczeniu, a wyniki prob
+        w kolejnosci numerow prob."""
+
+        loop = asyncio.get_running_loop()
+        environments = self.sizes[job.worlds]
+        job.send('started', trials=job.trials, environments=environments, seed=job.seed)
+        await loop.run_in_executor(executor, _check_agent, job.agent_path)
+
+        units = ((trial, env_index) for trial in range(job.trials) for env_index in range(environments))
+        window = 2 * self.jobs
+        pending = set()
+        done = set()
+        steps = {}
+        seconds_used = {}
+        remaining = {}
+        next_trial = 0
+        trial_steps = []
+        trial_seconds = []
+        try:
+            while True:
+                for trial, env_index in itertools.islice(units, max(0, window - len(pending))):
+                    pending.add(loop.run_in_executor(executor, _run_unit_task, job.agent_path, job.worlds,
+                            job.seed, trial, env_index))
+                if not pending or job.cancelled:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    job.send('unit', **result._asdict())
+                    trial = result.trial
+                    steps[trial] = steps.get(trial, 0) + result.steps
+                    seconds_used[trial] = seconds_used.get(trial, 0) + result.seconds
+                    remaining[trial] = remaining.get(trial, environments) - 1
+                    while remaining.get(next_trial) == 0:
+                        trial_steps.append(steps.pop(next_trial))
+                        trial_seconds.append(seconds_used.pop(next_trial))
+                        del remaining[next_trial]
+                        job.send('trial', trial=next_trial, steps=trial_steps[-1], seconds=trial_seconds[-1])
+                        next_trial += 1
+        finally:
+            # wyjatki jednostek zakonczonych razem z jednostka, ktora przerwala ocene, sa odbierane, aby nie
+            # byly zglaszane jako nieodebrane
+            for future in pending | done:
+                if not future.cancel() and not future.cancelled():
+                    future.exception()
+
+        if not job.cancelled:
+            job.send('done', trials=len(trial_steps), mean_steps=mean(trial_steps),
+                    ci_steps=conf_delta_95(trial_steps), mean_seconds=mean(trial_seconds),
+                    ci_seconds=conf_delta_95(trial_seconds))
+
+    async def __handle(self, reader, writer):
+        """Obsluguje polaczenie klienta: kolejne zadania w liniach, odpowiedzi na zgloszenie az do 'done'
+        lub 'error'. Rozlaczenie klienta anuluje jego zgloszenie."""
+
+        async def send(message):
+            writer.write(json.dumps(message).encode('utf-8') + b'\n')
+            await writer.drain()
+
+        job = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    kind = request.get('type', 'submit')
+                    if kind == 'status':
+                        await send(self.status())
+                        continue
+                    if kind != 'submit':
+                        raise ValueError("unknown request type '{}'".format(kind))
+                    job = self.submit(request)
+                except (ValueError, TypeError, AttributeError, OSError) as e:
+                    await send({'type': 'error', 'job': None, 'message': str(e)})
+                    continue
+
+                while True:
+                    message = await job.messages.get()
+                    await send(message)
+                    if message['type'] in ('done', 'error'):
+                        break
+                job = None
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if job is not None:
+                job.cancelled = True
+            writer.close()
+
+
+def request(message, path=SOCKET):
+    """Wysyla zadanie message (slownik) do serwera nasluchujacego na gniezdzie path i zwraca generator
+    odpowiedzi; konczy sie po odpowiedzi 'done', 'error' lub 'status'."""
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        with connection.makefile('rb') as replies:
+            for line in replies:
+                reply = json.loads(line)
+                yield reply
+                if reply['type'] in ('done', 'error', 'status'):
+                    return
+
+def submission(agent_path, worlds, trials=1, seed=None):
+    """Zwraca zadanie oceny agenta z pliku agent_path (przesylanego jako kod zrodlowy)."""
+
+    with open(agent_path) as f:
+        source = f.read()
+    return {'type': 'submit', 'worlds': worlds, 'name': os.path.basename(agent_path), 'source': source,
+            'trials': trials, 'seed': seed}
+
+
+def serve(args):
+    from sandbox import Sandbox
+
+    sandbox = None
+    if args.sandbox:
+        sandbox = Sandbox(None if args.sandbox_memory is None else int(args.sandbox_memory * 2 ** 20))
+    budget = TimeBudget(kill_after=args.kill_after) if args.kill_after is not None else None
+    server = EvaluationServer({name: paths for name, *paths in args.worlds}, args.jobs, args.concurrent_jobs,
+            sandbox, budget, args.max_tasks_per_child)
+
+    async def run():
+        listener = await server.start(args.socket)
+        print('Listening on {} ({})'.format(args.socket, ', '.join('{}: {} worlds'.format(name, size)
+                for name, size in sorted(server.sizes.items()))), file=sys.stderr, flush=True)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+def submit(args):
+    results = None
+    if args.results is not None:
+        results = ResultsWriter(args.results, args.results_format)
+    try:
+        for reply in request(submission(args.agent, args.worlds, args.trials, args.seed), args.socket):
+            if reply['type'] == 'started' and args.seed is None:
+                print('Seed: {}'.format(reply['seed']), file=sys.stderr)
+            elif reply['type'] == 'unit' and results is not None:
+                results.write(UnitResult(**{field: reply[field] for field in UnitResult._fields}))
+            elif reply['type'] == 'trial':
+                print('{} {}'.format(reply['steps'], reply['seconds']), flush=True)
+            elif reply['type'] == 'done':
+                print('Summary: {:.1f} {:.1f} {:.1f} {:.1f}'.format(reply['mean_steps'], reply['ci_steps'],
+                        reply['mean_seconds'], reply['ci_seconds']))
+            elif reply['type'] == 'error':
+                sys.exit('Error: {}'.format(reply['message']))
+    finally:
+        if results is not None:
+            results.close()
+
+def status(args):
+    for reply in request({'type': 'status'}, args.socket):
+        print(json.dumps(reply, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-running Lost Wumpus evaluation server and its client.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def connection(command):
+        command.add_argument('--socket', metavar='PATH', default=SOCKET,
+                help='Unix socket of the server (default: {})'.format(SOCKET))
+
+    command = commands.add_parser('serve', help='run the server', fromfile_prefix_chars='@')
+    connection(command)
+    command.add_argument('--worlds', metavar=('NAME', 'PATH'), nargs='+', action='append', required=True,
+            help='world set NAME made of \'*.in\' files, world packs \'*.wpk\' or directories; may be repeated')
+    command.add_argument('-j', dest='jobs', metavar='J', type=int, default=os.cpu_count() or 1,
+            help='number of worker processes (default: number of CPUs)')
+    command.add_argument('--concurrent-jobs', dest='concurrent_jobs', metavar='K', type=int, default=2,
+            help='number of submissions evaluated at the same time (default: 2)')
+    command.add_argument('--sandbox', action='store_true', default=False,
+            help='run agents in separate worker processes (see sandbox.py)')
+    command.add_argument('--sandbox-memory', dest='sandbox_memory', metavar='MB', type=float, default=None,
+            help='with --sandbox, limit the address space of each agent worker to MB megabytes')
+    command.add_argument('--kill-after', dest='kill_after', metavar='SEC', type=float, default=None,
+            help='interrupt any single agent call running longer than SEC and abort the episode')
+    command.add_argument('--max-tasks-per-child', dest='max_tasks_per_child', metavar='N', type=int,
+            default=MAX_TASKS_PER_CHILD, help='replace a worker process after N units, releasing memory left\
+            by agent modules; 0 disables it (default: {})'.format(MAX_TASKS_PER_CHILD))
+    command.set_defaults(function=serve)
+
+    command = commands.add_parser('submit', help='submit an agent and print its results like launcher.py')
+    connection(command)
+    command.add_argument('--worlds', metavar='NAME', required=True, help='world set to evaluate the agent in')
+    command.add_argument('-n', dest='trials', metavar='N', type=int, default=1,
+            help='number of trials (default: 1)')
+    command.add_argument('--seed', metavar='SEED', type=int, default=None,
+            help='random seed (default: chosen by the server and printed to stderr)')
+    command.add_argument('--results', dest='results', metavar='FILE', default=None,
+            help='stream one record per (trial, environment) pair to FILE')
+    command.add_argument('--results-format', dest='results_format', choices=ResultsWriter.FORMATS,
+            default=None, help='format of the --results file (default: csv for \'*.csv\', jsonl otherwise)')
+    command.add_argument('agent', metavar='AGENT', help='file containing Agent class')
+    command.set_defaults(function=submit)
+
+    command = commands.add_parser('status', help='print the server status')
+    connection(command)
+    command.set_defaults(function=status)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        if any(len(world_set) < 2 for world_set in args.worlds):
+            parser.error('--worlds requires a NAME and at least one PATH')
+        if args.sandbox_memory is not None and not args.sandbox:
+            parser.error('--sandbox-memory requires --sandbox')
+    try:
+        args.function(args)
+    except EnvironmentLoadError as e:
+        parser.exit(2, '{}: error: {}\n'.format(parser.prog, e))
+    except OSError as e:
+        parser.exit(1, '{}: error: {}\n'.format(parser.prog, e))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# coding: utf-8
+"""Rzadka reprezentacja przekonania dla duzych map.
+
+Po kilku obserwacjach prawie cala masa przekonania skupia sie zwykle na niewielu polach. SparseHistogramFilter
+przechowuje wtedy tylko pola o wadze wiekszej niz epsilon razy najwieksza waga: tablice indeksow pol (cells,
+indeks y * width + x, rosnaco) i ich wag (weights), a koszt aktualizacji zalezy od liczby tych pol, a nie
+od rozmiaru mapy. Gdy nosnik przekonania obejmuje wiecej niz dense_fraction pol mapy, filtr przechodzi na
+gesta tablice (HistogramFilter) i wraca do postaci rzadkiej, gdy nosnik zmaleje ponizej polowy tego progu;
+w postaci gestej rozmiar nosnika sprawdzany jest co CHECK_EVERY aktualizacji, wiec nie dodaje on przejscia
+po calej mapie do kazdej aktualizacji.
+
+Interfejs jest zgodny z HistogramFilter (sense, move, normalize, rescale, floor, peak, normalized, belief);
+gesta tablica belief tworzona jest na zadanie, wiec agent moze zwracac ja z metody histogram(). Filtru
+uzywa agents/sparse_qmdp_agent.py."""
+
+import numpy as np
+from histogram_filter import HistogramFilter
+
+
+class SparseHistogramFilter:
+    """Filtr histogramowy z rzadkim przekonaniem. Argumenty jak w HistogramFilter oraz epsilon (wzgledny prog
+    przycinania wag) i dense_fraction (czesc pol mapy, powyzej ktorej uzywana jest gesta tablica)."""
+
+    CHECK_EVERY = 8
+    """Co ile aktualizacji w postaci gestej sprawdzany jest rozmiar nosnika przekonania."""
+
+    def __init__(self, p, pj, pn, height, width, area_map, belief=None, epsilon=1e-9, dense_fraction=0.1):
+        self.dense = HistogramFilter(p, pj, pn, height, width, area_map, belief)
+        self.model = self.dense.model
+        self.height = height
+        self.width = width
+        self.fields = height * width
+        self.likelihood = {sensor: mask.ravel() for sensor, mask in self.model.likelihood.items()}
+        self.epsilon = epsilon
+        self.max_support = max(1, int(dense_fraction * self.fields))
+
+        self.cells = None
+        self.weights = None
+        self.__updates = 0
+        self.__update_mode(check=True)
+
+    @property
+    def is_sparse(self):
+        return self.cells is not None
+
+    @property
+    def support(self):
+        """Liczba pol o niezerowej wadze (w postaci gestej - o wadze powyzej progu przycinania)."""
+
+        if self.is_sparse:
+            return len(self.cells)
+        belief = self.dense.belief
+        return int(np.count_nonzero(belief > self.epsilon * belief.max()))
+
+    @property
+    def belief(self):
+        """Gesta tablica height x width z przekonaniem; w postaci rzadkiej tworzona przy kazdym odwolaniu."""
+
+        if not self.is_sparse:
+            return self.dense.belief
+        belief = np.zeros(self.fields)
+        belief[self.cells] = self.weights
+        return belief.reshape(self.height, self.width)
+
+    @belief.setter
+    def belief(self, belief):
+        self.cells = self.weights = None
+        self.dense.belief = np.array(belief, dtype=np.float64)
+        self.__update_mode(check=True)
+
+    def nonzero(self):
+        """Zwraca indeksy pol (y * width + x) o niezerowej wadze i ich wagi."""
+
+        if self.is_sparse:
+            return self.cells, self.weights
+        flat = self.dense.belief.ravel()
+        cells = np.flatnonzero(flat)
+        return cells, flat[cells]
+
+    def __update_mode(self, check=False):
+        """Przechodzi z postaci gestej do rzadkiej (i odwrotnie), jesli nosnik przekonania przekroczyl progi.
+        W postaci gestej nosnik sprawdzany jest co CHECK_EVERY wywolan (lub zawsze, gdy podano check)."""
+
+        if self.is_sparse:
+            if len(self.cells) > self.max_support:
+                self.dense.belief = self.belief
+                self.cells = self.weights = None
+                self.__updates = 0
+            return
+
+        self.__updates += 1
+        if not check and self.__updates < SparseHistogramFilter.CHECK_EVERY:
+            return
+        self.__updates = 0
+        peak = self.dense.peak()
+        if peak <= 0.:
+            return
+        flat = self.dense.belief.ravel()
+        cells = np.flatnonzero(flat > self.epsilon * peak)
+        if 2 * len(cells) <= self.max_support:
+            self.cells = cells
+            self.weights = flat[cells]
+
+    def __prune(self):
+        peak = self.weights.max() if len(self.weights) > 0 else 0.
+        if peak <= 0.:
+            # obserwacja niemozliwa przy tym przekonaniu - przekonanie rozkladane jest od nowa na wszystkie
+            # pola poza wyjsciem (jak na poczatku), w postaci gestej
+            belief = np.ones((self.height, self.width))
+            belief[self.model.exit_mask] = 0.
+            self.cells = self.weights = None
+            self.dense.belief = belief
+            self.__updates = 0
+            return
+        if peak < HistogramFilter.UNDERFLOW:
+            self.weights /= peak
+            peak = 1.
+        kept = self.weights > self.epsilon * peak
+        if not kept.all():
+            self.cells = self.cells[kept]
+            self.weights = self.weights[kept]
+
+    def sense(self, sensor):
+        """Uwzglednia w przekonaniu obserwacje sensora (True gdy agent ma uczucie stania w jamie)."""
+
+        if not self.is_sparse:
+            self.dense.sense(sensor)
+            self.__update_mode()
+            return
+        self.weights = self.weights * self.likelihood[sensor][self.cells]
+        self.__prune()
+
+    def move(self, action):
+        """Uwzglednia w przekonaniu wykonanie akcji action wraz z modelem zaburzen ruchu."""
+
+        if not self.is_sparse:
+            self.dense.move(action)
+            self.__update_mode()
+            return
+
+        ys, xs = np.divmod(self.cells, self.width)
+        kernel = self.model.motion_kernels[action]
+        targets = np.concatenate([((ys + dy) % self.height) * self.width + (xs + dx) % self.width
+                for (dy, dx), _ in kernel])
+        weights = np.concatenate([weight * self.weights for _, weight in kernel])
+        self.cells, inverse = np.unique(targets, return_inverse=True)
+        self.weights = np.bincount(inverse, weights=weights)
+        self.__prune()
+        self.__update_mode()
+
+    def normalize(self):
+        """Normalizuje przekonanie tak, aby sumowalo sie do 1."""
+
+        if not self.is_sparse:
+            self.dense.normalize()
+            return
+        self.weights /= self.weights.sum()
+
+    def rescale(self, floor=0.):
+        """Dzieli przekonanie przez jego maksimum, a nastepnie podnosi wartosci mniejsze od floor do floor.
+        Dodatni floor nadaje wage wszystkim polom mapy, wiec filtr przechodzi wtedy na postac gesta."""
+
+        if floor > 0. and self.is_sparse:
+            self.dense.belief = self.belief
+            self.cells = self.weights = None
+        if not self.is_sparse:
+            self.dense.rescale(floor)
+            self.__update_mode()
+            return
+        self.weights /= self.weights.max()
+
+    def peak(self):
+        """Zwraca maksimum przekonania."""
+
+        if not self.is_sparse:
+            return self.dense.peak()
+        return float(self.weights.max())
+
+    def floor(self, floor):
+        """Jak rescale(floor), ale bez dzielenia przekonania przez maksimum (patrz HistogramFilter.floor).
+        Dodatni floor przelacza filtr na postac gesta."""
+
+        if floor > 0. and self.is_sparse:
+            self.dense.belief = self.belief
+            self.cells = self.weights = None
+        if not self.is_sparse:
+            self.dense.floor(floor)
+            self.__update_mode()
+
+    def normalized(self):
+        """Zwraca gesta tablice przekonania podzielonego przez maksimum."""
+
+        if not self.is_sparse:
+            return self.dense.normalized()
+        return self.belief / self.peak()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Turniej agentow zagubionego Wumpusa.
+
+Wszystkie moduly agentow importowane sa raz na proces, a kazdy agent oceniany jest w tych samych
+srodowiskach z tym samym harmonogramem liczb losowych (wspolne liczby losowe: srodowisko w jednostce
+(proba, srodowisko) zachowuje sie identycznie dla kazdego agenta), co zaweza roznice miedzy agentami.
+Jednostki (agent, proba, srodowisko) wykonywane sa w puli procesow, a wyniki wypisywane sa na biezaco.
+Na koniec zapisywane sa pliki results.csv (liczby ruchow) i times.csv (czasy) w ukladzie czytanym przez
+make_stats.R: kolumna na agenta, wiersz na probe; w results.csv kolumny posortowane sa od najwiekszej
+sredniej liczby ruchow, w times.csv od najmniejszego sredniego czasu.
+
+> tournament.py [-n N] [-j J] [--seed SEED] SWIATY AGENT [AGENT ...]"""
+
+from adaptive import StoppingRule, dominated
+import argparse
+import itertools
+import multiprocessing
+import os.path
+import random
+import sys
+import traceback
+from budget import TimeBudget
+from evaluation import ResultsWriter, imap_throttled, load_agent_factory, run_unit
+from launcher import env_file_or_dir
+from environment_set import EnvironmentLoadError, EnvironmentSet
+
+
+_worker_agent_factories = None
+_worker_environments = None
+_worker_budget = None
+
+def _init_worker(agent_paths, environments, budget):
+    """Inicjalizuje proces: moduly wszystkich agentow importowane sa tylko raz na proces."""
+
+    global _worker_agent_factories, _worker_environments, _worker_budget
+    _worker_agent_factories = []
+    for path in agent_paths:
+        try:
+            _worker_agent_factories.append(load_agent_factory(path))
+        except Exception:
+            _worker_agent_factories.append(None)
+    _worker_environments = environments
+    _worker_budget = budget
+
+def _run_unit(unit):
+    """Wykonuje jednostke (agent, proba, srodowisko). Zwraca (agent, wynik, None) lub, gdy agent zglosi
+    wyjatek, (agent, None, opis bledu)."""
+
+    agent_index, trial, env_index, seed = unit
+    try:
+        result = run_unit(_worker_agent_factories[agent_index], _worker_environments[env_index], seed, trial,
+                env_index, budget=_worker_budget)
+    except EnvironmentLoadError:
+        raise
+    except Exception:
+        return agent_index, None, traceback.format_exc()
+    return agent_index, result, None
+
+
+def agent_names(agent_paths):
+    """Zwraca nazwy agentow: nazwy plikow, a dla plikow o tej samej nazwie - uzupelnione o kolejne katalogi
+    nadrzedne, az nazwy beda rozne. Ten sam plik podany kilka razy dostaje numer '#N' (od 1)."""
+
+    paths = [os.path.normpath(os.path.abspath(path)) for path in agent_paths]
+    parts = [path.split(os.sep) for path in paths]
+    depths = [1] * len(parts)
+    while True:
+        names = ['/'.join(path[-depth:]) for path, depth in zip(parts, depths)]
+        collisions = [i for i in range(len(names)) if depths[i] < len(parts[i]) and any(names[j] == names[i]
+                and paths[j] != paths[i] for j in range(len(names)))]
+        if not collisions:
+            break
+        for i in collisions:
+            depths[i] += 1
+
+    totals = {name: names.count(name) for name in names}
+    counts = {}
+    for i, name in enumerate(names):
+        if totals[name] > 1:
+            counts[name] = counts.get(name, 0) + 1
+            names[i] = '{}#{}'.format(name, counts[name])
+    return names
+
+
+class Tournament:
+    """Turniej agentow z plikow agent_paths w srodowiskach environments (sekwencji Env). Jesli trials jest
+    None, proby generowane sa az do przerwania iteracji (tryb adaptacyjny).
+
+    Dla kazdego agenta przechowywane sa sumy ruchow (steps) i czasu (seconds) zakonczonych prob,
+    w slownikach indeksowanych numerem proby. Nowe jednostki generowane sa tylko dla agentow ze zbioru
+    active; agenci wykluczeni (bledy lub zdominowanie) przestaja byc oceniani."""
+
+    def __init__(self, agent_paths, environments, trials, seed, jobs=1, budget=None):
+        self.agent_paths = list(agent_paths)
+        self.names = agent_names(self.agent_paths)
+        self.environments = environments
+        self.trials = trials
+        self.seed = seed
+        self.jobs = jobs
+        self.budget = budget
+
+        self.steps = [{} for _ in self.agent_paths]
+        self.seconds = [{} for _ in self.agent_paths]
+        self.__partial = [{} for _ in self.agent_paths]
+        self.active = set(range(len(self.agent_paths)))
+        self.errors = {}
+
+    def units(self):
+        """Generator jednostek (agent, proba, srodowisko, ziarno); dla danej pary (proba, srodowisko)
+        jednostki wszystkich aktywnych agentow wystepuja kolejno po sobie."""
+
+        trial_numbers = itertools.count() if self.trials is None else range(self.trials)
+        for trial in trial_numbers:
+            for env_index in range(len(self.environments)):
+                for agent_index in sorted(self.active):
+                    yield agent_index, trial, env_index, self.seed
+
+    def execute(self, units):
+        """Wykonuje jednostki units i generuje kolejno krotki (agent, wynik, blad) w kolejnosci zakonczenia."""
+
+        if self.jobs <= 1:
+            _init_worker(self.agent_paths, self.environments, self.budget)
+            for unit in units:
+                yield _run_unit(unit)
+            return
+
+        with multiprocessing.Pool(self.jobs, _init_worker, (self.agent_paths, self.environments,
+                self.budget)) as pool:
+            for outcome in imap_throttled(pool, _run_unit, units, 16):
+                yield outcome
+
+    def record(self, agent_index, result, error):
+        """Uwzglednia wynik jednostki. Zwraca numer proby, jesli wlasnie zakonczyla sie ona dla agenta
+        agent_index, w przeciwnym razie None. Agent, ktory zglosil wyjatek, jest wykluczany z turnieju."""
+
+        if error is not None:
+            if agent_index not in self.errors:
+                self.errors[agent_index] = error
+                self.active.discard(agent_index)
+            return None
+        if agent_index in self.errors:
+            return None
+
+        trial = result.trial
+        steps, seconds, remaining = self.__partial[agent_index].get(trial, (0, 0., len(self.environments)))
+        steps += result.steps
+        seconds += result.seconds
+        remaining -= 1
+        if remaining > 0:
+            self.__partial[agent_index][trial] = (steps, seconds, remaining)
+            return None
+
+        self.__partial[agent_index].pop(trial, None)
+        self.steps[agent_index][trial] = steps
+        self.seconds[agent_index][trial] = seconds
+        return trial
+
+    def mean_steps(self, agent_index):
+        steps = self.steps[agent_index]
+        return sum(steps.values()) / float(len(steps))
+
+    def mean_seconds(self, agent_index):
+        seconds = self.seconds[agent_index]
+        return sum(seconds.values()) / float(len(seconds))
+
+    def common_samples(self, agents):
+        """Zwraca slownik: agent -> liczby ruchow w probach zakonczonych przez wszystkich agentow agents,
+        w kolejnosci numerow prob."""
+
+        agents = list(agents)
+        if not agents:
+            return {}
+        trials = sorted(set.intersection(*[set(self.steps[i]) for i in agents]))
+        return {i: [self.steps[i][trial] for trial in trials] for i in agents}
+
+    def ranking(self, agents=None):
+        """Zwraca indeksy agentow (domyslnie wszystkich niewykluczonych z powodu bledow, ktore zakonczyly
+        choc jedna probe) posortowane od najmniejszej sredniej liczby ruchow."""
+
+        if agents is None:
+            agents = [i for i in range(len(self.agent_paths)) if i not in self.errors and self.steps[i]]
+        return sorted(agents, key=self.mean_steps)
+
+    def write_csv(self, results_path, times_path, agents=None):
+        """Zapisuje pliki z liczbami ruchow i czasami w ukladzie czytanym przez make_stats.R. Proby, ktorych
+        agent nie wykonal (np. po odrzuceniu w trybie adaptacyjnym), pozostawiane sa puste."""
+
+        ranking = self.ranking(agents)
+        trials = max([max(self.steps[i]) + 1 for i in ranking] or [0])
+        for path, table, order in [(results_path, self.steps, ranking[::-1]),
+                (times_path, self.seconds, sorted(ranking, key=self.mean_seconds))]:
+            with open(path, 'w') as f:
+                f.write(','.join(self.names[i] for i in order) + '\n')
+                for trial in range(trials):
+                    f.write(','.join(str(table[i].get(trial, '')) for i in order) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='The Lost Wumpus tournament: evaluates many agents in the\
+            same environments with common random numbers.', fromfile_prefix_chars='@')
+    parser.add_argument('-n', dest='trials', metavar='N', type=int, default=1,
+            help='number of times each agent will be placed in each environment (default: 1)')
+    parser.add_argument('-j', dest='jobs', metavar='J', type=int, default=1,
+            help='number of worker processes (default: 1)')
+    parser.add_argument('--seed', dest='seed', metavar='SEED', type=int, default=None,
+            help='seed of the common random number schedule (default: random, printed to stderr)')
+    parser.add_argument('--results', dest='results', metavar='FILE', default=None,
+            help='stream one record per (agent, trial, environment) to FILE (jsonl, or csv for \'*.csv\')')
+    parser.add_argument('--results-csv', dest='results_csv', metavar='FILE', default='results.csv',
+            help='steps table for make_stats.R (default: results.csv)')
+    parser.add_argument('--times-csv', dest='times_csv', metavar='FILE', default='times.csv',
+            help='times table (default: times.csv)')
+    parser.add_argument('--kill-after', dest='kill_after', metavar='SEC', type=float, default=None,
+            help='interrupt any single agent call running longer than SEC and abort the episode')
+    parser.add_argument('--target-ci', dest='target_ci', metavar='W', type=float, default=None,
+            help='adaptive mode: instead of N trials, keep adding trials until the 95%% confidence interval\
+            of mean steps of every remaining agent is at most W or a limit below is reached; agents\
+            statistically worse than another agent are dropped on the way (at 5%% overall error, corrected for\
+            repeated looks and the number of agent pairs)')
+    parser.add_argument('--min-trials', dest='min_trials', metavar='N', type=int, default=5,
+            help='minimal number of trials in adaptive mode before any agent is dropped (default: 5)')
+    parser.add_argument('--max-trials', dest='max_trials', metavar='N', type=int, default=None,
+            help='maximal number of trials in adaptive mode (default: no limit)')
+    parser.add_argument('--time-budget', dest='time_budget', metavar='SEC', type=float, default=None,
+            help='stop adding trials in adaptive mode after SEC seconds (default: no limit)')
+    parser.add_argument('--validate', dest='validate', action='store_true', default=False,
+            help='read every environment file before the first trial and stop on the first broken one\
+            (default: files are read when the tournament reaches them)')
+    parser.add_argument('worlds', metavar='ENV', type=env_file_or_dir,
+            help='file \'*.in\', world pack \'*.wpk\' or directory containing \'*.in\' files')
+    parser.add_argument('agents', metavar='AGENT', nargs='+', help='file containing Agent class')
+    args = parser.parse_args()
+
+    try:
+        environments = EnvironmentSet(args.worlds)
+        if args.validate:
+            environments.validate()
+    except EnvironmentLoadError as e:
+        parser.error(str(e))
+
+    if args.seed is None:
+        args.seed = random.SystemRandom().randrange(2 ** 32)
+        print('Seed: {}'.format(args.seed), file=sys.stderr)
+
+    agent_paths = []
+    for path in args.agents:
+        try:
+            load_agent_factory(path)
+        except Exception as e:
+            print("{}: can't load Agent class: {}".format(path, e), file=sys.stderr)
+        else:
+            agent_paths.append(path)
+
+    budget = TimeBudget(kill_after=args.kill_after) if args.kill_after is not None else None
+
+    stopping_rule = None
+    trials = args.trials
+    if args.target_ci is not None:
+        stopping_rule = StoppingRule(args.target_ci, args.min_trials, args.max_trials, args.time_budget)
+        trials = args.max_trials
+
+    tournament = Tournament(agent_paths, environments, trials, args.seed, args.jobs, budget)
+
+    results = None
+    if args.results is not None:
+        results = ResultsWriter(args.results, extra_fields=('agent',))
+
+    outcomes = tournament.execute(tournament.units())
+    try:
+        for agent_index, result, error in outcomes:
+            name = tournament.names[agent_index]
+            if error is not None and agent_index not in tournament.errors:
+                print('{}: agent failed:\n{}'.format(name, error), file=sys.stderr)
+            if result is not None and results is not None:
+                results.write(result, name)
+            trial = tournament.record(agent_index, result, error)
+            if trial is None:
+                continue
+            print('{} {} {} {}'.format(name, trial, tournament.steps[agent_index][trial],
+                tournament.seconds[agent_index][trial]), flush=True)
+
+            if stopping_rule is not None and agent_index in tournament.active:
+                samples = tournament.common_samples(tournament.active)
+                for loser in dominated(samples, stopping_rule.min_trials, len(tournament.agent_paths)):
+                    tournament.active.discard(loser)
+                    print('{}: dropped after {} trials, statistically worse than another agent'.format(
+                        tournament.names[loser], len(samples[loser])), file=sys.stderr)
+                reasons = [stopping_rule.reason(samples[i]) for i in tournament.active]
+                if not tournament.active or all(reasons):
+                    print('Stopped: {}'.format(', '.join(sorted(set(reasons))) or 'no agents left'),
+                            file=sys.stderr)
+                    break
+    except EnvironmentLoadError as e:
+        parser.exit(2, '{}: error: {}\n'.format(parser.prog, e))
+    finally:
+        outcomes.close()
+        if results is not None:
+            results.close()
+
+    for rank, agent_index in enumerate(tournament.ranking(), 1):
+        print('Rank {}: {} {:.1f} {:.3f}'.format(rank, tournament.names[agent_index],
+            tournament.mean_steps(agent_index), tournament.mean_seconds(agent_index)))
+
+    tournament.write_csv(args.results_csv, args.times_csv)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Zapis i odtwarzanie przebiegu epizodow.
+
+Srodowisko (Env) z ustawionym atrybutem recorder (TrajectoryRecorder) zapisuje przebieg epizodu w obiekcie
+Trajectory. Kazdy ruch zajmuje jeden bajt: numer akcji (bity 0-1), numer zaburzenia ruchu (bity 2-4, 0 - brak
+zaburzenia) i stan sensora po ruchu (bity 5-6: 0 - False, 1 - True, 2 - None po dotarciu do wyjscia).
+Pozycje agenta nie sa zapisywane - wynikaja z pozycji startowej i kolejnych przemieszczen. Jesli
+snapshot_every > 0, zapisywany jest tez histogram agenta co snapshot_every ruchow (po obserwacji sensora,
+przed wyborem kolejnego ruchu), wiec koszt zapisu przy duzej liczbie epizodow pozostaje niewielki.
+
+Trajectory.state(t) odtwarza stan po t ruchach bez ponownego uruchamiania agenta. TrajectoryWriter zapisuje
+epizody jednostek (proba, srodowisko) w katalogu, po jednym pliku '*.npz' na epizod.
+
+Podglad zapisanego epizodu:
+> trajectory.py PLIK [KROK]"""
+
+from collections import namedtuple
+import argparse
+import bisect
+import json
+import os.path
+import numpy as np
+from action import Action
+from belief_quality import histogram_array
+
+ACTIONS = (Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT)
+
+MOTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+"""Przemieszczenia akcji z ACTIONS."""
+
+DISTURBANCES = ((0, 0), (-1, 0), (1, 0), (0, 1), (0, -1))
+"""Zaburzenia ruchu; indeks 0 oznacza ruch niezaburzony."""
+
+_SENSOR_CODES = {False: 0, True: 1 << 5, None: 2 << 5}
+_SENSORS = (False, True, None)
+
+_MOVE_CODES = {(action, (dy + ey, dx + ex)): a | d << 2
+        for a, (action, (dy, dx)) in enumerate(zip(ACTIONS, MOTIONS))
+        for d, (ey, ex) in enumerate(DISTURBANCES)}
+
+TrajectoryState = namedtuple('TrajectoryState', ['step', 'y', 'x', 'action', 'motion', 'sensor', 'histogram'])
+"""Stan epizodu po step ruchach: pozycja agenta, akcja i przemieszczenie ostatniego ruchu (None przed
+pierwszym ruchem), stan sensora oraz histogram agenta, jesli zostal zapisany w tym kroku (w przeciwnym
+razie None)."""
+
+
+class Trajectory:
+    """Przebieg jednego epizodu w srodowisku o parametrach p, pj, pn i mapie area_map."""
+
+    def __init__(self, name, p, pj, pn, area_map, start_y, start_x, initial_sensor, codes=b'', snapshots=None,
+            completed=False, failure=None):
+        self.name = name
+        self.p = p
+        self.pj = pj
+        self.pn = pn
+        self.map = tuple(area_map)
+        self.height = len(self.map)
+        self.width = len(self.map[0])
+        self.start_y = start_y
+        self.start_x = start_x
+        self.initial_sensor = initial_sensor
+        self.codes = bytearray(codes)
+        self.snapshots = {} if snapshots is None else snapshots
+        self.completed = completed
+        self.failure = failure
+        self.__decoded = None
+        self.__snapshot_steps = None
+
+    def __len__(self):
+        """Liczba wykonanych ruchow."""
+
+        return len(self.codes)
+
+    def __decode(self):
+        if self.__decoded is None or len(self.__decoded[0]) != len(self.codes) + 1:
+            codes = np.frombuffer(bytes(self.codes), dtype=np.uint8)
+            actions = codes & 3
+            disturbances = (codes >> 2) & 7
+            motions = np.array(MOTIONS)[actions] + np.array(DISTURBANCES)[disturbances]
+            ys = np.concatenate([[self.start_y], self.start_y + np.cumsum(motions[:, 0])]) % self.height
+            xs = np.concatenate([[self.start_x], self.start_x + np.cumsum(motions[:, 1])]) % self.width
+            self.__decoded = (ys, xs, actions, motions, codes >> 5)
+        return self.__decoded
+
+    def positions(self):
+        """Zwraca tablice wspolrzednych (ys, xs) agenta po kolejnych ruchach (len(self) + 1 pozycji)."""
+
+        ys, xs = self.__decode()[:2]
+        return ys, xs
+
+    def state(self, step):
+        """Odtwarza stan epizodu po step ruchach (0 <= step <= len(self))."""
+
+        if step < 0:
+            step += len(self) + 1
+        if not 0 <= step <= len(self):
+            raise IndexError('trajectory step out of range')
+
+        ys, xs, actions, motions, sensors = self.__decode()
+        if step == 0:
+            action = motion = None
+            sensor = self.initial_sensor
+        else:
+            action = ACTIONS[actions[step - 1]]
+            motion = (int(motions[step - 1][0]), int(motions[step - 1][1]))
+            sensor = _SENSORS[sensors[step - 1]]
+        return TrajectoryState(step, int(ys[step]), int(xs[step]), action, motion, sensor,
+                self.snapshots.get(step))
+
+    def replay(self):
+        """Generator stanow epizodu po kolejnych ruchach, od stanu poczatkowego."""
+
+        for step in range(len(self) + 1):
+            yield self.state(step)
+
+    def last_snapshot(self, step):
+        """Zwraca (krok, histogram) ostatniego histogramu zapisanego nie pozniej niz po step ruchach albo None."""
+
+        # posortowane kroki zapisanych histogramow odswiezane sa, gdy przybylo histogramow
+        if self.__snapshot_steps is None or len(self.__snapshot_steps) != len(self.snapshots):
+            self.__snapshot_steps = sorted(self.snapshots)
+        index = bisect.bisect_right(self.__snapshot_steps, step)
+        if index == 0:
+            return None
+        last = self.__snapshot_steps[index - 1]
+        return last, self.snapshots[last]
+
+    def save(self, path):
+        """Zapisuje epizod do pliku '*.npz'."""
+
+        meta = {'name': self.name, 'p': self.p, 'pj': self.pj, 'pn': self.pn, 'map': list(self.map),
+                'start_y': self.start_y, 'start_x': self.start_x, 'initial_sensor': self.initial_sensor,
+                'completed': self.completed, 'failure': self.failure}
+        steps = sorted(self.snapshots)
+        snapshots = (np.array([self.snapshots[step] for step in steps]) if steps
+                else np.zeros((0, self.height, self.width)))
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), codes=np.frombuffer(bytes(self.codes),
+                dtype=np.uint8), snapshot_steps=np.array(steps, dtype=np.int64), snapshots=snapshots)
+
+    @classmethod
+    def load(cls, path):
+        """Wczytuje epizod zapisany metoda save."""
+
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            snapshots = {int(step): snapshot for step, snapshot in zip(data['snapshot_steps'], data['snapshots'])}
+            return cls(meta['name'], meta['p'], meta['pj'], meta['pn'], meta['map'], meta['start_y'],
+                    meta['start_x'], meta['initial_sensor'], data['codes'].tobytes(), snapshots, meta['completed'],
+                    meta['failure'])
+
+
+class TrajectoryRecorder:
+    """Zapisuje przebieg epizodow srodowiska, do ktorego jest przypisany (Env.recorder). Przebieg
+    ostatniego epizodu dostepny jest w atrybucie trajectory."""
+
+    def __init__(self, snapshot_every=0):
+        self.snapshot_every = snapshot_every
+        self.trajectory = None
+
+    def start(self, env):
+        """Rozpoczyna zapis epizodu; wywolywane przez Env.reset."""
+
+        self.trajectory = Trajectory(env.name, env.p, env.pj, env.pn, env.map, env.agent_y, env.agent_x,
+                env.agent_sensor)
+
+    def sensed(self, env):
+        """Zapisuje histogram agenta co snapshot_every ruchow; wywolywane przez Env.step_sense."""
+
+        step = env.agent_steps_counter
+        if self.snapshot_every > 0 and step % self.snapshot_every == 0:
+            self.trajectory.snapshots[step] = histogram_array(env.agent.histogram(), env.height,
+                    env.width).astype(np.float64)
+
+    def moved(self, env):
+        """Zapisuje ruch agenta; wywolywane przez Env.step_move."""
+
+        self.trajectory.codes.append(_MOVE_CODES[env.agent_last_action, env.agent_last_motion] |
+                _SENSOR_CODES[env.agent_sensor])
+
+    def finish(self, env):
+        """Zapisuje wynik epizodu; wywolywane na koniec Env.run."""
+
+        self.trajectory.completed = env.is_completed()
+        self.trajectory.failure = None if env.agent_failure is None else str(env.agent_failure)
+
+
+class TrajectoryWriter:
+    """Zapisuje epizody jednostek (proba, srodowisko) w katalogu directory, w plikach
+    trial<proba>_env<srodowisko>.npz; histogram agenta zapisywany jest co snapshot_every ruchow."""
+
+    def __init__(self, directory, snapshot_every=0):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+    def recorder(self):
+        return TrajectoryRecorder(self.snapshot_every)
+
+    def path(self, trial, env_index):
+        return os.path.join(self.directory, 'trial{}_env{}.npz'.format(trial, env_index))
+
+    def write(self, trajectory, trial, env_index):
+        trajectory.save(self.path(trial, env_index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prints a recorded Lost Wumpus episode.')
+    parser.add_argument('path', metavar='FILE', help='recorded episode (*.npz)')
+    parser.add_argument('step', metavar='STEP', type=int, nargs='?', default=None,
+            help='print only the state after STEP moves, with the agent histogram if it was recorded')
+    args = parser.parse_args()
+
+    trajectory = Trajectory.load(args.path)
+    print('{}: {} steps, {}'.format(trajectory.name, len(trajectory),
+            'completed' if trajectory.completed else 'not completed'))
+    states = trajectory.replay() if args.step is None else [trajectory.state(args.step)]
+    for state in states:
+        print('cnt: {}; pos: ({}, {}); sen: {}; act: {}; mot: {}'.format(state.step, state.y + 1, state.x + 1,
+                state.sensor, state.action, state.motion))
+        if args.step is not None and state.histogram is not None:
+            print(np.array2string(state.histogram, precision=3))
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 import gtk
 import cairo
 from world import World
-from copy import deepcopy
+from belief_quality import histogram_array
 
 class GUI(gtk.Window):
     """Okienko wizualizacji zachowania agenta w srodowisku."""
@@ -142,20 +142,16 @@ class GUI(gtk.Window):
         return cairo.SolidPattern(r, g, 0)
 
     def __denormalize_histogram(self, histogram):
-        histogram = deepcopy(histogram)
-        denominator = max(max(line) for line in histogram)
-        if denominator != 0:
-            for y in range(self.env.height):
-                for x in range(self.env.width):
-                    histogram[y][x] /= denominator
-        return histogram
+        # dzielenie tworzy nowa tablice, histogram agenta pozostaje niezmieniony
+        denominator = histogram.max()
+        return histogram / denominator if denominator != 0 else histogram
 
     def expose(self, widget, event):
         """Rysuje mape srodowiska i wiedzy agenta."""
 
         cr = self.darea.window.cairo_create()
 
-        histogram = self.env.agent.histogram()
+        histogram = histogram_array(self.env.agent.histogram(), self.env.height, self.env.width)
 
         if (self.denorm_chbox.get_active()):
             histogram = self.__denormalize_histogram(histogram)
@@ -163,7 +159,7 @@ class GUI(gtk.Window):
         for y in range(self.env.height):
             for x in range(self.env.width):
                 cr.set_line_width(0)
-                cr.set_source(self.__gradient(histogram[y][x]))
+                cr.set_source(self.__gradient(histogram[y, x]))
                 cr.rectangle(x * self.box_size, y * self.box_size, self.box_size - 1,
                         self.box_size - 1)
                 cr.fill()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Binarny format zbioru swiatow (plik .wpk).
+
+Jeden plik przechowuje wiele map wraz z ich parametrami:
+- naglowek (32 bajty): sygnatura MAGIC, liczba swiatow, polozenie tabeli i polozenie bloku nazw (uint64),
+- siatki map: dla kazdego swiata height * width bajtow ze znakami pol World, wiersz po wierszu,
+- tabela naglowkow swiatow (RECORD): p, pj, pn, wymiary, pozycja startowa (-1 gdy brak) i polozenie siatki,
+- blok nazw swiatow w UTF-8, rozdzielonych znakami nowej linii.
+
+Tabela zapisywana jest za siatkami, dzieki czemu zbior mozna zapisywac strumieniowo. WorldPack odwzorowuje
+plik w pamieci (np.memmap) i tworzy obiekty Env dopiero przy odwolaniu do swiata o danym indeksie.
+
+Konwersja katalogow z plikami '*.in':
+> world_pack.py WYJSCIE.wpk KATALOG_LUB_PLIK [KATALOG_LUB_PLIK ...]"""
+
+import argparse
+import os.path
+import struct
+import numpy as np
+from environment import Env
+from environment_set import environment_files
+
+MAGIC = b'WUMPACK1'
+
+HEADER = struct.Struct('<8sQQQ')
+
+RECORD = np.dtype([
+    ('p', '<f8'), ('pj', '<f8'), ('pn', '<f8'),
+    ('height', '<u4'), ('width', '<u4'),
+    ('start_y', '<i4'), ('start_x', '<i4'),
+    ('offset', '<u8')
+])
+
+
+class WorldPack:
+    """Zbior swiatow odczytywany z pliku .wpk odwzorowanego w pamieci. Zachowuje sie jak sekwencja
+    obiektow Env tworzonych przy kazdym odwolaniu."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+
+        magic, count, table_offset, names_offset = HEADER.unpack(self.data[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError("'{}' is not a world pack file".format(path))
+
+        self.records = self.data[table_offset:table_offset + count * RECORD.itemsize].view(RECORD)
+        names = self.data[names_offset:].tobytes().decode('utf-8')
+        self.names = names.split('\n') if count > 0 else []
+
+    def __len__(self):
+        return len(self.records)
+
+    def grid(self, index):
+        """Zwraca siatke znakow swiata index jako tablice uint8 height x width (widok na plik, bez kopiowania)."""
+
+        record = self.records[index]
+        start = int(record['offset'])
+        size = int(record['height']) * int(record['width'])
+        return self.data[start:start + size].reshape(int(record['height']), int(record['width']))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('world pack index out of range')
+
+        record = self.records[index]
+        grid = self.grid(index)
+        area_map = [row.tobytes().decode('ascii') for row in grid]
+        start_y = int(record['start_y'])
+        start_x = int(record['start_x'])
+        if start_y < 0 or start_x < 0:
+            start_y = start_x = None
+        return Env.from_description(float(record['p']), float(record['pj']), float(record['pn']), area_map,
+                start_y, start_x, '{}#{}'.format(self.path, self.names[index]))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def write_pack(path, environments):
+    """Zapisuje srodowiska z iterowalnego zbioru environments do pliku .wpk. Siatki zapisywane sa od razu,
+    wiec environments moze byc generatorem. Zwraca liczbe zapisanych swiatow."""
+
+    records = []
+    names = []
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, 0, 0, 0))
+        offset = HEADER.size
+        for env in environments:
+            data = ''.join(env.map).encode('ascii')
+            file.write(data)
+            records.append((env.p, env.pj, env.pn, env.height, env.width,
+                    -1 if env.start_y is None else env.start_y,
+                    -1 if env.start_x is None else env.start_x, offset))
+            names.append(os.path.basename(env.name) if env.name is not None else str(len(names)))
+            offset += len(data)
+
+        table_offset = offset
+        file.write(np.array(records, dtype=RECORD).tobytes())
+        names_offset = table_offset + len(records) * RECORD.itemsize
+        file.write('\n'.join(names).encode('utf-8'))
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, len(records), table_offset, names_offset))
+    return len(records)
+
+def main():
+    parser = argparse.ArgumentParser(description='Converts Lost Wumpus environment files into a world pack.')
+    parser.add_argument('output', metavar='OUTPUT', help='world pack file to create (*.wpk)')
+    parser.add_argument('inputs', metavar='ENV', nargs='+',
+            help='file \'*.in\' containing environment description or directory of such files')
+    args = parser.parse_args()
+
+    count = write_pack(args.output, (Env(path) for path in environment_files(args.inputs)))
+    print('{} worlds written to {}'.format(count, args.output))
+
+if __name__ == '__main__':
+    main()
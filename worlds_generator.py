@@ -1,64 +1,210 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
+# coding: utf-8
+"""Generator swiatow zagubionego Wumpusa.
 
-from os import path
-import random
+Swiaty generowane sa w rodzinach o wspolnych parametrach: wymiarach (height, width), prawdopodobienstwie
+jamy w polu (pit_prob), p, pj, pn i liczbie swiatow (count). Rodziny mozna podac:
+- jako siatke parametrow w wierszu polecen (kazda kombinacja wartosci --size, --pit-prob, --p, --pj, --pn
+  to osobna rodzina),
+- w pliku JSON (--config) z lista rodzin, np. {"families": [{"name": "easy", "height": 10, "width": 10,
+  "pit_prob": 0.1, "p": 0.99, "pj": 0.99, "pn": 0.01, "count": 40}]}, albo z siatka parametrow
+  {"grid": {"size": ["10x10", "20x20"], "pit_prob": [0.1, 0.2], ...}, "count": 10},
+- domyslnie uzywane sa cztery rodziny z zestawu test_worlds_2015 (PRESET_2015).
+
+Mapa losowana jest wektorowo (numpy), pole startowe nigdy nie jest wyjsciem. Kazdy swiat ma wlasny
+generator liczb losowych wyznaczony przez ziarno, numer rodziny i numer swiata, wiec wynik nie zalezy
+od liczby procesow (-j). Swiaty zapisywane sa jako pliki '*.in' w katalogu albo, gdy WYJSCIE konczy sie
+na '.wpk', jako jeden zbior swiatow (patrz world_pack).
+
+> worlds_generator.py [--config PLIK] [--size HxW ...] [--pit-prob P ...] [--p P ...] [--pj P ...]
+                      [--pn P ...] [-c N] [--seed SEED] [-j J] [WYJSCIE]"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import numpy as np
+from world import World
+
+PRESET_2015 = [
+    {'name': 'sparse', 'height': 20, 'width': 20, 'pit_prob': 0.2, 'p': 0.9, 'pj': 0.7, 'pn': 0.1, 'count': 10},
+    {'name': 'medium', 'height': 20, 'width': 20, 'pit_prob': 0.5, 'p': 0.99, 'pj': 0.99, 'pn': 0.2, 'count': 10},
+    {'name': 'easy', 'height': 10, 'width': 10, 'pit_prob': 0.1, 'p': 0.99, 'pj': 0.99, 'pn': 0.01, 'count': 40},
+    {'name': 'hard', 'height': 10, 'width': 10, 'pit_prob': 0.2, 'p': 0.6, 'pj': 0.6, 'pn': 0.3, 'count': 40}
+]
+"""Rodziny swiatow zestawu test_worlds_2015."""
+
+_FIELDS = np.frombuffer((World.EMPTY + World.CAVE + World.EXIT).encode('ascii'), dtype=np.uint8)
+
+
+def sample_world(rng, nrows, ncols, pit_prob=0.2):
+    """Losuje mape nrows x ncols generatorem rng (numpy.random.Generator). Zwraca (mapa jako lista
+    lancuchow, start_y, start_x); wspolrzedne startowe numerowane sa od 0 i nigdy nie wskazuja wyjscia, wiec
+    mapa musi miec co najmniej 2 pola."""
+
+    fields = nrows * ncols
+    assert fields >= 2, 'a world needs at least 2 fields, got {}x{}'.format(nrows, ncols)
+    grid = _FIELDS[(rng.random((nrows, ncols)) < pit_prob).astype(np.intp)]
+    exit_index = int(rng.integers(fields))
+    grid.flat[exit_index] = _FIELDS[2]
+
+    start_index = int(rng.integers(fields - 1))
+    start_index += start_index >= exit_index
+    area_map = [row.tobytes().decode('ascii') for row in grid]
+    return area_map, start_index // ncols, start_index % ncols
+
+def format_world(p, pj, pn, area_map, start_y, start_x):
+    """Zwraca opis swiata w formacie plikow '*.in' (wspolrzedne startowe w pliku numerowane sa od 1)."""
+
+    return '{:g}\n{:g} {:g}\n{} {}\n{}\n{} {}\n'.format(p, pj, pn, len(area_map), len(area_map[0]),
+            '\n'.join(area_map), start_y + 1, start_x + 1)
 
 def generate_world(nrows, ncols, pit_prob=0.2, accurate_movement_prob=0.9,
-        pit_detection_prob=0.7, regular_cell_wrong_prob=0.1):
-    world = [ncols * ['.'] for i in range(nrows)]
-    for i in range(nrows):
-        for j in range(ncols):
-            world[i][j] = 'J' if random.random() < pit_prob else '.'
-    exit_pos = (random.randint(0,nrows-1), random.randint(0,ncols-1))
-    world[exit_pos[0]][exit_pos[1]] = 'W'
-
-    wumpus_pos = (random.randint(1,nrows), random.randint(1,ncols))
-
-    return '{:.2f}\n{:.2f} {:.2f}\n{} {}\n{}\n{} {}\n'.format(
-        accurate_movement_prob,
-        pit_detection_prob, regular_cell_wrong_prob, 
-        nrows, ncols,
-        '\n'.join([''.join(row) for row in world]),
-          wumpus_pos[0], wumpus_pos[1])
+        pit_detection_prob=0.7, regular_cell_wrong_prob=0.1, rng=None):
+    """Losuje swiat i zwraca jego opis w formacie plikow '*.in'."""
+
+    if rng is None:
+        rng = np.random.default_rng()
+    area_map, start_y, start_x = sample_world(rng, nrows, ncols, pit_prob)
+    return format_world(accurate_movement_prob, pit_detection_prob, regular_cell_wrong_prob, area_map,
+            start_y, start_x)
 
 def produce_world(filename, **kwargs):
     world = generate_world(**kwargs)
     with open(filename, 'w') as f:
         f.write(world)
 
+
+def family_name(family):
+    """Zwraca nazwe rodziny: podana w opisie albo zlozona z jej parametrow."""
+
+    if 'name' in family:
+        return family['name']
+    return 'j{pit_prob:g}_p{p:g}_pj{pj:g}_pn{pn:g}'.format(**family)
+
+def grid_families(sizes, pit_probs, ps, pjs, pns, count):
+    """Zwraca liste rodzin dla wszystkich kombinacji wartosci parametrow; sizes to lista par (height, width)."""
+
+    return [{'height': height, 'width': width, 'pit_prob': pit_prob, 'p': p, 'pj': pj, 'pn': pn, 'count': count}
+            for (height, width), pit_prob, p, pj, pn in itertools.product(sizes, pit_probs, ps, pjs, pns)]
+
+def parse_size(text):
+    """Zamienia opis wymiarow 'HxW' (lub 'N' dla mapy kwadratowej) na pare (height, width). Mapa musi miec
+    co najmniej 2 pola, aby start mogl byc rozny od wyjscia."""
+
+    parts = text.lower().split('x')
+    try:
+        sizes = [int(part) for part in parts]
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid size '{}', expected HxW".format(text))
+    if len(sizes) == 1:
+        sizes *= 2
+    if len(sizes) != 2 or min(sizes) < 1:
+        raise argparse.ArgumentTypeError("invalid size '{}', expected HxW".format(text))
+    if sizes[0] * sizes[1] < 2:
+        raise argparse.ArgumentTypeError("invalid size '{}', a world needs at least 2 fields".format(text))
+    return tuple(sizes)
+
+def load_config(path):
+    """Wczytuje rodziny swiatow z pliku JSON (klucz 'families' albo 'grid', patrz opis modulu)."""
+
+    with open(path) as f:
+        config = json.load(f)
+    if 'families' in config:
+        return [dict(family, count=family.get('count', config.get('count', 1))) for family in config['families']]
+
+    grid = config['grid']
+    def values(key, default):
+        value = grid.get(key, default)
+        return value if isinstance(value, list) else [value]
+    return grid_families([parse_size(str(size)) for size in values('size', ['10x10'])],
+            values('pit_prob', 0.2), values('p', 0.9), values('pj', 0.7), values('pn', 0.1), config.get('count', 1))
+
+
+def world_units(families, seed):
+    """Generator jednostek (nazwa swiata, rodzina, ziarno) dla wszystkich swiatow wszystkich rodzin."""
+
+    for family_index, family in enumerate(families):
+        digits = max(2, len(str(family['count'] - 1)))
+        for index in range(family['count']):
+            name = 'map{}x{}_{}_{:0{}d}'.format(family['height'], family['width'], family_name(family), index,
+                    digits)
+            yield name, family, (seed, family_index, index)
+
+def _generate(unit):
+    name, family, seed = unit
+    area_map, start_y, start_x = sample_world(np.random.default_rng(seed), family['height'], family['width'],
+            family['pit_prob'])
+    return name, family['p'], family['pj'], family['pn'], area_map, start_y, start_x
+
+def generate_worlds(families, seed, jobs=1):
+    """Generator krotek (nazwa, p, pj, pn, mapa, start_y, start_x) w kolejnosci rodzin i numerow swiatow;
+    przy jobs > 1 swiaty losowane sa w puli procesow."""
+
+    units = world_units(families, seed)
+    if jobs <= 1:
+        for unit in units:
+            yield _generate(unit)
+        return
+
+    with multiprocessing.Pool(jobs) as pool:
+        for world in pool.imap(_generate, units, chunksize=64):
+            yield world
+
+def write_worlds(output, worlds):
+    """Zapisuje swiaty do katalogu output (pliki '*.in') albo, gdy output konczy sie na '.wpk', do jednego
+    zbioru swiatow. Zwraca liczbe zapisanych swiatow."""
+
+    if output.endswith('.wpk'):
+        from environment import Env
+        from world_pack import write_pack
+        return write_pack(output, (Env.from_description(p, pj, pn, area_map, start_y, start_x, name)
+                for name, p, pj, pn, area_map, start_y, start_x in worlds))
+
+    os.makedirs(output, exist_ok=True)
+    count = 0
+    for name, p, pj, pn, area_map, start_y, start_x in worlds:
+        with open(os.path.join(output, name + '.in'), 'w') as f:
+            f.write(format_world(p, pj, pn, area_map, start_y, start_x))
+        count += 1
+    return count
+
 def main():
-    WORLDS_DIR = 'test_worlds_2015'
-    for i in range(10):
-        produce_world(path.join(WORLDS_DIR, 'map20x20_sparse_{:02d}.in'.format(i)), 
-                nrows=20, ncols=20, 
-                pit_prob=0.2, 
-                accurate_movement_prob=0.9, 
-                pit_detection_prob=0.7, 
-                regular_cell_wrong_prob=0.1)
-
-    for i in range(10):
-        produce_world(path.join(WORLDS_DIR, 'map20x20_medium_{:02d}.in'.format(i)), 
-                nrows=20, ncols=20, 
-                pit_prob=0.5, 
-                accurate_movement_prob=0.99, 
-                pit_detection_prob=0.99, 
-                regular_cell_wrong_prob=0.2)
-
-    for i in range(40):
-        produce_world(path.join(WORLDS_DIR, 'map10x10_easy_{:02d}.in'.format(i)), 
-                nrows=10, ncols=10, 
-                pit_prob=0.1, 
-                accurate_movement_prob=0.99, 
-                pit_detection_prob=0.99, 
-                regular_cell_wrong_prob=0.01)
-
-    for i in range(40):
-        produce_world(path.join(WORLDS_DIR, 'map10x10_hard_{:02d}.in'.format(i)), 
-                nrows=10, ncols=10, 
-                pit_prob=0.2, 
-                accurate_movement_prob=0.6, 
-                pit_detection_prob=0.6, 
-                regular_cell_wrong_prob=0.3)
+    parser = argparse.ArgumentParser(description='Generates Lost Wumpus worlds. Without --config or grid\
+            options the four test_worlds_2015 families are generated.', fromfile_prefix_chars='@')
+    parser.add_argument('--config', metavar='FILE', default=None,
+            help='JSON file with a list of world families or a parameter grid')
+    parser.add_argument('--size', metavar='HxW', type=parse_size, nargs='+', default=None,
+            help='map sizes of the parameter grid (default: 10x10)')
+    parser.add_argument('--pit-prob', dest='pit_prob', metavar='P', type=float, nargs='+', default=None,
+            help='probabilities of a pit in a field (default: 0.2)')
+    parser.add_argument('--p', metavar='P', type=float, nargs='+', default=None,
+            help='probabilities of an undisturbed move (default: 0.9)')
+    parser.add_argument('--pj', metavar='P', type=float, nargs='+', default=None,
+            help='probabilities of sensing a pit inside a pit (default: 0.7)')
+    parser.add_argument('--pn', metavar='P', type=float, nargs='+', default=None,
+            help='probabilities of sensing a pit outside a pit (default: 0.1)')
+    parser.add_argument('-c', '--count', metavar='N', type=int, default=10,
+            help='number of worlds for each combination of the grid (default: 10)')
+    parser.add_argument('--seed', metavar='SEED', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('-j', dest='jobs', metavar='J', type=int, default=1,
+            help='number of worker processes (default: 1)')
+    parser.add_argument('output', metavar='OUTPUT', nargs='?', default='test_worlds_2015',
+            help='output directory of \'*.in\' files or world pack file \'*.wpk\' (default: test_worlds_2015)')
+    args = parser.parse_args()
+
+    grid = [args.size, args.pit_prob, args.p, args.pj, args.pn]
+    if args.config is not None:
+        families = load_config(args.config)
+    elif any(values is not None for values in grid):
+        families = grid_families(args.size or [(10, 10)], args.pit_prob or [0.2], args.p or [0.9],
+                args.pj or [0.7], args.pn or [0.1], args.count)
+    else:
+        families = PRESET_2015
+
+    count = write_worlds(args.output, generate_worlds(families, args.seed, args.jobs))
+    print('{} worlds written to {}'.format(count, args.output))
 
 if __name__ == '__main__':
     main()